@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+干运行影响报告：对每个文件夹或提交，在两个tree之间执行 git diff --raw --numstat -z，
+统计新增/修改/删除的文件数、行数和字节变化；多个diff并行执行，不读写工作区
+"""
+
+import json
+import logging
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# git内置的空tree，文件夹在一侧不存在时用它比较
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+NULL_OBJECT_ID = "0" * 40
+# order 保持输入顺序（例如提交的先后顺序）
+SORT_KEYS = ("order", "name", "files", "lines", "bytes")
+
+
+def objects_env(*repo_paths: Path) -> Dict[str, str]:
+    """让git命令可以读取其他仓库的对象（只读，不复制对象）"""
+    directories = []
+    for repo_path in repo_paths:
+        result = subprocess.run(["git", "rev-parse", "--git-path", "objects"], cwd=repo_path,
+                                capture_output=True, text=True, check=True)
+        path = Path(result.stdout.strip())
+        directories.append(str(path if path.is_absolute() else (repo_path / path).resolve()))
+    return dict(os.environ, GIT_ALTERNATE_OBJECT_DIRECTORIES=os.pathsep.join(directories))
+
+
+def top_level_trees(repo_path: Path, ref: str) -> Dict[str, str]:
+    """一次ls-tree读取提交根目录下所有文件夹的tree id"""
+    result = subprocess.run(["git", "ls-tree", "-z", ref], cwd=repo_path, capture_output=True, check=True)
+    trees = {}
+    for entry in result.stdout.split(b'\0'):
+        if entry:
+            meta, name = entry.split(b'\t', 1)
+            _, kind, object_id = meta.decode().split(' ')
+            if kind == 'tree':
+                trees[name.decode('utf-8', 'surrogateescape')] = object_id
+    return trees
+
+
+def diff_trees(repo_path: Path, old: str, new: str, env: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """两个tree之间的逐文件变更 [{path, status, old_id, new_id, lines_added, lines_removed, binary}]"""
+    if old == new:
+        return []
+    result = subprocess.run(
+        ["git", "diff", "--raw", "--numstat", "-z", "--no-renames", "--no-abbrev", old, new],
+        cwd=repo_path, capture_output=True, check=True, env=env
+    )
+    fields = result.stdout.split(b'\0')
+    files = {}
+    i = 0
+    # 先是 ":旧mode 新mode 旧id 新id 状态\0路径\0"，然后是 "增加行数\t删除行数\t路径\0"（二进制文件为 -）
+    while i < len(fields):
+        field = fields[i]
+        if field.startswith(b':'):
+            _, _, old_id, new_id, status = field[1:].decode().split(' ', 4)
+            path = fields[i + 1].decode('utf-8', 'surrogateescape')
+            files[path] = {'path': path, 'status': status, 'old_id': old_id, 'new_id': new_id,
+                           'lines_added': 0, 'lines_removed': 0, 'binary': False}
+            i += 2
+            continue
+        if field:
+            added, removed, path = field.decode('utf-8', 'surrogateescape').split('\t', 2)
+            if path in files:
+                files[path].update(binary=added == '-',
+                                   lines_added=0 if added == '-' else int(added),
+                                   lines_removed=0 if removed == '-' else int(removed))
+        i += 1
+    return list(files.values())
+
+
+def blob_sizes(repo_path: Path, object_ids: Iterable[str], env: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """一次 cat-file --batch-check 读取所有blob的大小"""
+    ids = sorted({object_id for object_id in object_ids if object_id != NULL_OBJECT_ID})
+    if not ids:
+        return {}
+    result = subprocess.run(["git", "cat-file", "--batch-check"], cwd=repo_path, env=env,
+                            input="\n".join(ids) + "\n", capture_output=True, text=True, check=True)
+    sizes = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            sizes[parts[0]] = int(parts[2])
+    return sizes
+
+
+def summarize(name: str, changes: List[Dict], sizes: Dict[str, int]) -> Dict:
+    """汇总一个文件夹/提交的变更"""
+    row = {'name': name, 'added': 0, 'changed': 0, 'removed': 0, 'lines_added': 0, 'lines_removed': 0,
+           'bytes_added': 0, 'bytes_removed': 0, 'binary': 0, 'files': []}
+    for change in changes:
+        status = change['status']
+        row['added' if status == 'A' else 'removed' if status == 'D' else 'changed'] += 1
+        row['lines_added'] += change['lines_added']
+        row['lines_removed'] += change['lines_removed']
+        row['binary'] += change['binary']
+        delta = sizes.get(change['new_id'], 0) - sizes.get(change['old_id'], 0)
+        row['bytes_added' if delta >= 0 else 'bytes_removed'] += abs(delta)
+        row['files'].append({'path': change['path'], 'status': status, 'bytes_delta': delta,
+                             'lines_added': change['lines_added'], 'lines_removed': change['lines_removed']})
+    row['bytes_delta'] = row['bytes_added'] - row['bytes_removed']
+    return row
+
+
+def impact_report(repo_path: Path, jobs: Sequence[Tuple[str, str, str]], workers: int = 8,
+                  env: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """并行计算每个 (名称, 旧tree, 新tree) 的变更汇总；tree相同的直接跳过"""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        diffs = list(pool.map(lambda job: diff_trees(repo_path, job[1], job[2], env), jobs))
+    sizes = blob_sizes(repo_path, (object_id for changes in diffs for change in changes
+                                   for object_id in (change['old_id'], change['new_id'])), env)
+    return [summarize(name, changes, sizes) for (name, _, _), changes in zip(jobs, diffs)]
+
+
+def sort_rows(rows: List[Dict], sort_by: str = "name") -> List[Dict]:
+    """按输入顺序、名称或变化量（从大到小）排序"""
+    if sort_by == "order":
+        return list(rows)
+    if sort_by == "name":
+        return sorted(rows, key=lambda row: row['name'])
+    key = {
+        'files': lambda row: row['added'] + row['changed'] + row['removed'],
+        'lines': lambda row: row['lines_added'] + row['lines_removed'],
+        'bytes': lambda row: row['bytes_added'] + row['bytes_removed'],
+    }[sort_by]
+    return sorted(rows, key=key, reverse=True)
+
+
+def print_summary(rows: List[Dict], sort_by: str = "name", show_unchanged: bool = False):
+    """打印汇总表"""
+    rows = sort_rows(rows, sort_by)
+    changed = [row for row in rows if row['files']]
+    print(f"{'name':<40} {'added':>6} {'changed':>8} {'removed':>8} {'+lines':>8} {'-lines':>8} {'bytes delta':>12}")
+    for row in rows:
+        if not row['files'] and not show_unchanged:
+            continue
+        print(f"{row['name'][:40]:<40} {row['added']:>6} {row['changed']:>8} {row['removed']:>8} "
+              f"{row['lines_added']:>8} {row['lines_removed']:>8} {row['bytes_delta']:>+12}")
+    totals = {key: sum(row[key] for row in rows) for key in ('added', 'changed', 'removed', 'lines_added',
+                                                            'lines_removed', 'bytes_delta')}
+    print(f"{'TOTAL (' + str(len(changed)) + '/' + str(len(rows)) + ' changed)':<40} {totals['added']:>6} "
+          f"{totals['changed']:>8} {totals['removed']:>8} {totals['lines_added']:>8} "
+          f"{totals['lines_removed']:>8} {totals['bytes_delta']:>+12}")
+
+
+def write_json(rows: List[Dict], output: str, sort_by: str = "name"):
+    """把报告写成JSON"""
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(sort_rows(rows, sort_by), f, indent=2, ensure_ascii=False)
+    logger.info(f"Impact report written to {output}")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+推送前校验：在进程池中解析并检查每个应用文件夹的 Chart.yaml 和 OlaresManifest.yaml，
+检查结果按git blob id缓存，内容未变化的文件在之后的运行中不会再次校验
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+CHART_FILE = "Chart.yaml"
+MANIFEST_FILE = "OlaresManifest.yaml"
+VALIDATED_FILES = (CHART_FILE, MANIFEST_FILE)
+# 校验规则变化时修改版本号，旧的缓存结果会自动失效
+SCHEMA_VERSION = 1
+DEFAULT_CACHE_FILE = "validation_cache.json"
+# 带或不带前缀v的SemVer 2.0
+SEMVER_PATTERN = re.compile(
+    r"^v?(0|[1-9]\d*)\.(0|[1-9]\d*)\.(0|[1-9]\d*)"
+    r"(?:-[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?$"
+)
+MANIFEST_VERSION_KEYS = ("olaresManifest.version", "terminusManifest.version")
+
+
+def git_blob_id(data: bytes) -> str:
+    """与 git hash-object 相同的blob id，工作区文件不需要启动git进程"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def check_chart(document: Dict) -> Tuple[List[str], Dict]:
+    """检查Chart.yaml，返回 (错误, 提取的字段)"""
+    errors = []
+    if document.get("apiVersion") not in ("v1", "v2"):
+        errors.append(f"apiVersion must be v1 or v2, got {document.get('apiVersion')!r}")
+    name = document.get("name")
+    if not isinstance(name, str) or not name:
+        errors.append("name is required")
+    version = document.get("version")
+    if not isinstance(version, str) or not SEMVER_PATTERN.match(version):
+        errors.append(f"version must be a SemVer string, got {version!r}")
+    return errors, {"name": name, "version": version}
+
+
+def check_manifest(document: Dict) -> Tuple[List[str], Dict]:
+    """检查OlaresManifest.yaml，返回 (错误, 提取的字段)"""
+    errors = []
+    if not any(document.get(key) for key in MANIFEST_VERSION_KEYS):
+        errors.append("olaresManifest.version is required")
+    metadata = document.get("metadata")
+    if not isinstance(metadata, dict):
+        return errors + ["metadata section is required"], {}
+    for key in ("name", "title", "version"):
+        if not metadata.get(key):
+            errors.append(f"metadata.{key} is required")
+    version = metadata.get("version")
+    if version and (not isinstance(version, str) or not SEMVER_PATTERN.match(version)):
+        errors.append(f"metadata.version must be a SemVer string, got {version!r}")
+    return errors, {"name": metadata.get("name"), "version": version}
+
+
+def validate_document(file_name: str, data: bytes) -> Dict:
+    """在子进程中运行：解析并检查一个文件，结果只依赖文件内容（可按blob id缓存）"""
+    result = {"errors": [], "warnings": [], "fields": {}}
+    text = data.decode("utf-8", errors="replace")
+    try:
+        document = yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        if "{{" in text:
+            # 含模板指令的清单在渲染前不是合法YAML，只能跳过结构检查
+            result["warnings"].append(f"{file_name} contains template directives, schema check skipped")
+        else:
+            result["errors"].append(f"{file_name} is not valid YAML: {' '.join(str(e).split())}")
+        return result
+    if not isinstance(document, dict):
+        result["errors"].append(f"{file_name} must be a mapping")
+        return result
+    check = check_chart if file_name == CHART_FILE else check_manifest
+    errors, fields = check(document)
+    result["errors"].extend(f"{file_name}: {error}" for error in errors)
+    result["fields"] = fields
+    return result
+
+
+class ValidationCache:
+    """{<文件名>:<blob id>: 检查结果} 的JSON缓存"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_FILE):
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        if self.path and self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("schema_version") == SCHEMA_VERSION:
+                self.entries = data.get("entries", {})
+
+    @staticmethod
+    def key(file_name: str, blob_id: str) -> str:
+        """缓存键：同一内容作为不同文件名时检查规则不同"""
+        return f"{file_name}:{blob_id}"
+
+    def get(self, file_name: str, blob_id: str) -> Optional[Dict]:
+        """读取缓存的检查结果，未校验过时返回None"""
+        return self.entries.get(self.key(file_name, blob_id))
+
+    def put(self, file_name: str, blob_id: str, result: Dict):
+        """保存检查结果"""
+        self.entries[self.key(file_name, blob_id)] = result
+        self.dirty = True
+
+    def save(self):
+        """原子写入缓存文件"""
+        if not self.path or not self.dirty:
+            return
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"schema_version": SCHEMA_VERSION, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def worktree_files(repo_path: Path, folders: List[str]) -> Dict[str, Dict[str, Optional[bytes]]]:
+    """读取工作区中各文件夹需要校验的文件 {文件夹: {文件名: 内容或None}}"""
+    files = {}
+    for folder in folders:
+        files[folder] = {}
+        for file_name in VALIDATED_FILES:
+            path = repo_path / folder / file_name
+            files[folder][file_name] = path.read_bytes() if path.is_file() else None
+    return files
+
+
+def commit_files(repo_path: Path, commit: str, folders: List[str]) -> Dict[str, Dict[str, Optional[bytes]]]:
+    """读取某个提交中各文件夹需要校验的文件：一次 cat-file --batch 读取全部内容"""
+    names = [(folder, file_name) for folder in folders for file_name in VALIDATED_FILES]
+    request = ''.join(f"{commit}:{folder}/{file_name}\n" for folder, file_name in names).encode()
+    result = subprocess.run(["git", "cat-file", "--batch"], cwd=repo_path, input=request,
+                            capture_output=True, check=True)
+    output = result.stdout
+    files = {folder: {} for folder in folders}
+    offset = 0
+    for folder, file_name in names:
+        end = output.index(b'\n', offset)
+        header = output[offset:end].split()
+        offset = end + 1
+        files[folder][file_name] = None
+        # 不存在时只有 "<名称> missing" 一行
+        if len(header) == 3:
+            size = int(header[2])
+            if header[1] == b'blob':
+                files[folder][file_name] = output[offset:offset + size]
+            offset += size + 1
+    return files
+
+
+def validate_folders(files: Dict[str, Dict[str, Optional[bytes]]], cache: ValidationCache,
+                     workers: int = 0) -> Dict[str, Dict]:
+    """校验多个文件夹，返回 {文件夹: {ok, errors, warnings, version}}
+
+    单个文件的检查在进程池中执行并按blob id缓存；文件夹名与name一致、两个文件的version一致等跨文件检查在主进程中完成
+    """
+    blob_ids = {}
+    pending = {}
+    cached = 0
+    for folder, contents in files.items():
+        for file_name, data in contents.items():
+            if data is None:
+                continue
+            blob_id = git_blob_id(data)
+            blob_ids[(folder, file_name)] = blob_id
+            if cache.get(file_name, blob_id) is None:
+                # 内容相同的文件只校验一次
+                pending.setdefault((file_name, blob_id), data)
+            else:
+                cached += 1
+
+    if pending:
+        keys = list(pending)
+        logger.info(f"Validating {len(keys)} changed files ({cached} cached)...")
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            results = pool.map(validate_document, [k[0] for k in keys], [pending[k] for k in keys], chunksize=16)
+            for (file_name, blob_id), result in zip(keys, results):
+                cache.put(file_name, blob_id, result)
+        cache.save()
+
+    report = {}
+    for folder, contents in files.items():
+        errors, warnings, fields = [], [], {}
+        for file_name in VALIDATED_FILES:
+            if contents.get(file_name) is None:
+                errors.append(f"{file_name} not found")
+                continue
+            result = cache.get(file_name, blob_ids[(folder, file_name)])
+            errors.extend(result["errors"])
+            warnings.extend(result["warnings"])
+            fields[file_name] = result["fields"]
+        chart, manifest = fields.get(CHART_FILE) or {}, fields.get(MANIFEST_FILE) or {}
+        if chart.get("name") and chart["name"] != folder:
+            errors.append(f"{CHART_FILE}: name {chart['name']!r} does not match folder {folder!r}")
+        if manifest.get("name") and manifest["name"] != folder:
+            errors.append(f"{MANIFEST_FILE}: metadata.name {manifest['name']!r} does not match folder {folder!r}")
+        if chart.get("version") and manifest.get("version") and str(chart["version"]) != str(manifest["version"]):
+            errors.append(f"version mismatch: {CHART_FILE} {chart['version']} != {MANIFEST_FILE} {manifest['version']}")
+        report[folder] = {"ok": not errors, "errors": errors, "warnings": warnings, "version": chart.get("version")}
+    return report
+
+
+def log_report(report: Dict[str, Dict]) -> List[str]:
+    """记录校验结果，返回未通过的文件夹"""
+    failed = []
+    for folder, result in report.items():
+        for warning in result["warnings"]:
+            logger.warning(f"{folder}: {warning}")
+        if not result["ok"]:
+            failed.append(folder)
+            for error in result["errors"]:
+                logger.error(f"{folder}: {error}")
+    logger.info(f"Validation: {len(report) - len(failed)}/{len(report)} folders passed")
+    return failed
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="校验应用文件夹中的 Chart.yaml 和 OlaresManifest.yaml")
+    parser.add_argument("repo", help="仓库路径")
+    parser.add_argument("folders", nargs="*", help="要校验的文件夹（默认读取--folders文件）")
+    parser.add_argument("--folders-file", default="folders_to_sync.txt", help="文件夹列表文件路径")
+    parser.add_argument("--commit", help="校验该提交中的文件（默认校验工作区）")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_FILE, help="校验结果缓存文件")
+    parser.add_argument("--workers", type=int, default=0, help="进程数（默认CPU核数）")
+    args = parser.parse_args()
+
+    folders = args.folders
+    if not folders:
+        with open(args.folders_file, 'r', encoding='utf-8') as f:
+            folders = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+    repo_path = Path(args.repo)
+    files = commit_files(repo_path, args.commit, folders) if args.commit else worktree_files(repo_path, folders)
+    failed = log_report(validate_folders(files, ValidationCache(args.cache), args.workers))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+工作仓库初始化：以blobless部分克隆的方式创建apps和terminus-apps-origin，apps仓库使用sparse-checkout（只检出同步列表中的文件夹），
+并把remote的fetch refspec收窄到main/sync分支，之后的 git fetch origin 只拉取这些分支
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 未配置时使用的工作仓库根目录
+DEFAULT_BASE_PATH = "/Users/cid/Documents/GitHub/TShentu"
+# 也可以用环境变量指定根目录（CI中使用）
+BASE_PATH_ENV = "SYNC_BASE_PATH"
+
+
+def resolve_base_path(config: Dict, base_path: Optional[str] = None) -> Path:
+    """确定工作仓库根目录：命令行参数 > 环境变量 > 配置文件base_path > 默认路径"""
+    value = base_path or os.environ.get(BASE_PATH_ENV) or config.get("base_path") or DEFAULT_BASE_PATH
+    return Path(value).expanduser()
+
+
+def run_git(repo_path: Path, command: List[str], check: bool = True,
+            input: Optional[str] = None) -> subprocess.CompletedProcess:
+    """运行Git命令"""
+    full_command = ["git"] + command
+    logger.debug(f"Running git command in {repo_path}: {' '.join(full_command)}")
+    try:
+        return subprocess.run(full_command, cwd=repo_path, capture_output=True, text=True,
+                              input=input, check=check)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Git command failed: {e}")
+        logger.error(f"stderr: {e.stderr}")
+        raise
+
+
+def github_url(repo: Dict) -> str:
+    """owner/repo 对应的GitHub地址"""
+    return f"https://github.com/{repo['owner']}/{repo['repo']}.git"
+
+
+def repo_layout(config: Dict) -> Dict[str, Dict]:
+    """两个工作仓库的目录名、地址、需要跟踪的分支，以及是否按文件夹列表sparse-checkout"""
+    sync_apps = config.get("sync_apps", {})
+    sync_folders = config.get("sync_folders", {})
+    apps = sync_apps.get("source") or sync_folders.get("target") or {"owner": "beclab", "repo": "apps"}
+    origin = sync_apps.get("target") or sync_folders.get("source") or {"owner": "Above-Os", "repo": "terminus-apps"}
+    return {
+        "apps": {
+            "url": github_url(apps),
+            # sync_apps读取sync分支，sync_folders以main为基准创建分支
+            "branches": sorted({"main", sync_apps.get("source", {}).get("branch", "sync")}),
+            "sparse": True,
+        },
+        "terminus-apps-origin": {
+            "url": github_url(origin),
+            "branches": sorted({"main", origin.get("branch", "main")}),
+            # sync_apps.py 在这里回放任意路径的改动，cone之外的路径 git add 会失败，所以始终完整检出
+            "sparse": False,
+        },
+    }
+
+
+def set_narrow_refspecs(repo_path: Path, branches: Sequence[str], remote: str = "origin"):
+    """把remote的fetch refspec收窄为指定分支"""
+    refspecs = [f"+refs/heads/{branch}:refs/remotes/{remote}/{branch}" for branch in branches]
+    run_git(repo_path, ["config", "--replace-all", f"remote.{remote}.fetch", refspecs[0]])
+    for refspec in refspecs[1:]:
+        run_git(repo_path, ["config", "--add", f"remote.{remote}.fetch", refspec])
+    # 不再自动拉取tag
+    run_git(repo_path, ["config", f"remote.{remote}.tagOpt", "--no-tags"])
+
+
+def set_sparse_folders(repo_path: Path, folders: Optional[Sequence[str]]):
+    """cone模式的sparse-checkout只检出根目录文件和指定文件夹；folders为None时关闭sparse-checkout"""
+    if folders is None:
+        run_git(repo_path, ["sparse-checkout", "disable"], check=False)
+        return
+    # 文件夹数量可能很多，通过stdin传入
+    run_git(repo_path, ["sparse-checkout", "set", "--cone", "--stdin"], input="\n".join(folders) + "\n")
+
+
+def bootstrap_repo(repo_path: Path, url: str, branches: Sequence[str],
+                   folders: Optional[Sequence[str]] = None, checkout: str = "main"):
+    """创建或更新一个工作仓库"""
+    if not (repo_path / ".git").exists():
+        logger.info(f"Cloning {url} into {repo_path} (blobless, branches: {', '.join(branches)})...")
+        repo_path.parent.mkdir(parents=True, exist_ok=True)
+        run_git(repo_path.parent, [
+            "clone", "--filter=blob:none", "--no-checkout", "--no-tags",
+            "--single-branch", "--branch", checkout, url, str(repo_path)
+        ])
+    else:
+        logger.info(f"Updating existing repository {repo_path}...")
+
+    set_narrow_refspecs(repo_path, branches)
+    set_sparse_folders(repo_path, folders)
+    fetch_narrow(repo_path)
+
+    # 本地分支不存在时从远程分支创建；已存在时只切换，不覆盖本地改动
+    has_branch = run_git(repo_path, ["rev-parse", "--verify", "--quiet", f"refs/heads/{checkout}"], check=False)
+    if has_branch.returncode == 0:
+        run_git(repo_path, ["checkout", checkout])
+    else:
+        run_git(repo_path, ["checkout", "-b", checkout, f"origin/{checkout}"])
+
+
+def fetch_narrow(repo_path: Path, remote: str = "origin"):
+    """按收窄后的refspec拉取（部分克隆的过滤条件保存在remote配置中，新提交同样不下载blob）"""
+    run_git(repo_path, ["fetch", "--prune", remote])
+
+
+def load_folders(folders_file: Optional[str]) -> Optional[List[str]]:
+    """读取同步文件夹列表（格式与sync_folders.py相同）"""
+    if not folders_file:
+        return None
+    with open(folders_file, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+def bootstrap(config: Dict, base_path: Path, folders: Optional[List[str]] = None,
+              repos: Optional[Sequence[str]] = None):
+    """初始化/更新所有工作仓库"""
+    for name, layout in repo_layout(config).items():
+        if repos and name not in repos:
+            continue
+        bootstrap_repo(base_path / name, layout["url"], layout["branches"], folders if layout["sparse"] else None)
+    logger.info(f"Repositories ready under {base_path}")
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="以部分克隆 + sparse-checkout 的方式初始化同步用的工作仓库")
+    parser.add_argument("--config", default="sync_config.json", help="配置文件路径")
+    parser.add_argument("--base-path", help=f"工作仓库根目录（也可用环境变量 {BASE_PATH_ENV} 或配置项 base_path 指定）")
+    parser.add_argument("--folders", default="folders_to_sync.txt", help="文件夹列表文件，apps仓库只检出这些文件夹")
+    parser.add_argument("--no-sparse", action="store_true", help="apps仓库也检出全部文件（仍然是blobless部分克隆）")
+    parser.add_argument("--repo", action="append", choices=["apps", "terminus-apps-origin"], help="只初始化指定仓库")
+    args = parser.parse_args()
+
+    config = {}
+    if Path(args.config).exists():
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    folders = None
+    if not args.no_sparse:
+        if not Path(args.folders).exists():
+            logger.error(f"Folders file not found: {args.folders} (use --no-sparse to check out everything)")
+            sys.exit(1)
+        folders = load_folders(args.folders)
+
+    try:
+        bootstrap(config, resolve_base_path(config, args.base_path), folders, args.repo)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Bootstrap failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
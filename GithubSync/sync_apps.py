@@ -6,33 +6,42 @@
 import os
 import sys
 import json
+import shutil
 import subprocess
 import logging
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('sync_apps.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from impact_report import EMPTY_TREE, SORT_KEYS, impact_report, print_summary, write_json
+from package_validation import DEFAULT_CACHE_FILE, ValidationCache, commit_files, log_report, validate_folders
+from repo_bootstrap import resolve_base_path
+from sync_logging import clip, log_context, setup_logging
+
+# 日志在main()中通过setup_logging配置（队列 + 后台线程写入轮转的JSON日志文件）
 logger = logging.getLogger(__name__)
 
+# 从git流式读取文件内容时每块的大小
+BLOB_CHUNK_SIZE = 1024 * 1024
+# remote模式下，在terminus-apps-origin中指向本地apps仓库的remote名称
+SYNC_SOURCE_REMOTE = "sync-source"
+# diff-tree中表示“文件不存在”的对象id
+NULL_OBJECT_ID = "0" * 40
+
 class AppSyncManager:
     """应用同步管理器"""
     
-    def __init__(self, config_file: str = "sync_config.json"):
+    def __init__(self, config_file: str = "sync_config.json", base_path: Optional[str] = None):
         self.config_file = config_file
         self.config = self.load_config()
+        # 命令行参数对sync_settings的覆盖：只在本次运行中生效，不写入配置文件
+        self.settings_overrides: Dict = {}
         
-        # 设置路径
-        self.base_path = Path("/Users/cid/Documents/GitHub/TShentu")
+        # 设置路径（命令行参数 > 环境变量SYNC_BASE_PATH > 配置文件base_path > 默认路径）
+        self.base_path = resolve_base_path(self.config, base_path)
         self.apps_repo_path = self.base_path / "apps"
         self.terminus_apps_origin_path = self.base_path / "terminus-apps-origin"
         
@@ -49,6 +58,7 @@ class AppSyncManager:
             # 创建默认配置
             default_config = {
                 "last_synced_commit": None,
+                "base_path": None,
                 "github": {
                     "token": None,
                     "username": None,
@@ -69,6 +79,10 @@ class AppSyncManager:
                 "sync_settings": {
                     "auto_resolve_conflicts": True,
                     "create_draft_pr": True,
+                    "object_sharing": None,
+                    "replay_engine": "cherry-pick",
+                    "verify_replay": False,
+                    "validate": True,
                     "pr_title_template": "sync from prod {date}",
                     "pr_body_template": "## 同步内容\n\n{sync_commits}\n\n同步了 {commit_count} 个提交。"
                 }
@@ -83,6 +97,12 @@ class AppSyncManager:
         with open(self.config_file, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
     
+    def get_sync_setting(self, key: str, default=None):
+        """读取sync_settings中的配置项，命令行参数的覆盖优先"""
+        if key in self.settings_overrides:
+            return self.settings_overrides[key]
+        return self.config.get("sync_settings", {}).get(key, default)
+    
     def _validate_repos(self):
         """验证仓库路径是否存在"""
         if not self.apps_repo_path.exists():
@@ -90,10 +110,12 @@ class AppSyncManager:
         if not self.terminus_apps_origin_path.exists():
             raise FileNotFoundError(f"Terminus apps origin repository not found: {self.terminus_apps_origin_path}")
     
-    def run_git_command(self, repo_path: Path, command: List[str], check: bool = True) -> subprocess.CompletedProcess:
+    def run_git_command(self, repo_path: Path, command: List[str], check: bool = True,
+                        input: Optional[str] = None) -> subprocess.CompletedProcess:
         """运行Git命令"""
         full_command = ["git"] + command
-        logger.debug(f"Running git command in {repo_path}: {' '.join(full_command)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Running git command in %s: %s", repo_path, ' '.join(full_command))
         
         try:
             result = subprocess.run(
@@ -101,15 +123,82 @@ class AppSyncManager:
                 cwd=repo_path,
                 capture_output=True,
                 text=True,
+                input=input,
                 check=check
             )
             return result
         except subprocess.CalledProcessError as e:
             logger.error(f"Git command failed: {e}")
-            logger.error(f"stdout: {e.stdout}")
-            logger.error(f"stderr: {e.stderr}")
+            logger.error("stdout: %s", clip(e.stdout))
+            logger.error("stderr: %s", clip(e.stderr))
             raise
     
+    def materialize_blob(self, commit_hash: str, file_path: str) -> Path:
+        """把源提交中的文件按块流式写入目标仓库
+
+        直接写入 git cat-file 输出的原始字节（不解码，二进制文件不会损坏），先写临时文件再原子替换，
+        内存占用与文件大小无关；文件在该提交中不存在时抛出 CalledProcessError
+        """
+        full_path = self.terminus_apps_origin_path / file_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = full_path.with_name(f".{full_path.name}.sync-tmp")
+        command = ["git", "cat-file", "blob", f"{commit_hash}:{file_path}"]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Streaming blob in %s: %s", self.apps_repo_path, ' '.join(command))
+        
+        try:
+            with open(tmp_path, 'wb') as f, subprocess.Popen(
+                command,
+                cwd=self.apps_repo_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            ) as process:
+                shutil.copyfileobj(process.stdout, f, BLOB_CHUNK_SIZE)
+                stderr = process.stderr.read()
+                returncode = process.wait()
+            
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, command, stderr=stderr.decode('utf-8', 'replace'))
+            
+            # 保留已有文件的权限（例如可执行位）
+            if full_path.exists():
+                shutil.copymode(full_path, tmp_path)
+            os.replace(tmp_path, full_path)
+            return full_path
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
+    def blob_matches_file(self, commit_hash: str, file_path: str) -> bool:
+        """按块比较源提交中的文件和目标仓库中的文件是否完全相同；文件在该提交中不存在时抛出 CalledProcessError"""
+        target_file = self.terminus_apps_origin_path / file_path
+        command = ["git", "cat-file", "blob", f"{commit_hash}:{file_path}"]
+        matches = target_file.is_file()
+        
+        with subprocess.Popen(
+            command,
+            cwd=self.apps_repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        ) as process:
+            target = open(target_file, 'rb') if matches else None
+            try:
+                # 发现差异后继续读完输出，保证能拿到可靠的退出码
+                for chunk in iter(lambda: process.stdout.read(BLOB_CHUNK_SIZE), b''):
+                    if matches and target.read(len(chunk)) != chunk:
+                        matches = False
+                if matches and target.read(1):
+                    matches = False
+            finally:
+                if target is not None:
+                    target.close()
+            stderr = process.stderr.read()
+            returncode = process.wait()
+        
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command, stderr=stderr.decode('utf-8', 'replace'))
+        return matches
+    
     def get_commit_hash(self, repo_path: Path, ref: str = "HEAD") -> str:
         """获取指定引用的commit hash"""
         result = self.run_git_command(repo_path, ["rev-parse", ref])
@@ -144,37 +233,437 @@ class AppSyncManager:
         return None
     
     def get_commit_log(self, repo_path: Path, from_commit: str, to_commit: str = "HEAD") -> List[Dict]:
-        """获取commit日志"""
+        """获取commit日志（从旧到新，按此顺序回放）"""
         if from_commit == to_commit:
             return []
         
-        # 获取commit列表
+        # 获取commit列表；字段用NUL分隔，提交信息中的 | 不会打乱字段
         result = self.run_git_command(repo_path, [
-            "log", "--oneline", "--format=%H|%s|%an|%ad", 
+            "log", "--reverse", "--format=%H%x00%s%x00%an%x00%ad%x00%at %ai",
             "--date=short", f"{from_commit}..{to_commit}"
         ])
         
         commits = []
         for line in result.stdout.strip().split('\n'):
             if line:
-                parts = line.split('|', 3)
-                if len(parts) >= 4:
+                parts = line.split('\0')
+                if len(parts) >= 5:
                     commits.append({
                         'hash': parts[0],
                         'message': parts[1],
                         'author': parts[2],
-                        'date': parts[3]
+                        'date': parts[3],
+                        # fast-import使用的原始作者时间："<unix时间戳> <时区>"
+                        'timestamp': f"{parts[4].split()[0]} {parts[4].split()[-1]}"
                     })
         
         return commits
     
     def fetch_latest_changes(self):
-        """获取最新更改"""
-        logger.info("Fetching latest changes from apps repository...")
-        self.run_git_command(self.apps_repo_path, ["fetch", "origin"])
+        """获取最新更改（两个仓库并行fetch）"""
+        logger.info("Fetching latest changes from apps and terminus-apps-origin repositories...")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(self.run_git_command, repo_path, ["fetch", "origin"])
+                       for repo_path in (self.apps_repo_path, self.terminus_apps_origin_path)]
+            for future in futures:
+                future.result()
+    
+    def get_object_sharing_mode(self) -> Optional[str]:
+        """两个仓库共享对象库的模式：alternates / remote / None（不共享）"""
+        mode = self.get_sync_setting("object_sharing")
+        if mode not in (None, "alternates", "remote"):
+            raise ValueError(f"Unknown object_sharing mode: {mode}")
+        return mode
+    
+    def get_objects_dir(self, repo_path: Path) -> Path:
+        """获取仓库的对象目录（兼容worktree等非标准布局）"""
+        result = self.run_git_command(repo_path, ["rev-parse", "--git-path", "objects"])
+        objects_dir = Path(result.stdout.strip())
+        if not objects_dir.is_absolute():
+            objects_dir = repo_path / objects_dir
+        return objects_dir.resolve()
+    
+    def link_object_store(self, mode: str, source_ref: str = "origin/sync"):
+        """让terminus-apps-origin可以直接读取apps仓库的commit、tree和blob对象
         
-        logger.info("Fetching latest changes from terminus-apps-origin repository...")
-        self.run_git_command(self.terminus_apps_origin_path, ["fetch", "origin"])
+        - alternates: 把apps仓库的对象目录加入 objects/info/alternates，不复制任何对象
+        - remote: 把本地apps仓库添加为remote并只fetch sync分支，对象只复制一次且对象id不变
+        """
+        if mode == "alternates":
+            source_objects = str(self.get_objects_dir(self.apps_repo_path))
+            alternates_file = self.get_objects_dir(self.terminus_apps_origin_path) / "info" / "alternates"
+            alternates_file.parent.mkdir(parents=True, exist_ok=True)
+            existing = alternates_file.read_text(encoding='utf-8').splitlines() if alternates_file.exists() else []
+            if source_objects not in existing:
+                with open(alternates_file, 'a', encoding='utf-8') as f:
+                    f.write(source_objects + "\n")
+                logger.info(f"Linked object store: {source_objects}")
+        elif mode == "remote":
+            source_url = str(self.apps_repo_path.resolve())
+            result = self.run_git_command(self.terminus_apps_origin_path, ["remote", "get-url", SYNC_SOURCE_REMOTE], check=False)
+            if result.returncode != 0:
+                self.run_git_command(self.terminus_apps_origin_path, ["remote", "add", SYNC_SOURCE_REMOTE, source_url])
+            elif result.stdout.strip() != source_url:
+                self.run_git_command(self.terminus_apps_origin_path, ["remote", "set-url", SYNC_SOURCE_REMOTE, source_url])
+            # 只fetch用作同步源的那一个引用
+            full_ref = self.run_git_command(self.apps_repo_path, ["rev-parse", "--symbolic-full-name", source_ref]).stdout.strip()
+            self.run_git_command(self.terminus_apps_origin_path, [
+                "fetch", "--no-tags", SYNC_SOURCE_REMOTE,
+                f"+{full_ref}:refs/remotes/{SYNC_SOURCE_REMOTE}/{full_ref.rsplit('/', 1)[-1]}"
+            ])
+            logger.info(f"Fetched {full_ref} from local remote {SYNC_SOURCE_REMOTE}")
+    
+    def prefetch_missing_blobs(self, from_commit: str, to_commit: str):
+        """apps是部分克隆时，一次性下载同步范围内缺失的blob
+        
+        alternates模式下terminus-apps-origin直接读取apps的对象目录，缺失的blob会向terminus-apps-origin
+        自己的promisor remote请求，那里没有sync分支上的对象，所以要先在apps中补齐
+        """
+        # 部分克隆的remote配置为 remote.<name>.promisor=true（旧版本git写入 extensions.partialClone=<name>）
+        result = self.run_git_command(self.apps_repo_path, [
+            "config", "--get-regexp", r"^remote\..*\.promisor$|^extensions\.partialclone$"
+        ], check=False)
+        promisors = [key[len("remote."):-len(".promisor")] if key.startswith("remote.") else value
+                     for key, _, value in (line.partition(' ') for line in result.stdout.splitlines())
+                     if key.startswith("extensions.") or value == "true"]
+        if not promisors:
+            return
+        promisor = promisors[0]
+        # --missing=print 只列出缺失的对象（以?开头），不会逐个按需下载
+        result = self.run_git_command(self.apps_repo_path, [
+            "rev-list", "--objects", "--missing=print", f"{from_commit}..{to_commit}"
+        ])
+        missing = [line[1:] for line in result.stdout.splitlines() if line.startswith('?')]
+        if not missing:
+            return
+        logger.info(f"Fetching {len(missing)} missing blobs from {promisor} in the apps repository...")
+        # 与git按需下载时使用的参数相同，按对象id批量拉取
+        self.run_git_command(self.apps_repo_path, [
+            "-c", "fetch.negotiationAlgorithm=noop", "fetch", promisor, "--no-tags", "--no-write-fetch-head",
+            "--recurse-submodules=no", "--filter=blob:none", "--stdin"
+        ], input="\n".join(missing) + "\n")
+    
+    def unlink_object_store(self):
+        """解除共享：先把依赖apps仓库的对象复制到本仓库，再移除alternates和remote"""
+        alternates_file = self.get_objects_dir(self.terminus_apps_origin_path) / "info" / "alternates"
+        source_objects = str(self.get_objects_dir(self.apps_repo_path))
+        if alternates_file.exists():
+            logger.info("Repacking terminus-apps-origin to drop the dependency on the apps object store...")
+            self.run_git_command(self.terminus_apps_origin_path, ["repack", "-a", "-d"])
+            remaining = [line for line in alternates_file.read_text(encoding='utf-8').splitlines()
+                         if line.strip() and line.strip() != source_objects]
+            if remaining:
+                alternates_file.write_text("\n".join(remaining) + "\n", encoding='utf-8')
+            else:
+                alternates_file.unlink()
+        result = self.run_git_command(self.terminus_apps_origin_path, ["remote", "get-url", SYNC_SOURCE_REMOTE], check=False)
+        if result.returncode == 0:
+            self.run_git_command(self.terminus_apps_origin_path, ["remote", "remove", SYNC_SOURCE_REMOTE])
+        logger.info("Object store unlinked")
+    
+    def read_commit_changes(self, commit_hash: str) -> List[Tuple[str, str, str]]:
+        """读取提交相对父提交的变更，返回 [(新mode, 新对象id, 路径)]，删除的文件mode为0、对象id全为0"""
+        result = self.run_git_command(self.terminus_apps_origin_path, [
+            "diff-tree", "-r", "-z", "--no-commit-id", "--no-renames", commit_hash
+        ])
+        changes = []
+        fields = result.stdout.split('\0')
+        # -z 格式：":旧mode 新mode 旧id 新id 状态\0路径\0"
+        for meta, path in zip(fields[0::2], fields[1::2]):
+            if not meta.startswith(':'):
+                continue
+            _, new_mode, _, new_id, status = meta[1:].split(' ', 4)
+            if status == 'D':
+                changes.append(("0", NULL_OBJECT_ID, path))
+            else:
+                changes.append((new_mode, new_id, path))
+        return changes
+    
+    def replay_commits_by_object_id(self, commits: List[Dict]) -> bool:
+        """共享对象库时的回放：直接把源提交的对象id写入索引并提交，不读写文件内容、不重新计算哈希
+        
+        工作区只在全部提交完成后更新一次
+        """
+        target = self.terminus_apps_origin_path
+        start_commit = self.get_commit_hash(target)
+        logger.info(f"Replaying {len(commits)} commits by object id...")
+        
+        replayed = False
+        try:
+            for commit in commits:
+                changes = self.read_commit_changes(commit['hash'])
+                if not changes:
+                    logger.info(f"No changes to commit for {commit['hash'][:8]}, skipping...")
+                    continue
+                
+                index_info = ''.join(f"{mode} {object_id}\t{path}\0" for mode, object_id, path in changes)
+                self.run_git_command(target, ["update-index", "-z", "--index-info"], input=index_info)
+                
+                # 暂存区与HEAD相同说明目标仓库已经包含这些改动
+                if self.run_git_command(target, ["diff", "--cached", "--quiet"], check=False).returncode == 0:
+                    logger.info(f"No changes to commit for {commit['hash'][:8]}, skipping...")
+                    continue
+                
+                self.run_git_command(target, [
+                    "commit", "-m", commit['message'],
+                    "--author", f"{commit['author']} <{commit['author']}@users.noreply.github.com>",
+                    "--date", commit['date']
+                ])
+                logger.info(f"Successfully replayed: {commit['hash'][:8]}")
+            replayed = True
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Failed to replay commits by object id: {e}")
+        finally:
+            # 更新工作区失败只记录日志，不掩盖回放时抛出的原始异常
+            worktree_updated = self.update_worktree_from(start_commit)
+        
+        return replayed and worktree_updated
+    
+    def update_worktree_from(self, start_commit: str) -> bool:
+        """工作区仍是起始提交的内容时，一次两路合并把索引和工作区更新到HEAD（包括删除的文件）；失败时返回False"""
+        target = self.terminus_apps_origin_path
+        try:
+            # 先让索引回到起始tree，再两路合并到当前HEAD
+            self.run_git_command(target, ["read-tree", start_commit])
+            # read-tree后的索引没有文件的stat信息，先刷新，否则两路合并会认为工作区文件已被修改
+            self.run_git_command(target, ["update-index", "-q", "--refresh"], check=False)
+            self.run_git_command(target, ["read-tree", "-m", "-u", start_commit, "HEAD"])
+            return True
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Failed to update work tree from {start_commit[:8]} to HEAD: {e}")
+            return False
+    
+    def get_replay_engine(self) -> str:
+        """提交回放方式：cherry-pick（默认，逐个写文件并提交）/ fast-import（一个fast-import进程完成全部提交）"""
+        engine = self.get_sync_setting("replay_engine") or "cherry-pick"
+        if engine not in ("cherry-pick", "fast-import"):
+            raise ValueError(f"Unknown replay_engine: {engine}")
+        return engine
+    
+    def read_changes_bulk(self, commit_hashes: List[str]) -> Dict[str, List[Tuple[str, str, bytes]]]:
+        """一次 diff-tree --stdin 读取所有源提交的变更，返回 {commit: [(新mode, 新对象id, 路径)]}（删除时对象id全为0）"""
+        result = subprocess.run(
+            ["git", "diff-tree", "--stdin", "-r", "-z", "--no-renames"],
+            cwd=self.apps_repo_path, input=("\n".join(commit_hashes) + "\n").encode(),
+            capture_output=True, check=True
+        )
+        changes = {commit_hash: [] for commit_hash in commit_hashes}
+        fields = result.stdout.split(b'\0')
+        # 输出格式："<commit>\0" 后跟若干 ":旧mode 新mode 旧id 新id 状态\0路径\0"；根提交和合并提交没有输出
+        current, i = None, 0
+        while i < len(fields):
+            field = fields[i]
+            if field.startswith(b':'):
+                _, new_mode, _, new_id, status = field[1:].decode().split(' ', 4)
+                changes[current].append((new_mode, new_id, fields[i + 1]))
+                i += 2
+            else:
+                if field:
+                    current = field.decode()
+                i += 1
+        return changes
+    
+    def read_tree_entries(self, repo_path: Path, commit_hash: str) -> Dict[bytes, Tuple[str, str]]:
+        """读取提交的完整文件列表 {路径: (mode, 对象id)}"""
+        result = subprocess.run(["git", "ls-tree", "-r", "-z", "--full-tree", commit_hash],
+                                cwd=repo_path, capture_output=True, check=True)
+        entries = {}
+        for entry in result.stdout.split(b'\0'):
+            if entry:
+                meta, path = entry.split(b'\t', 1)
+                mode, _, object_id = meta.decode().split(' ')
+                entries[path] = (mode, object_id)
+        return entries
+    
+    @staticmethod
+    def fast_import_path(path: bytes) -> bytes:
+        """fast-import中的路径：以引号开头或包含换行时需要C风格转义"""
+        if path.startswith(b'"') or b'\n' in path:
+            return b'"' + path.replace(b'\\', b'\\\\').replace(b'"', b'\\"').replace(b'\n', b'\\n') + b'"'
+        return path
+    
+    def fast_import_commits(self, commits: List[Dict], ref: str, start_commit: str) -> int:
+        """把源提交的文件变更生成一个fast-import流，在目标仓库中以start_commit为起点写入ref，返回写入的提交数
+        
+        - 变更只应用到ref上，不读写工作区
+        - 与逐个提交时一样，没有实际变化的提交会被跳过
+        - 共享对象库时直接引用对象id；否则从apps仓库流式读取blob内容，每个blob只写入一次
+        """
+        target = self.terminus_apps_origin_path
+        by_object_id = bool(self.get_object_sharing_mode())
+        changes = self.read_changes_bulk([commit['hash'] for commit in commits])
+        tree = self.read_tree_entries(target, start_commit)
+        committer = self.run_git_command(target, ["var", "GIT_COMMITTER_IDENT"]).stdout.strip()
+        
+        importer = subprocess.Popen(["git", "fast-import", "--quiet", "--done"], cwd=target,
+                                    stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        blobs = None if by_object_id else subprocess.Popen(
+            ["git", "cat-file", "--batch"], cwd=self.apps_repo_path, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        marks: Dict[str, int] = {}
+        written = 0
+        out = importer.stdin
+        
+        def blob_ref(object_id: str) -> bytes:
+            """blob在流中的引用：共享对象库时为对象id，否则为写入流中的mark"""
+            if by_object_id:
+                return object_id.encode()
+            if object_id not in marks:
+                blobs.stdin.write(object_id.encode() + b'\n')
+                blobs.stdin.flush()
+                header = blobs.stdout.readline().split()
+                if len(header) != 3:
+                    raise subprocess.CalledProcessError(1, ["git", "cat-file", "--batch"],
+                                                        stderr=f"object {object_id} missing in apps repository")
+                remaining = int(header[2])
+                marks[object_id] = len(marks) + 1
+                out.write(b"blob\nmark :%d\ndata %d\n" % (marks[object_id], remaining))
+                while remaining:
+                    chunk = blobs.stdout.read(min(BLOB_CHUNK_SIZE, remaining))
+                    out.write(chunk)
+                    remaining -= len(chunk)
+                # 内容后的换行
+                blobs.stdout.read(1)
+                out.write(b"\n")
+            return b":%d" % marks[object_id]
+        
+        try:
+            for commit in commits:
+                lines = []
+                for mode, object_id, path in changes.get(commit['hash'], []):
+                    if object_id == NULL_OBJECT_ID:
+                        if tree.pop(path, None) is not None:
+                            lines.append(b"D " + self.fast_import_path(path))
+                    elif tree.get(path) != (mode, object_id):
+                        tree[path] = (mode, object_id)
+                        # 子模块只能按对象id引用
+                        data_ref = object_id.encode() if mode == "160000" else blob_ref(object_id)
+                        lines.append(b"M %s %s %s" % (mode.encode(), data_ref, self.fast_import_path(path)))
+                if not lines:
+                    logger.info(f"No changes to commit for {commit['hash'][:8]}, skipping...")
+                    continue
+                
+                message = commit['message'].encode('utf-8')
+                author = f"{commit['author']} <{commit['author']}@users.noreply.github.com> {commit['timestamp']}"
+                out.write(f"commit {ref}\n".encode())
+                out.write(f"author {author}\ncommitter {committer}\n".encode('utf-8'))
+                out.write(b"data %d\n%s\n" % (len(message), message))
+                if written == 0:
+                    out.write(f"from {start_commit}\n".encode())
+                out.write(b"\n".join(lines) + b"\n\n")
+                written += 1
+            out.write(b"done\n")
+            out.close()
+        except BrokenPipeError:
+            pass
+        finally:
+            if blobs is not None:
+                blobs.stdin.close()
+                blobs.wait()
+        
+        stderr = importer.stderr.read().decode(errors='replace')
+        if importer.wait() != 0:
+            raise subprocess.CalledProcessError(importer.returncode, ["git", "fast-import"], stderr=stderr)
+        return written
+    
+    def replay_commits_with_fast_import(self, commits: List[Dict]) -> bool:
+        """用一个fast-import进程把全部提交写入当前分支，最后一次性更新索引和工作区"""
+        target = self.terminus_apps_origin_path
+        start_commit = self.get_commit_hash(target)
+        branch_ref = self.run_git_command(target, ["symbolic-ref", "HEAD"]).stdout.strip()
+        logger.info(f"Replaying {len(commits)} commits with git fast-import...")
+        
+        started = time.perf_counter()
+        try:
+            written = self.fast_import_commits(commits, branch_ref, start_commit)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"git fast-import failed: {e}")
+            logger.error("stderr: %s", clip(e.stderr))
+            return False
+        # 索引和工作区仍是起始提交：刷新索引后两路合并到新的HEAD
+        if not self.update_worktree_from(start_commit):
+            # 分支已前进但工作区没有更新：把分支退回起始提交，保持分支、索引和工作区一致
+            self.run_git_command(target, ["update-ref", "-m", "sync: roll back fast-import", branch_ref, start_commit])
+            self.run_git_command(target, ["read-tree", start_commit], check=False)
+            self.run_git_command(target, ["update-index", "-q", "--refresh"], check=False)
+            logger.error(f"Rolled back {branch_ref} to {start_commit[:8]} after the work tree update failed")
+            return False
+        logger.info(f"Imported {written}/{len(commits)} commits in {time.perf_counter() - started:.2f}s")
+        return True
+    
+    def verify_replay(self, commits: List[Dict], start_commit: str) -> bool:
+        """把fast-import的结果写入临时ref，与当前HEAD（其他回放方式的结果）比较tree是否完全一致
+        
+        只报告差异，不影响同步结果。已知差异：逐个提交（cherry-pick）只写文件内容，不保留可执行权限，
+        符号链接会变成内容为链接目标的普通文件；fast-import和按对象id回放会保留mode
+        """
+        target = self.terminus_apps_origin_path
+        verify_ref = "refs/sync-verify/fast-import"
+        try:
+            self.fast_import_commits(commits, verify_ref, start_commit)
+            # 所有提交都被跳过时fast-import不会创建ref
+            imported = self.run_git_command(target, ["rev-parse", "--verify", "--quiet", f"{verify_ref}^{{tree}}"], check=False)
+            imported_tree = imported.stdout.strip() if imported.returncode == 0 else \
+                self.get_commit_hash(target, f"{start_commit}^{{tree}}")
+            replayed_tree = self.get_commit_hash(target, "HEAD^{tree}")
+            if imported_tree == replayed_tree:
+                logger.info(f"Replay verified: fast-import produced the same tree {replayed_tree[:8]}")
+                return True
+            diff = self.run_git_command(target, ["diff-tree", "-r", "--raw", "--no-abbrev", replayed_tree, imported_tree],
+                                        check=False)
+            entries = [line.split('\t', 1) for line in diff.stdout.splitlines() if line.startswith(':')]
+            # 对象id相同、只有mode不同：逐个提交不保留可执行权限和符号链接的已知差异
+            mode_only = [path for meta, path in entries if meta.split()[2] == meta.split()[3]]
+            other = [path for meta, path in entries if meta.split()[2] != meta.split()[3]]
+            if mode_only:
+                logger.warning(f"Replay differs from fast-import only in file mode for {len(mode_only)} paths "
+                               f"(cherry-pick does not keep executable bits or symlinks): {mode_only[:20]}")
+            if other:
+                logger.error(f"Replay mismatch: HEAD tree {replayed_tree[:8]} != fast-import tree {imported_tree[:8]}, "
+                             f"{len(other)} paths differ in content: {other[:20]}")
+            return False
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Replay verification could not run: {e}")
+            return False
+        finally:
+            self.run_git_command(target, ["update-ref", "-d", verify_ref], check=False)
+    
+    def validate_changed_folders(self, base_ref: str, sync_commit: str,
+                                 cache_file: str = DEFAULT_CACHE_FILE) -> List[str]:
+        """校验同步范围内有改动的文件夹在sync提交中的Chart.yaml和OlaresManifest.yaml，返回未通过的文件夹
+        
+        直接读取提交中的文件，不需要检出；已被删除的文件夹不校验
+        """
+        result = self.run_git_command(self.apps_repo_path, [
+            "diff", "--name-only", "-z", "--no-renames", base_ref, sync_commit
+        ])
+        folders = sorted({path.split('/', 1)[0] for path in result.stdout.split('\0') if '/' in path})
+        if not folders:
+            return []
+        files = commit_files(self.apps_repo_path, sync_commit, folders)
+        files = {folder: contents for folder, contents in files.items() if any(contents.values())}
+        return log_report(validate_folders(files, ValidationCache(cache_file)))
+    
+    def preview_commits(self, commits: List[Dict], base_ref: str, sync_commit: str,
+                        sort_by: str = "order", report_file: Optional[str] = None) -> List[Dict]:
+        """干运行：并行统计每个提交相对父提交新增/修改/删除的文件、行数和字节变化，不改动工作区"""
+        result = self.run_git_command(self.apps_repo_path, ["rev-list", "--parents", "--no-walk", "--stdin"],
+                                      input="\n".join(commit['hash'] for commit in commits) + "\n")
+        parents = {}
+        for line in result.stdout.splitlines():
+            hashes = line.split()
+            parents[hashes[0]] = hashes[1] if len(hashes) > 1 else EMPTY_TREE
+        jobs = [(f"{commit['hash'][:8]} {commit['message']}", parents[commit['hash']], commit['hash'])
+                for commit in commits]
+        rows = impact_report(self.apps_repo_path, jobs)
+        print_summary(rows, sort_by, show_unchanged=True)
+        
+        # 同一文件可能被多个提交修改，另外给出整个范围的净变化
+        net = impact_report(self.apps_repo_path, [("net", base_ref, sync_commit)])[0]
+        logger.info(f"Net change {base_ref[:12]}..{sync_commit[:8]}: {net['added']} added, {net['changed']} changed, "
+                    f"{net['removed']} removed, {net['bytes_delta']:+d} bytes")
+        if report_file:
+            write_json(rows + [dict(net, name=f"net {base_ref}..{sync_commit}")], report_file, sort_by)
+        return rows
     
     def create_sync_branch(self, branch_name: str) -> bool:
         """创建同步分支"""
@@ -205,50 +694,68 @@ class AppSyncManager:
             logger.info("No commits to cherry-pick")
             return True
         
+        if self.get_replay_engine() == "fast-import":
+            return self.replay_commits_with_fast_import(commits)
+        
+        start_commit = self.get_commit_hash(self.terminus_apps_origin_path)
+        if self.get_object_sharing_mode():
+            # 共享对象库时直接按对象id回放
+            replayed = self.replay_commits_by_object_id(commits)
+        else:
+            replayed = self.cherry_pick_each(commits)
+        
+        # 与fast-import的结果对比；此时同步分支已经写入，差异只报告，不让同步失败
+        if replayed and self.get_sync_setting("verify_replay"):
+            self.verify_replay(commits, start_commit)
+        return replayed
+    
+    def cherry_pick_each(self, commits: List[Dict]) -> bool:
+        """逐个提交：写入文件内容后提交"""
         logger.info(f"Cherry-picking {len(commits)} commits...")
         
         for commit in commits:
-            try:
-                logger.info(f"Cherry-picking commit: {commit['hash'][:8]} - {commit['message']}")
+            with log_context(commit=commit['hash'][:12]):
+                try:
+                    logger.info(f"Cherry-picking commit: {commit['hash'][:8]} - {commit['message']}")
                 
-                # 直接使用sync分支的版本，确保文件内容完全一致
-                logger.debug(f"Ensuring sync version for commit {commit['hash'][:8]}...")
-                self.ensure_sync_version(commit['hash'])
+                    # 直接使用sync分支的版本，确保文件内容完全一致
+                    logger.debug(f"Ensuring sync version for commit {commit['hash'][:8]}...")
+                    self.ensure_sync_version(commit['hash'])
                 
-                # 检查是否有更改需要提交
-                status_result = self.run_git_command(
-                    self.terminus_apps_origin_path, 
-                    ["status", "--porcelain"], 
-                    check=False
-                )
+                    # 检查是否有更改需要提交
+                    status_result = self.run_git_command(
+                        self.terminus_apps_origin_path, 
+                        ["status", "--porcelain"], 
+                        check=False
+                    )
                 
-                if status_result.stdout.strip():
-                    # 有更改，提交它们
-                    self.run_git_command(self.terminus_apps_origin_path, [
-                        "commit", "-m", commit['message'],
-                        "--author", f"{commit['author']} <{commit['author']}@users.noreply.github.com>",
-                        "--date", commit['date']
-                    ])
-                    logger.info(f"Successfully cherry-picked: {commit['hash'][:8]}")
-                else:
-                    # 没有更改，检查是否真的没有差异
-                    # 比较源提交和目标仓库的当前状态
-                    if self.has_actual_changes(commit['hash']):
-                        logger.warning(f"Commit {commit['hash'][:8]} has changes but git status shows no changes. Forcing commit...")
-                        # 强制更新文件并提交
-                        self.force_update_files(commit['hash'])
+                    if status_result.stdout.strip():
+                        # 有更改，提交它们
                         self.run_git_command(self.terminus_apps_origin_path, [
                             "commit", "-m", commit['message'],
                             "--author", f"{commit['author']} <{commit['author']}@users.noreply.github.com>",
                             "--date", commit['date']
                         ])
-                        logger.info(f"Force committed changes: {commit['hash'][:8]}")
+                        logger.info(f"Successfully cherry-picked: {commit['hash'][:8]}")
                     else:
-                        logger.info(f"No changes to commit for {commit['hash'][:8]}, skipping...")
+                        # 没有更改，检查是否真的没有差异
+                        # 比较源提交和目标仓库的当前状态
+                        if self.has_actual_changes(commit['hash']):
+                            logger.warning(f"Commit {commit['hash'][:8]} has changes but git status shows no changes. Forcing commit...")
+                            # 强制更新文件并提交
+                            self.force_update_files(commit['hash'])
+                            self.run_git_command(self.terminus_apps_origin_path, [
+                                "commit", "-m", commit['message'],
+                                "--author", f"{commit['author']} <{commit['author']}@users.noreply.github.com>",
+                                "--date", commit['date']
+                            ])
+                            logger.info(f"Force committed changes: {commit['hash'][:8]}")
+                        else:
+                            logger.info(f"No changes to commit for {commit['hash'][:8]}, skipping...")
                 
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Failed to cherry-pick commit {commit['hash'][:8]}: {e}")
-                return False
+                except subprocess.CalledProcessError as e:
+                    logger.error(f"Failed to cherry-pick commit {commit['hash'][:8]}: {e}")
+                    return False
         
         return True
     
@@ -256,12 +763,7 @@ class AppSyncManager:
         """检查源提交是否与目标仓库当前状态有实际差异"""
         try:
             # 获取源提交中修改的文件列表
-            files_result = self.run_git_command(
-                self.apps_repo_path,
-                ["diff-tree", "--no-commit-id", "--name-only", "-r", commit_hash]
-            )
-            
-            modified_files = [f.strip() for f in files_result.stdout.strip().split('\n') if f.strip()]
+            modified_files = self.read_changed_paths(commit_hash)
             
             if not modified_files:
                 return False
@@ -269,21 +771,8 @@ class AppSyncManager:
             # 检查每个文件是否有差异
             for file_path in modified_files:
                 try:
-                    # 获取源文件内容
-                    source_content = self.run_git_command(
-                        self.apps_repo_path,
-                        ["show", f"{commit_hash}:{file_path}"]
-                    )
-                    
-                    # 获取目标文件内容
-                    target_file = self.terminus_apps_origin_path / file_path
-                    if target_file.exists():
-                        target_content = target_file.read_text(encoding='utf-8')
-                    else:
-                        target_content = ""
-                    
-                    # 比较内容
-                    if source_content.stdout != target_content:
+                    # 按块比较源文件和目标文件的原始字节
+                    if not self.blob_matches_file(commit_hash, file_path):
                         logger.debug(f"File {file_path} has differences")
                         return True
                         
@@ -301,163 +790,194 @@ class AppSyncManager:
             return False
     
     def force_update_files(self, commit_hash: str):
-        """强制更新文件，确保git检测到变更"""
+        """强制重新写入并暂存提交中改动的文件，确保git检测到变更"""
         try:
-            # 获取commit中修改的文件列表
-            files_result = self.run_git_command(
-                self.apps_repo_path,
-                ["diff-tree", "--no-commit-id", "--name-only", "-r", commit_hash]
-            )
-            
-            modified_files = [f.strip() for f in files_result.stdout.strip().split('\n') if f.strip()]
+            modified_files = self.read_changed_paths(commit_hash)
             
             if not modified_files:
                 return
             
             logger.debug(f"Force updating {len(modified_files)} files...")
-            
-            for file_path in modified_files:
-                try:
-                    # 从apps仓库获取文件内容
-                    file_content = self.run_git_command(
-                        self.apps_repo_path,
-                        ["show", f"{commit_hash}:{file_path}"]
-                    )
-                    
-                    # 写入文件
-                    full_path = self.terminus_apps_origin_path / file_path
-                    full_path.parent.mkdir(parents=True, exist_ok=True)
-                    full_path.write_text(file_content.stdout, encoding='utf-8')
-                    
-                    # 强制添加到暂存区
-                    self.run_git_command(self.terminus_apps_origin_path, ["add", file_path])
-                    logger.debug(f"Force updated file: {file_path}")
-                    
-                except subprocess.CalledProcessError as e:
-                    # 如果文件在commit中不存在，删除它
-                    full_path = self.terminus_apps_origin_path / file_path
-                    if full_path.exists():
-                        full_path.unlink()
-                        self.run_git_command(self.terminus_apps_origin_path, ["rm", file_path])
-                        logger.debug(f"Force removed file: {file_path}")
-            
-            # 强制更新git索引
-            self.run_git_command(self.terminus_apps_origin_path, ["add", "."])
-            logger.debug("Force updated git index")
+            updated, removed = self.apply_sync_version(commit_hash, modified_files)
+            logger.debug(f"Force updated {len(updated)} files, removed {len(removed)} files")
             
         except Exception as e:
             logger.error(f"Error force updating files: {e}")
             raise
     
+    def read_status_entries(self) -> List[Dict]:
+        """解析 git status --porcelain=v2 -z，返回 [{kind, xy, path, orig_path}]
+        
+        kind: 1 普通变更 / 2 重命名或复制 / u 未合并 / ? 未跟踪；路径不转义，包含空格、引号或非ASCII字符时也能正确解析
+        """
+        result = subprocess.run(["git", "status", "--porcelain=v2", "-z", "--untracked-files=all"],
+                                cwd=self.terminus_apps_origin_path, capture_output=True, check=True)
+        fields = result.stdout.split(b'\0')
+        entries = []
+        i = 0
+        while i < len(fields):
+            field = fields[i].decode('utf-8', 'surrogateescape')
+            i += 1
+            if not field:
+                continue
+            kind = field[0]
+            if kind == '1':
+                # 1 XY sub mH mI mW hH hI path
+                parts = field.split(' ', 8)
+                entries.append({'kind': kind, 'xy': parts[1], 'path': parts[8], 'orig_path': None})
+            elif kind == '2':
+                # 2 XY sub mH mI mW hH hI Xscore path\0origPath
+                parts = field.split(' ', 9)
+                orig_path = fields[i].decode('utf-8', 'surrogateescape')
+                i += 1
+                entries.append({'kind': kind, 'xy': parts[1], 'path': parts[9], 'orig_path': orig_path})
+            elif kind == 'u':
+                # u XY sub m1 m2 m3 mW h1 h2 h3 path
+                parts = field.split(' ', 10)
+                entries.append({'kind': kind, 'xy': parts[1], 'path': parts[10], 'orig_path': None})
+            elif kind in '?!':
+                entries.append({'kind': kind, 'xy': kind * 2, 'path': field[2:], 'orig_path': None})
+        return entries
+    
+    def split_paths_by_existence(self, repo_path: Path, commit_hash: str, paths: List[str]) -> Tuple[List[str], List[str]]:
+        """一次 cat-file --batch-check 判断路径在提交中是否存在，返回 (存在的路径, 不存在的路径)"""
+        result = subprocess.run(
+            ["git", "cat-file", "--batch-check"], cwd=repo_path, capture_output=True, check=True,
+            input=''.join(f"{commit_hash}:{path}\n" for path in paths).encode('utf-8', 'surrogateescape')
+        )
+        existing, missing = [], []
+        for path, line in zip(paths, result.stdout.decode('utf-8', 'surrogateescape').splitlines()):
+            (missing if line.endswith(" missing") else existing).append(path)
+        return existing, missing
+    
+    def stream_blobs_to_worktree(self, commit_hash: str, paths: List[str]):
+        """一个 cat-file --batch 进程把apps仓库中多个文件的内容写入目标仓库工作区（原子替换，保留已有文件的权限）"""
+        with subprocess.Popen(["git", "cat-file", "--batch"], cwd=self.apps_repo_path,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE) as process:
+            for path in paths:
+                process.stdin.write(f"{commit_hash}:{path}\n".encode('utf-8', 'surrogateescape'))
+                process.stdin.flush()
+                header = process.stdout.readline().split()
+                if len(header) != 3 or header[1] != b'blob':
+                    raise subprocess.CalledProcessError(1, ["git", "cat-file", "--batch"],
+                                                        stderr=f"{commit_hash}:{path} is not a blob")
+                remaining = int(header[2])
+                full_path = self.terminus_apps_origin_path / path
+                full_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = full_path.with_name(f".{full_path.name}.sync-tmp")
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        while remaining:
+                            chunk = process.stdout.read(min(BLOB_CHUNK_SIZE, remaining))
+                            f.write(chunk)
+                            remaining -= len(chunk)
+                    # 内容后的换行
+                    process.stdout.read(1)
+                    if full_path.is_file():
+                        shutil.copymode(full_path, tmp_path)
+                    os.replace(tmp_path, full_path)
+                finally:
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+            process.stdin.close()
+    
+    def apply_sync_version(self, commit_hash: str, paths: List[str]) -> Tuple[List[str], List[str]]:
+        """把一组路径批量设置为sync提交中的版本并暂存，返回 (已更新的路径, 已删除的路径)
+        
+        - 目标仓库能读取该提交（共享对象库）时用一次 git checkout <commit> --pathspec-from-file
+        - 否则用一个 cat-file --batch 进程写入文件，再一次 git add
+        - 提交中不存在的路径用一次 git rm 删除
+        进程数量与路径数量无关
+        """
+        target = self.terminus_apps_origin_path
+        paths = list(dict.fromkeys(paths))
+        if not paths:
+            return [], []
+        
+        # 换行符会破坏 cat-file 的逐行输入，这类路径单独处理
+        odd_paths = [path for path in paths if '\n' in path]
+        paths = [path for path in paths if '\n' not in path]
+        
+        shared = self.run_git_command(target, ["cat-file", "-e", f"{commit_hash}^{{commit}}"], check=False).returncode == 0
+        existing, missing = self.split_paths_by_existence(target if shared else self.apps_repo_path, commit_hash, paths)
+        pathspec = lambda items: '\0'.join(items) + '\0'
+        
+        if existing:
+            if shared:
+                # 同时更新索引和工作区，未合并的路径也会被解决
+                self.run_git_command(target, [
+                    "--literal-pathspecs", "checkout", commit_hash, "--pathspec-from-file=-", "--pathspec-file-nul"
+                ], input=pathspec(existing))
+            else:
+                self.stream_blobs_to_worktree(commit_hash, existing)
+                self.run_git_command(target, [
+                    "--literal-pathspecs", "add", "-f", "--pathspec-from-file=-", "--pathspec-file-nul"
+                ], input=pathspec(existing))
+        
+        for path in odd_paths:
+            try:
+                self.materialize_blob(commit_hash, path)
+                self.run_git_command(target, ["--literal-pathspecs", "add", "-f", "--", path])
+                existing.append(path)
+            except subprocess.CalledProcessError:
+                missing.append(path)
+        
+        if missing:
+            # 未跟踪的文件git rm不会删除，直接从工作区删除
+            for path in missing:
+                full_path = target / path
+                if full_path.is_file() or full_path.is_symlink():
+                    full_path.unlink()
+            self.run_git_command(target, [
+                "--literal-pathspecs", "rm", "-q", "-f", "--cached", "--ignore-unmatch",
+                "--pathspec-from-file=-", "--pathspec-file-nul"
+            ], input=pathspec(missing))
+        
+        return existing, missing
+    
     def resolve_conflicts_with_sync(self, commit_hash: str):
         """解决冲突，使用来自sync的文件版本"""
         try:
-            # 获取所有修改的文件（包括冲突文件）
-            status_result = self.run_git_command(
-                self.terminus_apps_origin_path, 
-                ["status", "--porcelain"], 
-                check=False
-            )
-            
+            # 获取所有修改的文件（包括冲突文件）；重命名时新旧路径都需要处理
             modified_files = []
-            for line in status_result.stdout.strip().split('\n'):
-                if line.strip():
-                    # 获取文件路径（去掉状态标记）
-                    file_path = line[3:].strip()
-                    modified_files.append(file_path)
+            for entry in self.read_status_entries():
+                if entry['kind'] == '!':
+                    continue
+                modified_files.append(entry['path'])
+                if entry['orig_path']:
+                    modified_files.append(entry['orig_path'])
             
             if not modified_files:
                 logger.info("No files to resolve conflicts for")
                 return
             
             logger.info(f"Resolving conflicts for {len(modified_files)} files using sync version...")
-            
-            for file_path in modified_files:
-                try:
-                    # 从apps仓库获取文件内容
-                    file_content = self.run_git_command(
-                        self.apps_repo_path,
-                        ["show", f"{commit_hash}:{file_path}"]
-                    )
-                    
-                    # 写入文件
-                    full_path = self.terminus_apps_origin_path / file_path
-                    full_path.parent.mkdir(parents=True, exist_ok=True)
-                    full_path.write_text(file_content.stdout, encoding='utf-8')
-                    
-                    # 添加到暂存区
-                    self.run_git_command(self.terminus_apps_origin_path, ["add", file_path])
-                    logger.debug(f"Resolved conflict for file: {file_path}")
-                    
-                except subprocess.CalledProcessError as e:
-                    # 如果文件在commit中不存在，删除它
-                    full_path = self.terminus_apps_origin_path / file_path
-                    if full_path.exists():
-                        full_path.unlink()
-                        self.run_git_command(self.terminus_apps_origin_path, ["rm", file_path])
-                        logger.debug(f"Removed file: {file_path}")
-                    else:
-                        logger.debug(f"File {file_path} already removed or doesn't exist")
-            
-            # 确保所有更改都已暂存
-            self.run_git_command(self.terminus_apps_origin_path, ["add", "."])
+            updated, removed = self.apply_sync_version(commit_hash, modified_files)
+            logger.debug(f"Resolved {len(updated)} files, removed {len(removed)} files")
             
         except Exception as e:
             logger.error(f"Error resolving conflicts: {e}")
             raise
     
+    def read_changed_paths(self, commit_hash: str) -> List[str]:
+        """读取提交相对父提交改动的路径；-z 输出不转义，包含空格、引号或非ASCII字符的路径也能原样使用"""
+        result = self.run_git_command(self.apps_repo_path, [
+            "diff-tree", "-r", "-z", "--no-commit-id", "--no-renames", "--name-only", commit_hash
+        ])
+        return [path for path in result.stdout.split('\0') if path]
+    
     def ensure_sync_version(self, commit_hash: str):
-        """确保使用sync分支的版本，覆盖所有文件"""
+        """确保提交中改动的文件都是sync分支的版本：批量写入并暂存，提交中已删除的文件同时删除"""
         try:
-            # 获取commit中修改的文件列表
-            files_result = self.run_git_command(
-                self.apps_repo_path,
-                ["diff-tree", "--no-commit-id", "--name-only", "-r", commit_hash]
-            )
-            
-            modified_files = [f.strip() for f in files_result.stdout.strip().split('\n') if f.strip()]
+            modified_files = self.read_changed_paths(commit_hash)
             
             if not modified_files:
                 logger.debug("No files modified in this commit")
                 return
             
             logger.debug(f"Ensuring sync version for {len(modified_files)} files...")
-            
-            files_updated = False
-            for file_path in modified_files:
-                try:
-                    # 从apps仓库获取文件内容
-                    file_content = self.run_git_command(
-                        self.apps_repo_path,
-                        ["show", f"{commit_hash}:{file_path}"]
-                    )
-                    
-                    # 写入文件
-                    full_path = self.terminus_apps_origin_path / file_path
-                    full_path.parent.mkdir(parents=True, exist_ok=True)
-                    full_path.write_text(file_content.stdout, encoding='utf-8')
-                    
-                    # 强制添加到暂存区（即使内容相同）
-                    self.run_git_command(self.terminus_apps_origin_path, ["add", file_path])
-                    files_updated = True
-                    logger.debug(f"Updated file: {file_path}")
-                    
-                except subprocess.CalledProcessError as e:
-                    # 如果文件在commit中不存在，删除它
-                    full_path = self.terminus_apps_origin_path / file_path
-                    if full_path.exists():
-                        full_path.unlink()
-                        self.run_git_command(self.terminus_apps_origin_path, ["rm", file_path])
-                        files_updated = True
-                        logger.debug(f"Removed file: {file_path}")
-                    else:
-                        logger.debug(f"File {file_path} already removed or doesn't exist")
-            
-            # 如果更新了文件但没有检测到变更，强制更新git索引
-            if files_updated:
-                # 强制更新索引，确保所有更改都被检测到
-                self.run_git_command(self.terminus_apps_origin_path, ["add", "."])
-                logger.debug("Forced git index update")
+            updated, removed = self.apply_sync_version(commit_hash, modified_files)
+            logger.debug(f"Updated {len(updated)} files, removed {len(removed)} files")
             
         except Exception as e:
             logger.error(f"Error ensuring sync version: {e}")
@@ -467,53 +987,15 @@ class AppSyncManager:
         """解决未合并的文件，使用sync分支的版本"""
         try:
             # 检查是否有未合并的文件
-            status_result = self.run_git_command(
-                self.terminus_apps_origin_path, 
-                ["status", "--porcelain"], 
-                check=False
-            )
-            
-            unmerged_files = []
-            for line in status_result.stdout.strip().split('\n'):
-                if line.strip() and (line.startswith('UU') or line.startswith('AA') or line.startswith('DD') or line.startswith('U')):
-                    file_path = line[3:].strip()
-                    unmerged_files.append(file_path)
+            unmerged_files = [entry['path'] for entry in self.read_status_entries() if entry['kind'] == 'u']
             
             if not unmerged_files:
                 logger.debug("No unmerged files found")
                 return
             
             logger.info(f"Resolving {len(unmerged_files)} unmerged files using sync version...")
-            
-            for file_path in unmerged_files:
-                try:
-                    # 从apps仓库获取文件内容
-                    file_content = self.run_git_command(
-                        self.apps_repo_path,
-                        ["show", f"{commit_hash}:{file_path}"]
-                    )
-                    
-                    # 写入文件
-                    full_path = self.terminus_apps_origin_path / file_path
-                    full_path.parent.mkdir(parents=True, exist_ok=True)
-                    full_path.write_text(file_content.stdout, encoding='utf-8')
-                    
-                    # 添加到暂存区
-                    self.run_git_command(self.terminus_apps_origin_path, ["add", file_path])
-                    logger.debug(f"Resolved unmerged file: {file_path}")
-                    
-                except subprocess.CalledProcessError as e:
-                    # 如果文件在commit中不存在，删除它
-                    full_path = self.terminus_apps_origin_path / file_path
-                    if full_path.exists():
-                        full_path.unlink()
-                        self.run_git_command(self.terminus_apps_origin_path, ["rm", file_path])
-                        logger.debug(f"Removed unmerged file: {file_path}")
-                    else:
-                        logger.debug(f"Unmerged file {file_path} already removed or doesn't exist")
-            
-            # 确保所有更改都已暂存
-            self.run_git_command(self.terminus_apps_origin_path, ["add", "."])
+            updated, removed = self.apply_sync_version(commit_hash, unmerged_files)
+            logger.debug(f"Resolved {len(updated)} unmerged files, removed {len(removed)} files")
             
         except Exception as e:
             logger.error(f"Error resolving unmerged files: {e}")
@@ -579,19 +1061,29 @@ class AppSyncManager:
             logger.error(f"Failed to create PR: {e}")
             return None
     
-    def sync(self, dry_run: bool = False):
-        """执行同步"""
+    def sync(self, dry_run: bool = False, fetch: bool = True, sort_by: str = "order",
+             report_file: Optional[str] = None) -> bool:
+        """执行同步（fetch为False时使用调用方已经拉取好的远程分支；干运行时按sort_by排序输出影响报告）
+        
+        返回是否成功：没有新提交时返回True；找不到分支、校验未通过、回放失败或PR未创建时返回False
+        """
         logger.info("Starting sync process...")
         
         try:
             # 1. 获取最新更改
-            self.fetch_latest_changes()
+            if fetch:
+                with log_context(phase="fetch"):
+                    self.fetch_latest_changes()
             
             # 2. 智能查找sync分支
             sync_branch_ref = self.find_remote_branch(self.apps_repo_path, "sync")
             if not sync_branch_ref:
                 logger.error("Cannot find sync branch in any remote repository")
-                return
+                return False
+            
+            object_sharing = self.get_object_sharing_mode()
+            if object_sharing:
+                self.link_object_store(object_sharing, sync_branch_ref)
             
             logger.info(f"Using sync branch: {sync_branch_ref}")
             current_sync_commit = self.get_commit_hash(self.apps_repo_path, sync_branch_ref)
@@ -599,7 +1091,7 @@ class AppSyncManager:
             
             if last_synced_commit == current_sync_commit:
                 logger.info("No new commits to sync")
-                return
+                return True
             
             # 3. 获取需要同步的commits
             if last_synced_commit:
@@ -613,7 +1105,7 @@ class AppSyncManager:
                 main_branch_ref = self.find_remote_branch(self.apps_repo_path, "main")
                 if not main_branch_ref:
                     logger.error("Cannot find main branch in any remote repository")
-                    return
+                    return False
                 
                 logger.info(f"Using main branch as baseline: {main_branch_ref}")
                 commits_to_sync = self.get_commit_log(
@@ -624,26 +1116,49 @@ class AppSyncManager:
             
             if not commits_to_sync:
                 logger.info("No commits to sync")
-                return
+                return True
             
             logger.info(f"Found {len(commits_to_sync)} commits to sync")
             
+            if object_sharing == "alternates":
+                with log_context(phase="fetch"):
+                    self.prefetch_missing_blobs(last_synced_commit or main_branch_ref, current_sync_commit)
+            
+            # 推送前校验有改动的文件夹；未通过时不同步，也不更新last_synced_commit
+            failed = []
+            if self.get_sync_setting("validate", True):
+                base_ref = last_synced_commit or main_branch_ref
+                with log_context(phase="validate"):
+                    failed = self.validate_changed_folders(base_ref, current_sync_commit)
+                if failed:
+                    logger.error(f"Validation failed for {len(failed)} folders: {failed}")
+            
             if dry_run:
+                # 校验未通过时也输出影响报告，便于确认问题范围
                 logger.info("Dry run mode - would sync the following commits:")
-                for commit in commits_to_sync:
-                    logger.info(f"  {commit['hash'][:8]}: {commit['message']}")
-                return
+                with log_context(phase="preview"):
+                    self.preview_commits(commits_to_sync, last_synced_commit or main_branch_ref, current_sync_commit,
+                                         sort_by, report_file)
+                if failed:
+                    logger.error("A real run would not sync these commits until validation passes")
+                return not failed
+            
+            if failed:
+                logger.error("Not syncing until the failing folders are fixed")
+                return False
             
             # 4. 创建同步分支
             branch_name = f"sync-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
             if not self.create_sync_branch(branch_name):
                 logger.error("Failed to create sync branch")
-                return
+                return False
             
             # 5. Cherry-pick commits
-            if not self.cherry_pick_commits(commits_to_sync):
+            with log_context(phase="replay"):
+                replayed = self.cherry_pick_commits(commits_to_sync)
+            if not replayed:
                 logger.error("Failed to cherry-pick commits")
-                return
+                return False
             
             # 6. 配置Git用户信息并推送分支
             github_config = self.config.get("github", {})
@@ -658,25 +1173,30 @@ class AppSyncManager:
             
             # 推送分支（使用token认证）
             github_config = self.config.get("github", {})
-            if github_config.get("token"):
-                # 使用token进行推送
-                remote_url = f"https://{github_config['token']}@github.com/{self.config['sync_apps']['target']['owner']}/{self.config['sync_apps']['target']['repo']}.git"
-                self.run_git_command(self.terminus_apps_origin_path, ["push", remote_url, branch_name])
-            else:
-                # 使用默认推送
-                self.run_git_command(self.terminus_apps_origin_path, ["push", "origin", branch_name])
+            with log_context(phase="push"):
+                if github_config.get("token"):
+                    # 使用token进行推送
+                    remote_url = f"https://{github_config['token']}@github.com/{self.config['sync_apps']['target']['owner']}/{self.config['sync_apps']['target']['repo']}.git"
+                    self.run_git_command(self.terminus_apps_origin_path, ["push", remote_url, branch_name])
+                else:
+                    # 使用默认推送
+                    self.run_git_command(self.terminus_apps_origin_path, ["push", "origin", branch_name])
             logger.info(f"Pushed branch: {branch_name}")
             
             # 7. 创建PR
-            pr_url = self.create_pull_request(branch_name, commits_to_sync)
+            with log_context(phase="pr"):
+                pr_url = self.create_pull_request(branch_name, commits_to_sync)
             
             # 8. 更新配置
             self.config["last_synced_commit"] = current_sync_commit
             self.save_config()
             
+            if not pr_url:
+                logger.error(f"Branch {branch_name} was pushed but the PR was not created")
+                return False
             logger.info("Sync completed successfully!")
-            if pr_url:
-                logger.info(f"PR created: {pr_url}")
+            logger.info(f"PR created: {pr_url}")
+            return True
             
         except Exception as e:
             logger.error(f"Sync failed: {e}")
@@ -687,21 +1207,47 @@ def main():
     parser = argparse.ArgumentParser(description="同步beclab/apps仓库的sync分支到Above-Os/terminus-apps")
     parser.add_argument("--dry-run", action="store_true", help="只显示将要同步的内容，不实际执行")
     parser.add_argument("--config", default="sync_config.json", help="配置文件路径")
+    parser.add_argument("--base-path", help="工作仓库根目录（默认读取环境变量SYNC_BASE_PATH或配置文件base_path）")
     parser.add_argument("--github-token", help="GitHub token (会覆盖配置文件中的设置)")
     parser.add_argument("--github-username", help="GitHub username (会覆盖配置文件中的设置)")
     parser.add_argument("--github-email", help="GitHub email (会覆盖配置文件中的设置)")
     parser.add_argument("--setup", action="store_true", help="交互式设置GitHub配置")
+    parser.add_argument("--object-sharing", choices=["alternates", "remote"],
+                        help="与apps仓库共享对象库，按对象id回放提交（本次运行覆盖配置文件中的设置）")
+    parser.add_argument("--unlink-objects", action="store_true", help="解除与apps仓库的对象库共享后退出")
+    parser.add_argument("--replay-engine", choices=["cherry-pick", "fast-import"],
+                        help="提交回放方式（本次运行覆盖配置文件中的设置）")
+    parser.add_argument("--verify-replay", action="store_true", help="回放后与fast-import的结果比较tree（只报告差异）")
+    parser.add_argument("--skip-validation", action="store_true", help="不校验Chart.yaml和OlaresManifest.yaml")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="order", help="干运行报告的排序方式（order为提交顺序）")
+    parser.add_argument("--report-json", help="干运行报告另存为JSON")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO", help="日志级别")
     
     args = parser.parse_args()
+    setup_logging('sync_apps.log', getattr(logging, args.log_level))
     
     try:
-        manager = AppSyncManager(args.config)
+        manager = AppSyncManager(args.config, args.base_path)
         
         # 交互式设置
         if args.setup:
             setup_github_config(manager)
             return
         
+        if args.unlink_objects:
+            manager.unlink_object_store()
+            return
+        
+        # 只覆盖本次运行，同步成功后保存配置时不会写入这些参数
+        if args.object_sharing:
+            manager.settings_overrides["object_sharing"] = args.object_sharing
+        if args.replay_engine:
+            manager.settings_overrides["replay_engine"] = args.replay_engine
+        if args.verify_replay:
+            manager.settings_overrides["verify_replay"] = True
+        if args.skip_validation:
+            manager.settings_overrides["validate"] = False
+        
         # 如果提供了GitHub信息，更新配置
         if args.github_token or args.github_username or args.github_email:
             if "github" not in manager.config:
@@ -717,7 +1263,7 @@ def main():
             manager.save_config()
             logger.info("GitHub configuration updated")
         
-        manager.sync(dry_run=args.dry_run)
+        manager.sync(dry_run=args.dry_run, sort_by=args.sort, report_file=args.report_json)
         
     except Exception as e:
         logger.error(f"Fatal error: {e}")
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+常驻同步：定期用 git ls-remote（或带ETag的GitHub refs接口）检查远程分支是否变化，
+只有相关分支移动时才并行fetch两个仓库，并只触发受影响的同步任务
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from repo_bootstrap import resolve_base_path, run_git
+from sync_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 每个仓库需要关注的分支
+WATCHED_REFS = {
+    "apps": ["main", "sync"],
+    "terminus-apps-origin": ["main"],
+}
+GITHUB_API = "https://api.github.com"
+# 任务失败后，相关分支没有再移动时按指数退避重试：第n次失败后等待 RETRY_DELAY * 2^(n-1) 秒，最长 MAX_RETRY_DELAY 秒
+RETRY_DELAY = 300.0
+MAX_RETRY_DELAY = 6 * 3600.0
+
+
+class RefPoller:
+    """查询远程分支的最新commit，返回 {分支: commit}"""
+
+    def __init__(self, method: str = "ls-remote", token: Optional[str] = None):
+        self.method = method
+        self.session = requests.Session() if method == "github" else None
+        if self.session is not None and token:
+            self.session.headers["Authorization"] = f"token {token}"
+        # GitHub接口的ETag和上次的结果：304（未变化）不消耗速率限制
+        self.etags: Dict[str, str] = {}
+        self.cache: Dict[str, Dict[str, str]] = {}
+
+    def poll(self, repo_path: Path, github_repo: Dict, branches: List[str]) -> Dict[str, str]:
+        """查询一个仓库"""
+        if self.method == "github":
+            return self.poll_github(github_repo, branches)
+        return self.poll_ls_remote(repo_path, branches)
+
+    def poll_ls_remote(self, repo_path: Path, branches: List[str]) -> Dict[str, str]:
+        """一次 git ls-remote 只查询关注的分支"""
+        result = run_git(repo_path, ["ls-remote", "origin"] + [f"refs/heads/{branch}" for branch in branches])
+        refs = {}
+        for line in result.stdout.splitlines():
+            sha, _, ref = line.partition('\t')
+            refs[ref[len("refs/heads/"):]] = sha
+        return refs
+
+    def poll_github(self, github_repo: Dict, branches: List[str]) -> Dict[str, str]:
+        """条件请求 matching-refs 接口，未变化时返回缓存的结果"""
+        key = f"{github_repo['owner']}/{github_repo['repo']}"
+        url = f"{GITHUB_API}/repos/{key}/git/matching-refs/heads/"
+        headers = {"Accept": "application/vnd.github.v3+json"}
+        if key in self.etags:
+            headers["If-None-Match"] = self.etags[key]
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return self.cache[key]
+        response.raise_for_status()
+        refs = {}
+        for item in response.json():
+            branch = item["ref"][len("refs/heads/"):]
+            if branch in branches:
+                refs[branch] = item["object"]["sha"]
+        if response.headers.get("ETag"):
+            self.etags[key] = response.headers["ETag"]
+        self.cache[key] = refs
+        return refs
+
+
+class SyncDaemon:
+    """轮询远程分支，按变化触发 sync_apps / sync_folders"""
+
+    def __init__(self, config_file: str = "sync_config.json", folders_file: str = "folders_to_sync.txt",
+                 base_path: Optional[str] = None, state_file: str = "sync_daemon_state.json",
+                 poll_method: str = "ls-remote", jobs: Optional[List[str]] = None, dry_run: bool = False):
+        self.config_file = config_file
+        self.folders_file = folders_file
+        self.state_file = Path(state_file)
+        self.jobs = jobs or ["apps", "folders"]
+        self.dry_run = dry_run
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.base_path = resolve_base_path(self.config, base_path)
+        self.repo_paths = {name: self.base_path / name for name in WATCHED_REFS}
+        self.github_repos = {
+            "apps": self.config.get("sync_apps", {}).get("source", {"owner": "beclab", "repo": "apps"}),
+            "terminus-apps-origin": self.config.get("sync_apps", {}).get("target", {"owner": "Above-Os", "repo": "terminus-apps"}),
+        }
+        self.poller = RefPoller(poll_method, self.config.get("github", {}).get("token"))
+        self.state = self.load_state()
+        self.stop_event = threading.Event()
+
+    def load_state(self) -> Dict:
+        """读取上次记住的远程分支状态"""
+        if self.state_file.exists():
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {"remote": {}, "handled": {}, "folders": [], "retry_folders": [], "retry": {}}
+
+    def save_state(self):
+        """原子写入状态文件"""
+        self.state["updated_at"] = datetime.now().isoformat(timespec='seconds')
+        tmp_path = self.state_file.with_name(self.state_file.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    def poll_remotes(self) -> Dict[str, Dict[str, str]]:
+        """并发查询两个仓库的远程分支"""
+        with ThreadPoolExecutor(max_workers=len(WATCHED_REFS)) as pool:
+            futures = {
+                name: pool.submit(self.poller.poll, self.repo_paths[name], self.github_repos[name], branches)
+                for name, branches in WATCHED_REFS.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+
+    def fetch_repos(self, names: Set[str]):
+        """并行fetch有变化的仓库"""
+        logger.info(f"Fetching {', '.join(sorted(names))}...")
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            futures = [pool.submit(run_git, self.repo_paths[name], ["fetch", "origin"]) for name in names]
+            for future in futures:
+                future.result()
+
+    def load_folders(self) -> List[str]:
+        """每次轮询都重新读取文件夹列表，修改列表后无需重启"""
+        path = Path(self.folders_file)
+        if not path.exists():
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+    def changed_folders(self, old_commit: Optional[str], new_commit: str, folders: List[str]) -> List[str]:
+        """两次commit之间有改动的、在同步列表中的文件夹；没有旧commit时返回全部"""
+        if not old_commit:
+            return folders
+        result = run_git(self.repo_paths["terminus-apps-origin"], [
+            "diff", "--name-only", "-z", "--no-renames", old_commit, new_commit
+        ], check=False)
+        if result.returncode != 0:
+            # 旧commit已不可达（例如被强推覆盖），保守起见同步全部
+            return folders
+        touched = {path.split('/', 1)[0] for path in result.stdout.split('\0') if path}
+        return [folder for folder in folders if folder in touched]
+
+    def update_source_worktree(self):
+        """sync_folders从terminus-apps-origin的工作区复制文件夹：先切回main并快进到origin/main
+
+        sync_apps推送后会停留在 sync-… 分支上，不切回main会复制旧的文件；无法切换或快进时抛出异常，本次任务失败
+        """
+        repo_path = self.repo_paths["terminus-apps-origin"]
+        branch = run_git(repo_path, ["rev-parse", "--abbrev-ref", "HEAD"]).stdout.strip()
+        if branch != "main":
+            logger.info(f"terminus-apps-origin is on {branch}, switching back to main")
+            run_git(repo_path, ["checkout", "main"])
+        run_git(repo_path, ["merge", "--ff-only", "origin/main"])
+        # 本地main有未推送的提交时快进不会失败，但工作区和origin/main不一致
+        head = run_git(repo_path, ["rev-parse", "HEAD"]).stdout.strip()
+        origin_main = run_git(repo_path, ["rev-parse", "origin/main"]).stdout.strip()
+        if head != origin_main:
+            raise RuntimeError(f"terminus-apps-origin main ({head[:8]}) is not at origin/main ({origin_main[:8]})")
+
+    def retry_due(self, job: str, moved: bool) -> bool:
+        """失败过的任务是否可以再次运行：相关分支移动后立即运行，否则等退避时间到"""
+        retry = self.state.get("retry", {}).get(job)
+        if retry is None or moved or time.time() >= retry["at"]:
+            return True
+        logger.debug(f"{job} job failed {retry['attempts']} times, next retry at "
+                     f"{datetime.fromtimestamp(retry['at']).isoformat(timespec='seconds')}")
+        return False
+
+    def record_result(self, job: str, ok: bool):
+        """记录任务结果：成功时清除重试状态，失败时计算下次重试的时间"""
+        retries = self.state.setdefault("retry", {})
+        if ok:
+            retries.pop(job, None)
+            return
+        attempts = retries.get(job, {}).get("attempts", 0) + 1
+        delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+        retries[job] = {"attempts": attempts, "at": time.time() + delay}
+        logger.error(f"{job} job failed (attempt {attempts}), retrying in {delay:.0f}s "
+                     f"or as soon as its branches move")
+
+    def run_apps_job(self, sync_commit: str) -> bool:
+        """sync分支移动：执行 sync_apps，返回是否成功"""
+        from sync_apps import AppSyncManager
+        logger.info(f"apps/sync moved to {sync_commit[:8]}, running app sync...")
+        manager = AppSyncManager(self.config_file, str(self.base_path))
+        return manager.sync(dry_run=self.dry_run, fetch=False)
+
+    def run_folders_job(self, folders: List[str]) -> List[str]:
+        """源仓库main移动或列表新增文件夹：只同步受影响的文件夹，返回未同步成功的文件夹"""
+        from sync_folders import FolderSyncManager
+        logger.info(f"Running folder sync for {len(folders)} affected folders: {folders}")
+        if not self.dry_run:
+            self.update_source_worktree()
+        manager = FolderSyncManager(self.config_file, self.folders_file, str(self.base_path))
+        return manager.sync_all_folders(dry_run=self.dry_run, folders=folders, fetch=False)
+
+    def poll_once(self):
+        """一次轮询：远程分支未变化时只有一次轻量请求"""
+        remote = self.poll_remotes()
+        previous = self.state.get("remote", {})
+        handled = self.state.setdefault("handled", {})
+        folders = self.load_folders() if "folders" in self.jobs else []
+        new_folders = [folder for folder in folders if folder not in self.state.get("folders", [])]
+        # 上次同步失败、需要重试的文件夹
+        retry_folders = [folder for folder in self.state.get("retry_folders", []) if folder in folders]
+
+        moved = {name for name in remote if remote[name] != previous.get(name)}
+        # 失败过的任务只在相关分支移动（或列表新增文件夹）或退避时间到时重试，不会每次轮询都fetch并重跑
+        apps_pending = "apps" in self.jobs and remote["apps"].get("sync") != handled.get("apps") \
+            and self.retry_due("apps", "apps" in moved)
+        origin_main = remote["terminus-apps-origin"].get("main")
+        folders_pending = "folders" in self.jobs and (
+            origin_main != handled.get("folders") or new_folders or retry_folders
+        ) and self.retry_due("folders", "terminus-apps-origin" in moved or bool(new_folders))
+
+        if not (moved or apps_pending or folders_pending):
+            logger.debug("No remote changes")
+            return
+
+        # 只fetch相关分支有变化（或还有未完成任务）的仓库
+        to_fetch = set(moved)
+        if apps_pending:
+            to_fetch.update({"apps", "terminus-apps-origin"})
+        if folders_pending:
+            to_fetch.update({"terminus-apps-origin", "apps"})
+        self.fetch_repos(to_fetch)
+        self.state["remote"] = remote
+        self.save_state()
+
+        # 只有真正同步成功才更新handled，失败时下次轮询重试；干运行不记录任何进度
+        if apps_pending:
+            try:
+                ok = self.run_apps_job(remote["apps"]["sync"])
+                if not ok:
+                    logger.error("App sync did not complete")
+            except Exception as e:
+                ok = False
+                logger.error(f"App sync failed: {e}")
+            if not self.dry_run:
+                if ok:
+                    handled["apps"] = remote["apps"].get("sync")
+                self.record_result("apps", ok)
+
+        if folders_pending:
+            affected = self.changed_folders(handled.get("folders"), origin_main, folders) \
+                if origin_main != handled.get("folders") else []
+            affected = list(dict.fromkeys(affected + new_folders + retry_folders))
+            try:
+                failed = []
+                if affected:
+                    failed = self.run_folders_job(affected)
+                else:
+                    logger.info("terminus-apps-origin/main moved but no listed folder changed")
+                if failed:
+                    logger.error(f"{len(failed)} folders did not sync: {failed}")
+                if not self.dry_run:
+                    # 成功的文件夹不再重复同步（避免重复创建PR），失败的记下来稍后重试
+                    handled["folders"] = origin_main
+                    self.state["folders"] = folders
+                    self.state["retry_folders"] = failed
+                    self.record_result("folders", not failed)
+            except Exception as e:
+                # 整个任务出错：不更新handled，重试时重新计算受影响的文件夹
+                logger.error(f"Folder sync failed: {e}")
+                if not self.dry_run:
+                    self.record_result("folders", False)
+
+        self.save_state()
+
+    def run(self, interval: float = 300.0, once: bool = False):
+        """常驻运行，收到SIGINT/SIGTERM后在当前轮询结束时退出"""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop_event.set())
+        logger.info(f"Watching remotes every {interval:.0f}s (jobs: {', '.join(self.jobs)})")
+        while not self.stop_event.is_set():
+            try:
+                self.poll_once()
+            except (subprocess.CalledProcessError, requests.RequestException) as e:
+                logger.error(f"Poll failed: {e}")
+            if once:
+                break
+            self.stop_event.wait(interval)
+        logger.info("Daemon stopped")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="常驻运行，远程分支变化时才触发同步")
+    parser.add_argument("--config", default="sync_config.json", help="配置文件路径")
+    parser.add_argument("--folders", default="folders_to_sync.txt", help="文件夹列表文件路径")
+    parser.add_argument("--base-path", help="工作仓库根目录")
+    parser.add_argument("--state", default="sync_daemon_state.json", help="记录远程分支状态的文件")
+    parser.add_argument("--interval", type=float, default=300, help="轮询间隔（秒）")
+    parser.add_argument("--poll-method", choices=["ls-remote", "github"], default="ls-remote",
+                        help="检查远程分支的方式：git ls-remote 或 带ETag的GitHub refs接口")
+    parser.add_argument("--job", action="append", choices=["apps", "folders"], help="只运行指定的同步任务（可多次指定）")
+    parser.add_argument("--once", action="store_true", help="只轮询一次（用于cron）")
+    parser.add_argument("--dry-run", action="store_true", help="检测到变化时只显示将要同步的内容")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO", help="日志级别")
+    args = parser.parse_args()
+    setup_logging('sync_daemon.log', getattr(logging, args.log_level))
+
+    try:
+        daemon = SyncDaemon(args.config, args.folders, args.base_path, args.state,
+                            args.poll_method, args.job, args.dry_run)
+        daemon.run(args.interval, args.once)
+    except Exception as e:
+        logger.error(f"Fatal error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
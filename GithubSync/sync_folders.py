@@ -16,28 +16,30 @@ from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('sync_folders.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from impact_report import EMPTY_TREE, SORT_KEYS, impact_report, objects_env, print_summary, top_level_trees, write_json
+from package_validation import DEFAULT_CACHE_FILE, ValidationCache, log_report, validate_folders, worktree_files
+from repo_bootstrap import resolve_base_path
+from sync_logging import clip, log_context, setup_logging
+
+# 日志在main()中通过setup_logging配置（队列 + 后台线程写入轮转的JSON日志文件）
 logger = logging.getLogger(__name__)
 
+# 每次git push最多推送的分支数
+PUSH_CHUNK_SIZE = 100
+
 class FolderSyncManager:
     """文件夹同步管理器"""
     
-    def __init__(self, config_file: str = "sync_config.json", folders_file: str = "folders_to_sync.txt"):
+    def __init__(self, config_file: str = "sync_config.json", folders_file: str = "folders_to_sync.txt",
+                 base_path: Optional[str] = None):
         self.config_file = config_file
         self.folders_file = folders_file
         self.config = self.load_config()
         
-        # 设置路径
-        self.base_path = Path("/Users/cid/Documents/GitHub/TShentu")
+        # 设置路径（命令行参数 > 环境变量SYNC_BASE_PATH > 配置文件base_path > 默认路径）
+        self.base_path = resolve_base_path(self.config, base_path)
         self.apps_repo_path = self.base_path / "apps"
         self.terminus_apps_origin_path = self.base_path / "terminus-apps-origin"
         
@@ -75,7 +77,8 @@ class FolderSyncManager:
     def run_git_command(self, repo_path: Path, command: List[str], check: bool = True) -> subprocess.CompletedProcess:
         """运行Git命令"""
         full_command = ["git"] + command
-        logger.debug(f"Running git command in {repo_path}: {' '.join(full_command)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Running git command in %s: %s", repo_path, ' '.join(full_command))
         
         try:
             result = subprocess.run(
@@ -88,15 +91,18 @@ class FolderSyncManager:
             return result
         except subprocess.CalledProcessError as e:
             logger.error(f"Git command failed: {e}")
-            logger.error(f"stdout: {e.stdout}")
-            logger.error(f"stderr: {e.stderr}")
+            logger.error("stdout: %s", clip(e.stdout))
+            logger.error("stderr: %s", clip(e.stderr))
             raise
     
     def fetch_latest_changes(self):
-        """获取最新更改"""
+        """获取最新更改（两个仓库并行fetch）"""
         logger.info("Fetching latest changes from both repositories...")
-        self.run_git_command(self.apps_repo_path, ["fetch", "origin"])
-        self.run_git_command(self.terminus_apps_origin_path, ["fetch", "origin"])
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(self.run_git_command, repo_path, ["fetch", "origin"])
+                       for repo_path in (self.apps_repo_path, self.terminus_apps_origin_path)]
+            for future in futures:
+                future.result()
     
     def get_folder_version(self, folder_path: Path) -> str:
         """获取文件夹中Chart.yaml的version字段"""
@@ -217,22 +223,54 @@ class FolderSyncManager:
         else:
             return "NEW"
     
+    def get_push_remote(self) -> str:
+        """推送使用的remote：配置了token时使用带token的地址，否则使用origin"""
+        github_config = self.config.get("github", {})
+        if github_config.get("token"):
+            target_repo = self.config['sync_folders']['target']
+            return f"https://{github_config['token']}@github.com/{target_repo['owner']}/{target_repo['repo']}.git"
+        return "origin"
+    
     def push_branch(self, repo_path: Path, branch_name: str) -> bool:
         """推送分支"""
-        try:
-            github_config = self.config.get("github", {})
-            if github_config.get("token"):
-                # 使用token进行推送
-                remote_url = f"https://{github_config['token']}@github.com/{self.config['sync_folders']['target']['owner']}/{self.config['sync_folders']['target']['repo']}.git"
-                self.run_git_command(repo_path, ["push", remote_url, branch_name])
-            else:
-                # 使用默认推送
-                self.run_git_command(repo_path, ["push", "origin", branch_name])
-            logger.info(f"Pushed branch: {branch_name}")
-            return True
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to push branch {branch_name}: {e}")
-            return False
+        return self.push_branches(repo_path, [branch_name])[branch_name]
+    
+    def push_branches(self, repo_path: Path, branch_names: List[str], atomic: bool = False,
+                      chunk_size: int = PUSH_CHUNK_SIZE) -> Dict[str, bool]:
+        """一次git push推送多个分支（每chunk_size个分支一次连接），返回每个分支是否推送成功
+        
+        atomic为True时同一次推送中的分支要么全部成功要么全部失败
+        """
+        results = {}
+        remote = self.get_push_remote()
+        for start in range(0, len(branch_names), chunk_size):
+            chunk = branch_names[start:start + chunk_size]
+            command = ["push", "--porcelain"]
+            if atomic:
+                command.append("--atomic")
+            command.append(remote)
+            command.extend(f"refs/heads/{branch}:refs/heads/{branch}" for branch in chunk)
+            result = self.run_git_command(repo_path, command, check=False)
+            
+            # --porcelain 每个ref输出一行：<flag>\t<from>:<to>\t<summary>，flag为 ! 表示被拒绝
+            outcomes = {}
+            for line in result.stdout.splitlines():
+                parts = line.split('\t')
+                if len(parts) < 3 or ':' not in parts[1]:
+                    continue
+                ref = parts[1].split(':', 1)[1]
+                outcomes[ref[len("refs/heads/"):]] = (parts[0] != '!', parts[2])
+            
+            for branch in chunk:
+                ok, summary = outcomes.get(branch, (False, "no status reported"))
+                results[branch] = ok
+                if ok:
+                    logger.info(f"Pushed branch: {branch}")
+                else:
+                    logger.error(f"Failed to push branch {branch}: {summary}")
+            if result.returncode != 0 and not outcomes:
+                logger.error(f"git push failed: {result.stderr.strip()}")
+        return results
     
     def create_pull_request(self, folder_name: str, version: str, branch_name: str) -> Optional[str]:
         """创建Pull Request"""
@@ -279,8 +317,42 @@ class FolderSyncManager:
             logger.error(f"Failed to create PR: {e}")
             return None
     
-    def sync_folder(self, folder_name: str) -> bool:
-        """同步单个文件夹"""
+    def validate_folders(self, folders: List[str], cache_file: str = DEFAULT_CACHE_FILE) -> List[str]:
+        """推送前校验源文件夹的Chart.yaml和OlaresManifest.yaml，返回通过校验的文件夹
+        
+        不存在的文件夹和带.remove标记的文件夹不校验（后续步骤会照常处理）
+        """
+        to_check = [folder for folder in folders
+                    if (self.terminus_apps_origin_path / folder).is_dir()
+                    and not (self.terminus_apps_origin_path / folder / ".remove").exists()]
+        if not to_check:
+            return folders
+        report = validate_folders(worktree_files(self.terminus_apps_origin_path, to_check), ValidationCache(cache_file))
+        failed = set(log_report(report))
+        if failed:
+            logger.error(f"Excluding {len(failed)} folders that failed validation: {sorted(failed)}")
+        return [folder for folder in folders if folder not in failed]
+    
+    def preview_folders(self, folders: List[str], sort_by: str = "name", report_file: Optional[str] = None) -> List[Dict]:
+        """干运行：比较每个文件夹在terminus-apps-origin HEAD与apps origin/main中的tree，统计将要新增/修改/删除的文件
+        
+        直接在apps仓库中读取terminus-apps-origin的对象做diff，不复制文件、不切换分支
+        """
+        source_trees = top_level_trees(self.terminus_apps_origin_path, "HEAD")
+        target_trees = top_level_trees(self.apps_repo_path, "origin/main")
+        missing = [folder for folder in folders if folder not in source_trees]
+        for folder in missing:
+            logger.warning(f"Source folder not found in terminus-apps-origin HEAD, would be skipped: {folder}")
+        jobs = [(folder, target_trees.get(folder, EMPTY_TREE), source_trees[folder])
+                for folder in folders if folder in source_trees]
+        rows = impact_report(self.apps_repo_path, jobs, env=objects_env(self.terminus_apps_origin_path))
+        print_summary(rows, sort_by)
+        if report_file:
+            write_json(rows, report_file, sort_by)
+        return rows
+    
+    def prepare_folder(self, folder_name: str) -> Optional[Dict]:
+        """复制文件夹并在新分支上提交（不推送），返回 {folder, version, branch}；没有修改时branch为None，失败时返回None"""
         logger.info(f"Starting sync for folder: {folder_name}")
         
         try:
@@ -288,7 +360,7 @@ class FolderSyncManager:
             source_folder = self.terminus_apps_origin_path / folder_name
             if not source_folder.exists():
                 logger.error(f"Source folder not found: {source_folder}")
-                return False
+                return None
             
             # 2. 获取版本信息
             version = self.get_folder_version(source_folder)
@@ -305,41 +377,27 @@ class FolderSyncManager:
             # 5. 复制文件夹到apps仓库
             target_folder = self.apps_repo_path / folder_name
             if not self.copy_folder(source_folder, target_folder):
-                return False
+                return None
             
             # 6. 检查是否有更改
             if not self.has_changes(self.apps_repo_path):
                 logger.info(f"文件夹 {folder_name} 没有修改内容，跳过PR创建")
-                return True
+                return {"folder": folder_name, "version": version, "branch": None}
             
             # 7. 创建分支
             branch_name = f"sync-{folder_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
             if not self.create_branch(self.apps_repo_path, branch_name):
-                return False
+                return None
             
             # 8. 提交更改
             if not self.commit_changes(self.apps_repo_path, folder_name, version):
-                return False
-            
-            # 9. 推送分支
-            if not self.push_branch(self.apps_repo_path, branch_name):
-                return False
+                return None
             
-            # 10. 创建PR
-            pr_url = self.create_pull_request(folder_name, version, branch_name)
-            if pr_url:
-                logger.info(f"Successfully synced folder {folder_name}, PR: {pr_url}")
-                # 等待5秒避免提交过快
-                logger.info("Waiting 5 seconds before next operation...")
-                time.sleep(5)
-            else:
-                logger.warning(f"Folder {folder_name} synced but PR creation failed")
-            
-            # 11. 切换回main分支，为下一个文件夹做准备
+            # 9. 切换回main分支，为下一个文件夹做准备
             logger.info("Switching back to main branch for next folder...")
             self.run_git_command(self.apps_repo_path, ["checkout", "main"])
             
-            return True
+            return {"folder": folder_name, "version": version, "branch": branch_name}
             
         except Exception as e:
             logger.error(f"Failed to sync folder {folder_name}: {e}")
@@ -348,9 +406,48 @@ class FolderSyncManager:
                 self.run_git_command(self.apps_repo_path, ["checkout", "main"])
             except:
                 pass
+            return None
+    
+    def publish_folders(self, prepared: List[Dict], atomic: bool = False) -> Dict[str, bool]:
+        """批量推送已提交的分支，再为推送成功的分支创建PR，返回 {文件夹: 是否成功}（PR未创建也算失败）"""
+        branches = [item["branch"] for item in prepared if item["branch"]]
+        with log_context(phase="push"):
+            pushed = self.push_branches(self.apps_repo_path, branches, atomic=atomic) if branches else {}
+        logger.info(f"Pushed {sum(pushed.values())}/{len(branches)} branches")
+        
+        results = {}
+        for item in prepared:
+            folder_name, branch_name = item["folder"], item["branch"]
+            if branch_name is None:
+                # 没有修改内容
+                results[folder_name] = True
+                continue
+            if not pushed.get(branch_name):
+                results[folder_name] = False
+                continue
+            
+            # 10. 创建PR
+            with log_context(folder=folder_name, phase="pr"):
+                pr_url = self.create_pull_request(folder_name, item["version"], branch_name)
+            if pr_url:
+                logger.info(f"Successfully synced folder {folder_name}, PR: {pr_url}")
+                # 等待5秒避免提交过快
+                logger.info("Waiting 5 seconds before next operation...")
+                time.sleep(5)
+            else:
+                logger.error(f"Folder {folder_name} was pushed to {branch_name} but PR creation failed")
+            results[folder_name] = bool(pr_url)
+        return results
+    
+    def sync_folder(self, folder_name: str) -> bool:
+        """同步单个文件夹"""
+        prepared = self.prepare_folder(folder_name)
+        if prepared is None:
             return False
+        return self.publish_folders([prepared])[folder_name]
     
-    def sync_single_folder(self, folder_name: str, dry_run: bool = False):
+    def sync_single_folder(self, folder_name: str, dry_run: bool = False, validate: bool = True,
+                           sort_by: str = "name", report_file: Optional[str] = None):
         """同步单个文件夹"""
         logger.info(f"Starting single folder sync: {folder_name}")
         
@@ -358,9 +455,14 @@ class FolderSyncManager:
             # 1. 获取最新更改
             self.fetch_latest_changes()
             
-            # 2. 同步单个文件夹
+            # 2. 校验
+            if validate and not self.validate_folders([folder_name]):
+                logger.error(f"Folder {folder_name} failed validation, not syncing")
+                return False
+            
+            # 3. 同步单个文件夹
             if dry_run:
-                logger.info(f"Dry run: would sync folder {folder_name}")
+                self.preview_folders([folder_name], sort_by, report_file)
                 return True
             
             if self.sync_folder(folder_name):
@@ -374,43 +476,70 @@ class FolderSyncManager:
             logger.error(f"Single folder sync failed: {e}")
             raise
     
-    def sync_all_folders(self, dry_run: bool = False):
-        """同步所有文件夹"""
+    def sync_all_folders(self, dry_run: bool = False, folders: Optional[List[str]] = None, fetch: bool = True,
+                         atomic_push: bool = False, validate: bool = True,
+                         sort_by: str = "name", report_file: Optional[str] = None) -> List[str]:
+        """同步所有文件夹（folders不为空时只同步这些文件夹；fetch为False时使用调用方已经拉取好的远程分支）
+        
+        先为每个文件夹提交到各自的分支，再用一次git push推送全部分支（atomic_push为True时全部成功或全部失败），最后创建PR；
+        返回未同步成功的文件夹（校验、提交、推送或创建PR失败），全部成功时为空列表
+        """
         logger.info("Starting folder sync process...")
         
         try:
             # 1. 获取最新更改
-            self.fetch_latest_changes()
+            if fetch:
+                with log_context(phase="fetch"):
+                    self.fetch_latest_changes()
             
-            # 2. 确保在main分支上开始
-            logger.info("Ensuring we start from main branch...")
-            self.run_git_command(self.apps_repo_path, ["checkout", "main"])
+            # 2. 确保在main分支上开始（干运行不改动工作区）
+            if not dry_run:
+                logger.info("Ensuring we start from main branch...")
+                self.run_git_command(self.apps_repo_path, ["checkout", "main"])
             
             # 3. 加载文件夹列表
-            folders = self.load_folders_list()
+            if folders is None:
+                folders = self.load_folders_list()
             
             if not folders:
                 logger.info("No folders to sync")
-                return
+                return []
             
-            # 4. 逐个同步文件夹
-            success_count = 0
+            # 校验未通过的文件夹不推送、不创建PR
+            all_folders = folders
+            if validate:
+                with log_context(phase="validate"):
+                    folders = self.validate_folders(folders)
+            failed = [folder for folder in all_folders if folder not in folders]
+            
+            if dry_run:
+                with log_context(phase="preview"):
+                    self.preview_folders(folders, sort_by, report_file)
+                return failed
+            
+            # 4. 逐个复制并提交到各自的分支
+            prepared = []
             for i, folder_name in enumerate(folders, 1):
                 logger.info(f"Processing folder {i}/{len(folders)}: {folder_name}")
-                
-                if dry_run:
-                    logger.info(f"Dry run: would sync folder {folder_name}")
-                    continue
-                
-                if self.sync_folder(folder_name):
-                    success_count += 1
-                    logger.info(f"Successfully synced folder {i}/{len(folders)}: {folder_name}")
-                else:
+                with log_context(folder=folder_name, phase="prepare"):
+                    item = self.prepare_folder(folder_name)
+                if item is None:
                     logger.error(f"Failed to sync folder {i}/{len(folders)}: {folder_name}")
+                    failed.append(folder_name)
                     # 继续处理下一个文件夹
                     continue
+                prepared.append(item)
+            
+            # 5. 所有分支一起推送，然后创建PR
+            results = self.publish_folders(prepared, atomic=atomic_push)
+            for folder_name, ok in results.items():
+                if not ok:
+                    logger.error(f"Failed to sync folder: {folder_name}")
+                    failed.append(folder_name)
+            success_count = sum(results.values())
             
-            logger.info(f"Folder sync completed. Successfully synced {success_count}/{len(folders)} folders")
+            logger.info(f"Folder sync completed. Successfully synced {success_count}/{len(all_folders)} folders")
+            return failed
             
         except Exception as e:
             logger.error(f"Folder sync failed: {e}")
@@ -426,26 +555,36 @@ def main():
     parser = argparse.ArgumentParser(description="同步Above-Os/terminus-apps仓库中的指定文件夹到beclab/apps仓库")
     parser.add_argument("--dry-run", action="store_true", help="只显示将要同步的文件夹，不实际执行")
     parser.add_argument("--config", default="sync_config.json", help="配置文件路径")
+    parser.add_argument("--base-path", help="工作仓库根目录（默认读取环境变量SYNC_BASE_PATH或配置文件base_path）")
     parser.add_argument("--folders", default="folders_to_sync.txt", help="文件夹列表文件路径")
     parser.add_argument("--folder", help="同步单个文件夹名称")
     parser.add_argument("--list-file", help="指定文件夹列表文件路径（覆盖--folders参数）")
+    parser.add_argument("--atomic-push", action="store_true", help="所有分支在一次原子推送中全部成功或全部失败")
+    parser.add_argument("--skip-validation", action="store_true", help="不校验Chart.yaml和OlaresManifest.yaml")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="name", help="干运行报告的排序方式")
+    parser.add_argument("--report-json", help="干运行报告另存为JSON")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO", help="日志级别")
     
     args = parser.parse_args()
+    setup_logging('sync_folders.log', getattr(logging, args.log_level))
     
     try:
         # 确定使用哪个文件夹列表文件
         folders_file = args.list_file if args.list_file else args.folders
         
-        manager = FolderSyncManager(args.config, folders_file)
+        manager = FolderSyncManager(args.config, folders_file, args.base_path)
         
         if args.folder:
             # 单个文件夹同步模式
             logger.info(f"Single folder sync mode: {args.folder}")
-            manager.sync_single_folder(args.folder, dry_run=args.dry_run)
+            manager.sync_single_folder(args.folder, dry_run=args.dry_run, validate=not args.skip_validation,
+                                       sort_by=args.sort, report_file=args.report_json)
         else:
             # 列表同步模式
             logger.info(f"List sync mode: {folders_file}")
-            manager.sync_all_folders(dry_run=args.dry_run)
+            manager.sync_all_folders(dry_run=args.dry_run, atomic_push=args.atomic_push,
+                                     validate=not args.skip_validation, sort_by=args.sort,
+                                     report_file=args.report_json)
         
     except Exception as e:
         logger.error(f"Fatal error: {e}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+同步脚本的日志配置：调用方只把日志记录放入队列，由后台线程写入按大小轮转的JSON日志文件和控制台；
+记录中带有当前的 folder / commit / phase 上下文字段
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+# 单个日志文件上限和保留的历史文件数
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# 出错时输出的git stdout/stderr最多保留的字符数
+MAX_OUTPUT_CHARS = 4000
+CONTEXT_FIELDS = ("folder", "commit", "phase")
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_context = contextvars.ContextVar("sync_log_context", default={})
+_listener: Optional[QueueListener] = None
+
+
+@contextmanager
+def log_context(**fields):
+    """在with块内产生的日志记录都带上这些字段（folder / commit / phase）"""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def clip(text: Optional[str], limit: int = MAX_OUTPUT_CHARS) -> str:
+    """截断过长的命令输出，避免单条日志过大"""
+    if not text or len(text) <= limit:
+        return text or ""
+    return text[:limit] + f"... ({len(text) - limit} more chars)"
+
+
+class ContextFilter(logging.Filter):
+    """在产生日志的线程中把上下文字段写入记录（之后由后台线程格式化）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """直接把记录放入队列：消息拼接、异常堆栈格式化都在后台线程中完成"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_file: str, level: int = logging.INFO, max_bytes: int = LOG_MAX_BYTES,
+                  backup_count: int = LOG_BACKUP_COUNT) -> QueueListener:
+    """配置根logger：低于level的日志在创建记录之前就被丢弃，其余记录经队列交给后台线程写入"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """写完队列中剩余的记录后停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
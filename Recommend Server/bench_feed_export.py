@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Feed导出基准：对比逐页pd.concat与一次性构建DataFrame的耗时和峰值内存，数据由本地mock_server提供
+"""
+
+import argparse
+import multiprocessing
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Sequence
+
+import pandas as pd
+
+from feed_export import iter_feed_pages
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def start_server(feeds: int, icon_size: int, extra_args: Sequence[str] = ()):
+    """在子进程中启动mock_server，返回 (进程, feeds接口地址)"""
+    process = subprocess.Popen(
+        [sys.executable, str(SCRIPT_DIR / 'mock_server.py'), '--port', '0',
+         '--feeds', str(feeds), '--icon-size', str(icon_size), *extra_args],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = process.stdout.readline().strip()
+    base_url = line.rsplit(' ', 1)[-1]
+    return process, f"{base_url}/api/feeds"
+
+
+def export_concat(api: str, limit: int, workers: int) -> pd.DataFrame:
+    """原写法：每页都把累计的DataFrame和新页拼接一次"""
+    df = pd.DataFrame()
+    for page in iter_feed_pages(api, limit=limit, workers=workers):
+        df = pd.concat([df, pd.DataFrame(page)], ignore_index=True)
+    return df
+
+
+def export_once(api: str, limit: int, workers: int) -> pd.DataFrame:
+    """新写法：先收集记录，最后一次性构建DataFrame"""
+    records = []
+    for page in iter_feed_pages(api, limit=limit, workers=workers):
+        records.extend(page)
+    return pd.DataFrame.from_records(records)
+
+
+def run_case(mode: str, api: str, limit: int, workers: int, queue):
+    """在独立子进程中执行一次导出，汇报耗时和峰值RSS"""
+    func = export_concat if mode == 'concat' else export_once
+    # 屏蔽导出过程中的进度输出
+    sys.stdout = open('/dev/null', 'w')
+    start = time.perf_counter()
+    df = func(api, limit, workers)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if sys.platform == 'darwin':
+        peak_mb /= 1024
+    queue.put((len(df), elapsed, peak_mb))
+
+
+def measure(mode: str, api: str, limit: int, workers: int):
+    """启动子进程执行一次导出并取回结果"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_case, args=(mode, api, limit, workers, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Feed导出耗时/内存基准")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="合成feed数量，逗号分隔")
+    parser.add_argument("--limit", type=int, default=100, help="每页数量")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求数")
+    parser.add_argument("--icon-size", type=int, default=256, help="每个图标的字节数")
+    parser.add_argument("--concat-max", type=int, default=100000,
+                        help="超过该数量时跳过逐页concat（O(n²)，耗时过长）")
+    args = parser.parse_args()
+
+    print(f"{'feeds':>9} {'mode':<8} {'rows':>9} {'seconds':>9} {'peak MB':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        server, api = start_server(size, args.icon_size)
+        try:
+            for mode in ('concat', 'once'):
+                if mode == 'concat' and size > args.concat_max:
+                    print(f"{size:>9} {mode:<8} {'skipped':>9}")
+                    continue
+                rows, elapsed, peak_mb = measure(mode, api, args.limit, args.workers)
+                print(f"{size:>9} {mode:<8} {rows:>9} {elapsed:>9.2f} {peak_mb:>9.1f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
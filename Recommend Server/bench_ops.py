@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+运维脚本基准：对本地mock_server执行 导出 / 批量添加feed / 按清单管理feedname，
+记录不同数据量（10k–1M feed）下的吞吐量和峰值内存
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_feed_export import start_server
+from feed_export import FeedProjection
+from feedname_manifest import sync_feednames
+from recommend_client import RecommendClient
+
+SCENARIOS = ('export', 'upload', 'feednames')
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak
+
+
+def bench_export(client: RecommendClient, size: int, args, workdir: Path):
+    """流式导出全部feed到csv，单位为行"""
+    stats = client.export_feeds(str(workdir / 'feeds.csv'), args.limit, args.workers,
+                                FeedProjection(exclude=['IconContent']))
+    return stats['rows']
+
+
+def bench_upload(client: RecommendClient, size: int, args, workdir: Path):
+    """批量添加feed：一半是已存在的url，一半是新url，单位为提交的行"""
+    count = max(1, int(size * args.upload_ratio))
+    rows = []
+    for i in range(count):
+        # 已存在的url与mock_server.make_feeds的生成规则一致
+        url = f"https://example{i % 997}.com/feed/{i}.xml" if i % 2 == 0 else f"https://bench.example.com/new/{i}.xml"
+        rows.append({"category_id": "66175739a84f9620f108cf27", "feed_url": url})
+    report = client.batch_create_feeds(rows, args.chunk_size, args.workers)
+    if report['failed']:
+        print(f"{len(report['failed'])} chunks failed", file=sys.stderr)
+    return count
+
+
+def bench_feednames(client: RecommendClient, size: int, args, workdir: Path):
+    """按清单同步feedname：修改一半已有feedname的feed列表、删除四分之一、新建同等数量，单位为执行的操作"""
+    current = client.list_feednames()
+    manifest = workdir / 'feednames.csv'
+    with open(manifest, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'feed_id', 'description'])
+        keep = current[:len(current) * 3 // 4]
+        for i, item in enumerate(keep):
+            feed_ids = item['FeedID'][1:] if i % 2 == 0 else item['FeedID']
+            writer.writerow([item['Name'], ';'.join(feed_ids), ''])
+        sample = [feed_id for item in current[:1] for feed_id in item['FeedID']]
+        for i in range(len(current) - len(keep)):
+            writer.writerow([f"bench{i}", ';'.join(sample), 'created by bench_ops'])
+    outcome = sync_feednames(client, str(manifest), dry_run=False, prune=True, workers=args.workers)
+    plan = outcome['plan']
+    return len(plan['create']) + len(plan['set_feeds']) + len(plan['delete'])
+
+
+BENCHMARKS = {
+    'export': bench_export,
+    'upload': bench_upload,
+    'feednames': bench_feednames,
+}
+
+
+def run_case(scenario: str, base_url: str, size: int, args, queue):
+    """在独立子进程中执行一个场景，汇报处理数量、耗时和峰值RSS"""
+    # 屏蔽进度输出
+    sys.stdout = open('/dev/null', 'w')
+    with tempfile.TemporaryDirectory() as workdir, \
+            RecommendClient('bench', base_url=base_url, timeout=120, pool_size=args.workers) as client:
+        start = time.perf_counter()
+        units = BENCHMARKS[scenario](client, size, args, Path(workdir))
+        elapsed = time.perf_counter() - start
+    queue.put((units, elapsed, peak_rss_mb()))
+
+
+def measure(scenario: str, base_url: str, size: int, args):
+    """启动子进程执行一个场景并取回结果"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_case, args=(scenario, base_url, size, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="运维脚本吞吐量/内存基准")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="合成feed数量，逗号分隔")
+    parser.add_argument("--scenarios", default=','.join(SCENARIOS), help="要执行的场景，逗号分隔")
+    parser.add_argument("--limit", type=int, default=100, help="导出每页数量")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求数")
+    parser.add_argument("--chunk-size", type=int, default=200, help="batchCreateFeeds每块数量")
+    parser.add_argument("--upload-ratio", type=float, default=0.1, help="批量添加的行数占feed总数的比例")
+    parser.add_argument("--feednames", type=int, default=200, help="合成feedname数量")
+    parser.add_argument("--icon-size", type=int, default=256, help="每个图标的字节数")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock_server每个请求的延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock_server随机错误比例")
+    parser.add_argument("--output", help="把结果保存为JSON")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = []
+    print(f"{'feeds':>9} {'scenario':<10} {'units':>9} {'seconds':>9} {'units/s':>10} {'peak MB':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        for scenario in scenarios:
+            # 每个场景使用新的服务端，避免上一个场景修改过的状态影响结果
+            server, api = start_server(size, args.icon_size, [
+                '--feednames', str(args.feednames), '--latency', str(args.latency),
+                '--error-rate', str(args.error_rate), '--error-status', '503',
+            ])
+            base_url = api.rsplit('/api/', 1)[0]
+            try:
+                units, elapsed, peak_mb = measure(scenario, base_url, size, args)
+            finally:
+                server.terminate()
+                server.wait()
+            rate = units / elapsed if elapsed > 0 else 0.0
+            print(f"{size:>9} {scenario:<10} {units:>9} {elapsed:>9.2f} {rate:>10.0f} {peak_mb:>9.1f}")
+            results.append({'feeds': size, 'scenario': scenario, 'units': units, 'seconds': elapsed,
+                            'units_per_second': rate, 'peak_rss_mb': peak_mb})
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
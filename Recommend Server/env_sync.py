@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+跨环境同步（dev/test/prd）：并发拉取两个环境，feed按规范化feed_url、feedname按名称建索引，
+只计算并提交差异部分（分块batchCreateFeeds + 并发的feedname变更），不再整表导出导入
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+
+from feed_export import FeedProjection
+from feed_index import FEED_ID_FIELDS, FEED_URL_FIELDS, FeedIndex, normalize_feed_url, pick_field
+from feedname_manifest import FEEDNAME_CREATE_FIELDS, apply_plan, build_plan, fetch_current, print_plan
+from recommend_client import RecommendApiError, RecommendClient
+
+CATEGORY_FIELDS = ('CategoryID', 'CategoryId', 'category_id')
+# 还没有在目标环境创建的feed，dry-run时用占位id表示
+PENDING_PREFIX = 'pending:'
+
+
+class EnvironmentSnapshot:
+    """一个环境的feed和feedname快照"""
+
+    def __init__(self, env: str, feeds: Dict[str, Dict], feednames: Dict[str, Dict], records: int = 0):
+        self.env = env
+        # 规范化feed_url → {'id', 'feed_url', 'category_id'}
+        self.feeds = feeds
+        # 拉取时 /api/feeds 的记录数；新建的feed追加在这之后
+        self.records = records
+        # feedname名称 → {'id', 'name', 'feed_id', 'record'}
+        self.feednames = feednames
+        self.url_by_id = {feed['id']: url for url, feed in feeds.items()}
+
+    def index(self) -> FeedIndex:
+        """转成 FeedIndex（规范化feed_url → id）"""
+        return FeedIndex({url: feed['id'] for url, feed in self.feeds.items()}, source=self.env)
+
+
+def fetch_feeds(client: RecommendClient, limit: int = 100, workers: int = 8,
+                start: int = 0) -> Tuple[Dict[str, Dict], int]:
+    """分页拉取feed（从start开始），只保留 id / feed_url / category_id；返回 (feeds, 读取的记录数)"""
+    projection = FeedProjection(exclude=['IconContent'])
+    feeds = {}
+    records = 0
+    url_field = id_field = category_field = None
+    for page in client.iter_feed_pages(limit, workers, projection, start):
+        records += len(page)
+        for record in page:
+            if url_field is None:
+                url_field = pick_field(record, FEED_URL_FIELDS)
+                id_field = pick_field(record, FEED_ID_FIELDS)
+                category_field = pick_field(record, CATEGORY_FIELDS)
+                if url_field is None or id_field is None:
+                    raise ValueError(f"Unexpected feed record keys: {list(record)}")
+            url = str(record.get(url_field) or '').strip()
+            key = normalize_feed_url(url)
+            if key:
+                feeds[key] = {
+                    'id': str(record[id_field]),
+                    'feed_url': url,
+                    'category_id': str(record.get(category_field) or '') if category_field else '',
+                }
+    return feeds, records
+
+
+def fetch_snapshot(client: RecommendClient, limit: int = 100, workers: int = 8,
+                   with_feednames: bool = True) -> EnvironmentSnapshot:
+    """拉取一个环境的快照"""
+    feeds, records = fetch_feeds(client, limit, workers)
+    feednames = fetch_current(client, workers) if with_feednames else {}
+    print(f"[{client.env}] {len(feeds)} feeds, {len(feednames)} feednames")
+    return EnvironmentSnapshot(client.env, feeds, feednames, records)
+
+
+def fetch_pair(source: RecommendClient, target: RecommendClient, limit: int = 100, workers: int = 8,
+               with_feednames: bool = True):
+    """并发拉取源环境和目标环境"""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        src = pool.submit(fetch_snapshot, source, limit, workers, with_feednames)
+        dst = pool.submit(fetch_snapshot, target, limit, workers, with_feednames)
+        return src.result(), dst.result()
+
+
+def diff_feeds(src: EnvironmentSnapshot, dst: EnvironmentSnapshot,
+               category_map: Optional[Dict[str, str]] = None,
+               default_category: Optional[str] = None) -> Dict:
+    """源环境有、目标环境没有的feed → batchCreateFeeds 的行
+
+    各环境的category_id不同，通过category_map（源 → 目标）或default_category换算；
+    无法换算的feed单独列出，不提交
+    """
+    category_map = category_map or {}
+    create, unmapped = [], []
+    for url, feed in src.feeds.items():
+        if url in dst.feeds:
+            continue
+        category_id = category_map.get(feed['category_id'], default_category)
+        if category_id:
+            create.append({'category_id': category_id, 'feed_url': feed['feed_url']})
+        else:
+            unmapped.append(feed)
+    only_in_target = sum(1 for url in dst.feeds if url not in src.feeds)
+    return {'create': create, 'unmapped_category': unmapped, 'only_in_target': only_in_target}
+
+
+def rewrite_provider(value, source_env: str, target_env: str):
+    """provider地址中带有环境名（recommend-provider-dev），换成目标环境"""
+    if isinstance(value, str):
+        return value.replace(f"recommend-provider-{source_env}.", f"recommend-provider-{target_env}.")
+    return value
+
+
+def feedname_fields(record: Dict) -> Dict:
+    """把接口返回的feedname记录（字段名可能是驼峰）转成创建接口的字段"""
+    fields = {}
+    for key in FEEDNAME_CREATE_FIELDS:
+        camel = ''.join(part.title() for part in key.split('_'))
+        field = pick_field(record, (key, camel))
+        if field is not None and key != 'feed_id':
+            fields[key] = record[field]
+    return fields
+
+
+def desired_feednames(src: EnvironmentSnapshot, dst: EnvironmentSnapshot,
+                      names: Optional[List[str]] = None) -> Dict:
+    """按源环境的feedname生成目标环境的期望状态清单（feed id经feed_url换算成目标环境的id）"""
+    feednames = {}
+    unresolved = 0
+    for name, item in src.feednames.items():
+        if names and name not in names:
+            continue
+        entry = {key: rewrite_provider(value, src.env, dst.env)
+                 for key, value in feedname_fields(item['record']).items()}
+        entry.update(name=name, state='present', feed_id=[])
+        for feed_id in item['feed_id']:
+            url = src.url_by_id.get(feed_id)
+            if url is None:
+                unresolved += 1
+                continue
+            target = dst.feeds.get(url)
+            entry['feed_id'].append(target['id'] if target else PENDING_PREFIX + url)
+        feednames[name] = entry
+    if unresolved:
+        print(f"Warning: {unresolved} feed ids in {src.env} feednames are not in the {src.env} feed list")
+    return {'prune': False, 'feednames': feednames}
+
+
+def pending_count(plan: Dict) -> int:
+    """计划中引用了尚未创建的feed的数量"""
+    items = plan['create'] + plan['set_feeds']
+    return sum(1 for item in items for feed_id in item.get('feed_id', []) if feed_id.startswith(PENDING_PREFIX))
+
+
+def pending_urls(plan: Dict) -> Set[str]:
+    """计划中引用的尚未创建的feed（规范化feed_url）"""
+    return {feed_id[len(PENDING_PREFIX):] for item in plan['create'] + plan['set_feeds']
+            for feed_id in item.get('feed_id', []) if feed_id.startswith(PENDING_PREFIX)}
+
+
+def resolve_created_feeds(target: RecommendClient, dst: EnvironmentSnapshot, report: Dict, wanted: Set[str],
+                          limit: int = 100, workers: int = 8) -> EnvironmentSnapshot:
+    """取得新建feed的id，工作量与新建数量成正比，不重新拉取整个feed列表
+
+    1. 上传报告中已存在 / 核对出的feed直接带有id
+    2. 新建的feed追加在 /api/feeds 末尾：只拉取快照记录数之后的分页
+    仍有找不到的feed（例如服务端不是按创建顺序分页）时，才回退为拉取全部feed
+    """
+    for feed in report.get('existing', []) + report.get('reconciled', []):
+        if isinstance(feed, dict) and feed.get('feed_url') and feed.get('id'):
+            dst.feeds.setdefault(normalize_feed_url(feed['feed_url']),
+                                 {'id': str(feed['id']), 'feed_url': feed['feed_url'], 'category_id': ''})
+
+    failed = {normalize_feed_url(feed['feed_url']) for item in report['failed'] for feed in item['feeds']}
+    wanted = wanted - failed
+    if not wanted - dst.feeds.keys():
+        return dst
+    tail, records = fetch_feeds(target, limit, workers, start=dst.records)
+    dst.feeds.update(tail)
+    dst.records += records
+    print(f"Read {records} feeds created after the snapshot in {target.env}")
+    if wanted - dst.feeds.keys():
+        print(f"{len(wanted - dst.feeds.keys())} created feeds not found at the end of the list, "
+              f"re-reading all feeds in {target.env}")
+        feeds, records = fetch_feeds(target, limit, workers)
+        dst = EnvironmentSnapshot(target.env, feeds, dst.feednames, records)
+    return dst
+
+
+def resolve_pending(plan: Dict, dst: EnvironmentSnapshot) -> Dict:
+    """feed创建完成后，把占位id换成目标环境的真实id；仍然找不到的丢弃"""
+    missing = 0
+    for item in plan['create'] + plan['set_feeds']:
+        ids = []
+        for feed_id in item.get('feed_id', []):
+            if feed_id.startswith(PENDING_PREFIX):
+                target = dst.feeds.get(feed_id[len(PENDING_PREFIX):])
+                if target is None:
+                    missing += 1
+                    continue
+                feed_id = target['id']
+            ids.append(feed_id)
+        item['feed_id'] = ids
+    if missing:
+        print(f"Warning: {missing} feeds were not found in {dst.env} after creation, left out of setFeeds")
+    return plan
+
+
+def sync_environments(source: RecommendClient, target: RecommendClient, dry_run: bool = True,
+                      feeds: bool = True, feednames: bool = True, prune: bool = False,
+                      names: Optional[List[str]] = None, category_map: Optional[Dict[str, str]] = None,
+                      default_category: Optional[str] = None, chunk_size: int = 200,
+                      limit: int = 100, workers: int = 8) -> Dict:
+    """计算 source → target 的最小变更集并（非dry-run时）执行"""
+    src, dst = fetch_pair(source, target, limit, workers, feednames)
+    outcome = {'source': source.env, 'target': target.env}
+
+    feed_diff = diff_feeds(src, dst, category_map, default_category) if feeds else None
+    if feed_diff is not None:
+        print(f"Feeds: {len(feed_diff['create'])} to create, "
+              f"{len(feed_diff['unmapped_category'])} skipped (no category mapping), "
+              f"{feed_diff['only_in_target']} only in {target.env}")
+        outcome['feeds'] = feed_diff
+
+    plan = None
+    if feednames:
+        manifest = desired_feednames(src, dst, names)
+        plan = build_plan(manifest, {name: item for name, item in dst.feednames.items()
+                                     if not names or name in names}, prune)
+        print(f"Feednames ({pending_count(plan)} references to feeds not yet in {target.env}):")
+        print_plan(plan)
+        outcome['feednames'] = plan
+
+    if dry_run:
+        return outcome
+
+    if feed_diff and feed_diff['create']:
+        report = target.batch_create_feeds(feed_diff['create'], chunk_size, workers, index=dst.index())
+        outcome['feed_report'] = report
+        if report['failed']:
+            print(f"{len(report['failed'])} chunks failed")
+        # 取得新建feed的id：只读取新增部分
+        if plan and pending_count(plan):
+            dst = resolve_created_feeds(target, dst, report, pending_urls(plan), limit, workers)
+
+    if plan:
+        outcome['feedname_results'] = apply_plan(target, resolve_pending(plan, dst), workers)
+    return outcome
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="跨环境同步feed和feedname")
+    parser.add_argument("source", help="源环境（dev/test/prd）")
+    parser.add_argument("target", help="目标环境")
+    parser.add_argument("--config", default="recommend_config.json", help="环境配置文件路径")
+    parser.add_argument("--no-feeds", action="store_true", help="不同步feed")
+    parser.add_argument("--no-feednames", action="store_true", help="不同步feedname")
+    parser.add_argument("--feedname", action="append", help="只同步指定的feedname（可多次指定）")
+    parser.add_argument("--prune", action="store_true", help="删除目标环境中源环境没有的feedname")
+    parser.add_argument("--category-map", help="category_id映射JSON文件 {源category_id: 目标category_id}")
+    parser.add_argument("--category-id", help="没有映射时使用的目标category_id")
+    parser.add_argument("--chunk-size", type=int, default=200, help="batchCreateFeeds每块数量")
+    parser.add_argument("--workers", type=int, default=8, help="并发请求数")
+    parser.add_argument("--apply", action="store_true", help="执行变更（默认只输出差异）")
+    parser.add_argument("--output", help="把差异和执行结果保存为JSON")
+    args = parser.parse_args()
+
+    category_map = None
+    if args.category_map:
+        category_map = json.loads(Path(args.category_map).read_text(encoding='utf-8'))
+
+    try:
+        with RecommendClient(args.source, config_file=args.config) as source, \
+                RecommendClient(args.target, config_file=args.config) as target:
+            outcome = sync_environments(
+                source, target, dry_run=not args.apply,
+                feeds=not args.no_feeds, feednames=not args.no_feednames, prune=args.prune,
+                names=args.feedname, category_map=category_map, default_category=args.category_id,
+                chunk_size=args.chunk_size, workers=args.workers,
+            )
+    except (RecommendApiError, requests.RequestException) as e:
+        print(f"请求失败: {e}")
+        sys.exit(1)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(outcome, ensure_ascii=False, indent=2, default=str),
+                                     encoding='utf-8')
+    if not args.apply:
+        print("Dry run: no changes applied (use --apply to execute)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Feed导出：先取第一页拿到total，再用连接池并发拉取剩余分页，按offset顺序拼回；
+支持字段投影，解码时即丢弃IconContent等大字段，图标可另存到按内容寻址的文件存储
+"""
+
+import itertools
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from icon_store import IconStore
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# 查看所有feeds，分页接口
+# https://recommend-server-prd.bttcdn.com/api/feeds?offset=0&limit=100
+FEEDS_API = "https://recommend-server-test.bttcdn.com/api/feeds"
+
+ID_FIELD = 'ID'
+ICON_FIELD = 'IconContent'
+# 图标另存后，在记录中用该字段保存文件key
+ICON_KEY_FIELD = 'IconKey'
+
+
+class FeedProjection:
+    """字段投影：服务端字段选择参数 + 客户端解码时丢弃字段 + 图标外存"""
+
+    def __init__(self, exclude: Sequence[str] = (ICON_FIELD,), fields: Optional[Sequence[str]] = None,
+                 server_param: Optional[str] = None, icon_store: Optional[IconStore] = None):
+        # server_param: 服务端支持字段选择时的参数名（如 "fields"），为None时不发送
+        self.exclude = frozenset(exclude)
+        self.fields = list(fields) if fields else None
+        self.server_param = server_param
+        self.icon_store = icon_store
+
+    def params(self) -> Dict[str, str]:
+        """服务端字段选择参数；需要另存图标时也要请求IconContent"""
+        if not (self.server_param and self.fields):
+            return {}
+        fields = list(self.fields)
+        if self.icon_store is not None and ICON_FIELD not in fields:
+            fields.append(ICON_FIELD)
+        return {self.server_param: ','.join(fields)}
+
+    def columns(self) -> Optional[List[str]]:
+        """导出的列：指定了fields时为这些字段（另存图标时加上IconKey），否则为None（由数据决定）"""
+        if not self.fields:
+            return None
+        columns = [field for field in self.fields if field not in self.exclude]
+        if self.icon_store is not None and ICON_KEY_FIELD not in columns:
+            columns.append(ICON_KEY_FIELD)
+        return columns
+
+    def keep(self, key: str) -> bool:
+        """客户端是否保留该字段"""
+        if key in self.exclude:
+            return False
+        return self.fields is None or key in self.fields or key == ICON_KEY_FIELD
+
+    def object_pairs_hook(self, pairs: List) -> Dict:
+        """json解码钩子：每解码出一个对象就立即丢弃不需要的字段"""
+        keys = {key for key, _ in pairs}
+        if 'feeds' in keys and 'total' in keys:
+            return dict(pairs)
+        # 只对feed本身（带ID字段的对象）做字段选择，嵌套对象只去掉排除的字段
+        is_feed = ID_FIELD in keys
+        record = {}
+        for key, value in pairs:
+            if key == ICON_FIELD and self.icon_store is not None and is_feed:
+                record[ICON_KEY_FIELD] = self.icon_store.put(value)
+            if self.keep(key) if is_feed else key not in self.exclude:
+                record[key] = value
+        return record
+
+    def parse_page(self, raw: bytes) -> Dict:
+        """一次性解码整页，解码过程中投影字段"""
+        return json.loads(raw, object_pairs_hook=self.object_pairs_hook)
+
+    def parse_stream(self, stream) -> Dict:
+        """用ijson流式解码响应体，不需要的字段解码后立刻丢弃，不在内存中保留整页文本"""
+        total = None
+        feeds = []
+        builder = None
+        skipping = None
+        for prefix, event, value in ijson.parse(stream, use_float=True):
+            if prefix == 'total' and event == 'number':
+                total = int(value)
+                continue
+            if builder is None:
+                if prefix == 'feeds.item' and event == 'start_map':
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                continue
+
+            if prefix == 'feeds.item':
+                skipping = None
+                if event == 'map_key' and not self.keep(value):
+                    skipping = value
+                    continue
+                builder.event(event, value)
+                if event == 'end_map':
+                    feeds.append(builder.value)
+                    builder = None
+                continue
+
+            if skipping is not None:
+                if skipping == ICON_FIELD and self.icon_store is not None and prefix == f'feeds.item.{ICON_FIELD}':
+                    builder.event('map_key', ICON_KEY_FIELD)
+                    builder.event('string', self.icon_store.put(value) if event == 'string' else None)
+                continue
+            builder.event(event, value)
+        return {'total': total, 'feeds': feeds}
+
+
+def create_session(pool_size: int = 16, retries: int = 3, backoff: float = 0.5,
+                   methods: Sequence[str] = ('GET',)) -> requests.Session:
+    """创建带连接池和自动重试的Session，所有请求复用TCP/TLS连接；methods为允许自动重试的方法"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(methods),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def fetch_page(session: requests.Session, api: str, offset: int, limit: int,
+               timeout: float = 30.0, attempts: int = 3,
+               projection: Optional[FeedProjection] = None) -> Dict:
+    """获取一页feed
+
+    连接失败、超时和429/5xx只由Session（urllib3 Retry，带退避）重试；这里只对响应体不完整、
+    无法解析的情况重新请求，避免两层重试叠加
+    """
+    params = {
+        "offset": offset,
+        "limit": limit
+    }
+    if projection is not None:
+        params.update(projection.params())
+    parse_errors = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+    # 读取响应体时连接中断：Session的重试只覆盖到响应头，这类错误在这里重试
+    body_errors = (requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+    last_error = None
+    for _ in range(attempts):
+        try:
+            if projection is None:
+                response = session.get(api, params=params, timeout=timeout)
+                response.raise_for_status()
+                return response.json()
+            if ijson is not None:
+                with session.get(api, params=params, timeout=timeout, stream=True) as response:
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+                    return projection.parse_stream(response.raw)
+            response = session.get(api, params=params, timeout=timeout)
+            response.raise_for_status()
+            return projection.parse_page(response.content)
+        except (*body_errors, *parse_errors) as e:
+            last_error = e
+            print(f"请求失败 offset={offset}: {e}")
+        except requests.RequestException as e:
+            # Session已经按退避重试过
+            raise RuntimeError(f"Failed to fetch feeds at offset {offset}: {e}")
+    raise RuntimeError(f"Failed to fetch feeds at offset {offset}: {last_error}")
+
+
+def iter_feed_pages(api: str = FEEDS_API, limit: int = 100, workers: int = 8,
+                    session: Optional[requests.Session] = None,
+                    projection: Optional[FeedProjection] = None,
+                    timeout: float = 30.0, start: int = 0) -> Iterator[List[Dict]]:
+    """按offset顺序逐页产出feeds（从start开始）；第一页之后的分页并发获取，并发数由workers限制，最多预取workers*2页"""
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=workers)
+
+    try:
+        first = fetch_page(session, api, start, limit, timeout=timeout, projection=projection)
+        total = first['total']
+        retrieved = start + len(first['feeds'])
+        print(f"Progress: {retrieved}/{total}")
+        yield first['feeds']
+
+        offsets = list(range(start + limit, total, limit))
+        if not offsets:
+            return
+
+        def fetch(offset: int) -> List[Dict]:
+            return fetch_page(session, api, offset, limit, timeout=timeout, projection=projection)['feeds']
+
+        # 滑动窗口：最多预取 workers*2 页，消费方处理得慢时不再继续拉取，内存占用有上限
+        window = max(1, workers) * 2
+        pending = deque()
+        offsets_iter = iter(offsets)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                for offset in itertools.islice(offsets_iter, window):
+                    pending.append(pool.submit(fetch, offset))
+                while pending:
+                    # 按offset顺序取结果，保证拼接顺序
+                    page = pending.popleft().result()
+                    for offset in itertools.islice(offsets_iter, 1):
+                        pending.append(pool.submit(fetch, offset))
+                    retrieved += len(page)
+                    print(f"Progress: {retrieved}/{total}")
+                    yield page
+            finally:
+                # 消费方提前停止或出错时，取消尚未开始的请求
+                for future in pending:
+                    future.cancel()
+    finally:
+        if own_session:
+            session.close()
+
+
+def fetch_all_feeds(api: str = FEEDS_API, limit: int = 100, workers: int = 8,
+                    session: Optional[requests.Session] = None,
+                    projection: Optional[FeedProjection] = None, timeout: float = 30.0) -> List[Dict]:
+    """获取全部feeds，按offset顺序返回"""
+    feeds = []
+    for page in iter_feed_pages(api, limit, workers, session, projection, timeout):
+        feeds.extend(page)
+    return feeds
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+已存在feed的本地索引：规范化feed_url → feed id，上传前先在本地去重，只提交真正新增的feed
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import pandas as pd
+
+from feed_export import FeedProjection, iter_feed_pages
+
+# 不同来源（接口返回 / 导出表格 / 上传表格）中feed url和id可能使用的字段名
+FEED_URL_FIELDS = ('FeedURL', 'FeedUrl', 'feed_url', 'URL', 'Url', 'url')
+FEED_ID_FIELDS = ('ID', 'Id', 'id', '_id')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_feed_url(url: str) -> str:
+    """规范化feed url：去空白、scheme/host小写、去默认端口和fragment、去掉末尾斜杠、query参数排序"""
+    url = (url or '').strip()
+    if not url:
+        return ''
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        # 无法解析的url（例如方括号不匹配）按原样比较
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        # 端口不是数字或超出范围：保留原始netloc（只把host部分小写），不中断整批处理
+        netloc = parts.netloc.rpartition('@')[2].lower()
+    else:
+        netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def pick_field(record: Dict, candidates: Iterable[str]) -> Optional[str]:
+    """从候选字段名中找出记录里存在的那个"""
+    for name in candidates:
+        if name in record:
+            return name
+    return None
+
+
+class FeedIndex:
+    """规范化feed_url → feed id 的索引"""
+
+    def __init__(self, entries: Optional[Dict[str, str]] = None, source: str = '', built_at: float = 0.0):
+        self.entries = entries or {}
+        self.source = source
+        self.built_at = built_at
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url: str) -> bool:
+        return normalize_feed_url(url) in self.entries
+
+    def get(self, url: str) -> Optional[str]:
+        return self.entries.get(normalize_feed_url(url))
+
+    def add(self, url: str, feed_id: str = ''):
+        """加入一条索引（刚上传的feed还不知道id时留空）"""
+        key = normalize_feed_url(url)
+        if key:
+            self.entries.setdefault(key, feed_id)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], source: str = '') -> 'FeedIndex':
+        """从feed记录构建索引"""
+        entries = {}
+        url_field = id_field = None
+        for record in records:
+            if url_field is None:
+                url_field = pick_field(record, FEED_URL_FIELDS)
+                id_field = pick_field(record, FEED_ID_FIELDS)
+                if url_field is None:
+                    raise ValueError(f"No feed url field found in record keys: {list(record)}")
+            key = normalize_feed_url(str(record.get(url_field) or ''))
+            if key:
+                entries[key] = str(record.get(id_field)) if id_field else ''
+        return cls(entries, source, time.time())
+
+    @classmethod
+    def from_export(cls, path: str) -> 'FeedIndex':
+        """从之前导出的feed列表文件（xlsx/csv/parquet）构建索引"""
+        suffix = Path(path).suffix.lower()
+        if suffix == '.parquet':
+            df = pd.read_parquet(path)
+        elif suffix == '.csv':
+            df = pd.read_csv(path, dtype=str)
+        else:
+            df = pd.read_excel(path, dtype=str)
+        return cls.from_records(df.to_dict(orient='records'), source=path)
+
+    @classmethod
+    def from_api(cls, api: str, limit: int = 100, workers: int = 8, session=None,
+                 timeout: float = 30.0) -> 'FeedIndex':
+        """分页拉取 /api/feeds 构建索引，解码时丢弃IconContent等大字段"""
+        projection = FeedProjection(exclude=['IconContent'])
+        index = cls(source=api, built_at=time.time())
+        for page in iter_feed_pages(api, limit, workers, session, projection, timeout):
+            index.entries.update(cls.from_records(page).entries)
+        return index
+
+    def save(self, path: str):
+        """保存索引缓存"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': self.source, 'built_at': self.built_at, 'entries': self.entries},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def load(cls, path: str) -> 'FeedIndex':
+        """加载索引缓存"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['entries'], data.get('source', ''), data.get('built_at', 0.0))
+
+    def split(self, rows: List[Dict], url_field: str = 'feed_url') -> Tuple[List[Dict], List[Dict]]:
+        """把待上传的行分成 (新增, 已存在)；输入中重复的url只保留第一条"""
+        new_rows, existing_rows = [], []
+        seen = set()
+        for row in rows:
+            key = normalize_feed_url(row.get(url_field, ''))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if key in self.entries:
+                existing_rows.append(dict(row, id=self.entries[key]))
+            else:
+                new_rows.append(row)
+        return new_rows, existing_rows
+
+
+def load_or_build_index(api: str, cache_file: str, max_age: float = 3600.0,
+                        export_file: Optional[str] = None, **kwargs) -> FeedIndex:
+    """优先使用未过期的索引缓存，其次使用导出文件，最后分页拉取接口重建"""
+    if Path(cache_file).exists():
+        index = FeedIndex.load(cache_file)
+        # 按索引构建时间判断是否过期（上传后追加条目不会刷新构建时间）
+        if time.time() - index.built_at < max_age:
+            print(f"Loaded feed index from cache: {len(index)} feeds")
+            return index
+
+    if export_file and Path(export_file).exists():
+        index = FeedIndex.from_export(export_file)
+        print(f"Built feed index from export {export_file}: {len(index)} feeds")
+    else:
+        index = FeedIndex.from_api(api, **kwargs)
+        print(f"Built feed index from {api}: {len(index)} feeds")
+    index.save(cache_file)
+    return index
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+批量添加feed：把输入表格按块切分，用连接池并发调用 /api/batchCreateFeeds，合并各块返回的“已存在”结果
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from feed_export import create_session
+from feed_index import FeedIndex, normalize_feed_url
+
+BATCH_CREATE_API = "https://recommend-server-test.bttcdn.com/api/batchCreateFeeds"
+# 服务端明确没有处理请求的状态码，只有这些情况重试POST
+RETRY_STATUS = (429, 503)
+# 重试等待：没有Retry-After时按 backoff * 2^n 指数退避，最长等待 MAX_RETRY_DELAY 秒
+RETRY_BACKOFF = 1.0
+MAX_RETRY_DELAY = 60.0
+
+
+class AmbiguousChunkError(RuntimeError):
+    """请求已发出但没有拿到结果（读超时、连接中断、网关错误），服务端可能已经创建了部分feed"""
+
+
+def load_feed_rows(excel_file: str, category_id: str) -> List[Dict]:
+    """读取feed表格，组装成 batchCreateFeeds 需要的 [{category_id, feed_url}] 列表"""
+    df = pd.read_excel(excel_file, usecols=['feed_url'])
+    df = df.dropna(subset=['feed_url'])
+    return [{"category_id": category_id, "feed_url": str(url).strip()} for url in df['feed_url']]
+
+
+def chunked(items: Sequence, size: int) -> List[Sequence]:
+    """按固定大小切块"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def request_not_sent(error: requests.RequestException) -> bool:
+    """连接没有建立（连接超时、拒绝连接、DNS失败）：请求体没有发出，服务端肯定没有处理"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    # requests把urllib3的MaxRetryError包在ConnectionError中，原因在 .reason 上
+    reason = getattr(error.args[0], 'reason', error.args[0])
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+def retry_delay(response: requests.Response, attempt: int, backoff: float = RETRY_BACKOFF) -> float:
+    """第attempt次重试前的等待秒数：优先使用Retry-After（秒数或HTTP日期），否则指数退避"""
+    value = (response.headers.get('Retry-After') or '').strip()
+    if value:
+        try:
+            return min(max(float(value), 0.0), MAX_RETRY_DELAY)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+                return min(max(delay, 0.0), MAX_RETRY_DELAY)
+            except (TypeError, ValueError):
+                pass
+    return min(backoff * (2 ** attempt), MAX_RETRY_DELAY)
+
+
+def post_chunk(session: requests.Session, api: str, chunk: Sequence[Dict],
+               timeout: float = 60.0, attempts: int = 3, backoff: float = RETRY_BACKOFF):
+    """发送一块数据，返回服务端响应（已存在的feed）
+
+    POST不是幂等的：连接失败由Session重试（请求未发出），这里只在429/503时按Retry-After或指数退避重试；
+    读超时等无法确定服务端是否已处理的情况不重试，抛出AmbiguousChunkError
+    """
+    # 紧凑JSON，不使用 indent=4
+    data = json.dumps(list(chunk), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    headers = {
+        "Content-Type": "application/json"
+    }
+
+    last_error = None
+    for attempt in range(attempts):
+        try:
+            response = session.post(api, headers=headers, data=data, timeout=timeout)
+        except requests.RequestException as e:
+            if request_not_sent(e):
+                raise RuntimeError(str(e))
+            raise AmbiguousChunkError(str(e))
+        if response.status_code == 200:
+            try:
+                return response.json() if response.content else []
+            except ValueError as e:
+                raise AmbiguousChunkError(f"invalid response: {e}")
+        last_error = f"status {response.status_code}: {response.text[:200]}"
+        if response.status_code not in RETRY_STATUS:
+            if response.status_code >= 500:
+                raise AmbiguousChunkError(last_error)
+            break
+        if attempt + 1 < attempts:
+            time.sleep(retry_delay(response, attempt, backoff))
+    raise RuntimeError(last_error)
+
+
+def merge_existing(results: List) -> List:
+    """合并各块返回的“已存在”结果"""
+    merged = []
+    for result in results:
+        if isinstance(result, list):
+            merged.extend(result)
+        elif isinstance(result, dict):
+            lists = [value for value in result.values() if isinstance(value, list)]
+            if lists:
+                for value in lists:
+                    merged.extend(value)
+            else:
+                merged.append(result)
+        elif result:
+            merged.append(result)
+    return merged
+
+
+def upload_feeds(records: List[Dict], api: str = BATCH_CREATE_API, chunk_size: int = 200,
+                 workers: int = 4, session: Optional[requests.Session] = None, timeout: float = 60.0) -> Dict:
+    """分块并发上传，返回合并后的报告；单块失败不影响其他块"""
+    chunks = chunked(records, chunk_size)
+    own_session = session is None
+    if own_session:
+        # 不允许Session自动重试POST，重试只在post_chunk中进行
+        session = create_session(pool_size=workers)
+
+    results: Dict[int, object] = {}
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(post_chunk, session, api, chunk, timeout): index
+                       for index, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                    print(f"Chunk {index + 1}/{len(chunks)} done")
+                except Exception as e:
+                    print(f"Chunk {index + 1}/{len(chunks)} failed: {e}")
+                    failed.append({"chunk": index, "error": str(e), "feeds": list(chunks[index]),
+                                   "ambiguous": isinstance(e, AmbiguousChunkError)})
+    finally:
+        if own_session:
+            session.close()
+
+    existing = merge_existing([results[i] for i in sorted(results)])
+    return {
+        "total": len(records),
+        "chunks": len(chunks),
+        "succeeded_chunks": len(results),
+        "existing": existing,
+        "failed": sorted(failed, key=lambda item: item["chunk"]),
+    }
+
+
+def reconcile_failed(report: Dict, fresh_index: FeedIndex) -> List[Dict]:
+    """用重新拉取的索引核对结果不确定的块：已在服务端的feed从failed移到reconciled"""
+    reconciled = []
+    remaining = []
+    for item in report['failed']:
+        if item.get('ambiguous'):
+            created = [dict(feed, id=fresh_index.get(feed['feed_url'])) for feed in item['feeds']
+                       if feed['feed_url'] in fresh_index]
+            reconciled.extend(created)
+            item['feeds'] = [feed for feed in item['feeds'] if feed['feed_url'] not in fresh_index]
+        if item['feeds']:
+            remaining.append(item)
+    report['failed'] = remaining
+    return reconciled
+
+
+def upload_new_feeds(records: List[Dict], index: FeedIndex, api: str = BATCH_CREATE_API,
+                     index_file: Optional[str] = None,
+                     refresh_index: Optional[Callable[[], FeedIndex]] = None, **kwargs) -> Dict:
+    """先用本地索引去重，只上传新增的feed；上传成功的feed加入索引
+
+    有结果不确定的块时，用refresh_index重新拉取服务端的索引核对，避免把已创建的feed报告为失败
+    """
+    new_rows, existing_rows = index.split(records)
+    print(f"{len(records)} rows: {len(new_rows)} new, {len(existing_rows)} already exist, "
+          f"{len(records) - len(new_rows) - len(existing_rows)} duplicated in input")
+    if not new_rows:
+        return {"total": 0, "chunks": 0, "succeeded_chunks": 0, "existing": [], "failed": [],
+                "reconciled": [], "skipped": existing_rows}
+
+    report = upload_feeds(new_rows, api, **kwargs)
+    report['reconciled'] = []
+    if refresh_index is not None and any(item.get('ambiguous') for item in report['failed']):
+        print("Some chunks ended without a response, checking them against the server...")
+        report['reconciled'] = reconcile_failed(report, refresh_index())
+        print(f"{len(report['reconciled'])} feeds from those chunks were created")
+        for feed in report['reconciled']:
+            index.entries[normalize_feed_url(feed['feed_url'])] = feed['id'] or ''
+    failed_urls = {feed['feed_url'] for item in report['failed'] for feed in item['feeds']}
+    for row in new_rows:
+        if row['feed_url'] not in failed_urls:
+            index.add(row['feed_url'])
+    if index_file:
+        index.save(index_file)
+
+    report['skipped'] = existing_rows
+    return report
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Feed列表流式导出：按页写入xlsx（xlsxwriter constant_memory模式）/ csv / parquet，内存占用与总行数无关
+"""
+
+import csv
+import json
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# xlsx单个工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048576
+
+
+def cell_value(value):
+    """列表/字典等复杂值转成JSON字符串，便于写入表格"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class FeedWriter(ABC):
+    """流式写入基类：列由调用方声明（如投影的字段），未声明时由第一页确定，之后逐页追加"""
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.columns: Optional[List[str]] = list(columns) if columns else None
+        self.rows = 0
+        # 不在列中、写入时被丢弃的字段
+        self.dropped: Dict[str, int] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_page(self, records: List[Dict]):
+        """写入一页记录"""
+        if not records:
+            return
+        if self.rows == 0:
+            if self.columns is None:
+                self.columns = list(dict.fromkeys(key for record in records for key in record))
+            self.open(self.columns)
+        self.check_columns(records)
+        self.write_records(records)
+        self.rows += len(records)
+
+    def check_columns(self, records: List[Dict]):
+        """记录不在列中的字段，第一次出现时提示"""
+        columns = set(self.columns)
+        for record in records:
+            for key in record:
+                if key not in columns:
+                    if key not in self.dropped:
+                        print(f"Warning: field {key!r} is not in the export columns and will be dropped")
+                    self.dropped[key] = self.dropped.get(key, 0) + 1
+
+    @abstractmethod
+    def open(self, columns: List[str]):
+        """确定列之后创建输出（写表头等）"""
+
+    @abstractmethod
+    def write_records(self, records: List[Dict]):
+        """追加写入记录"""
+
+    def close(self):
+        """完成写入并释放文件"""
+        pass
+
+
+class XlsxFeedWriter(FeedWriter):
+    """xlsxwriter的constant_memory模式：每写完一行就刷到临时文件，不保留整个工作簿"""
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None):
+        super().__init__(path, columns)
+        import xlsxwriter
+        self.workbook = xlsxwriter.Workbook(str(self.path), {'constant_memory': True})
+        self.sheet = None
+        self.sheet_row = 0
+
+    def add_sheet(self):
+        """新建工作表并写入表头；超过xlsx行数上限时自动换到下一个工作表"""
+        self.sheet = self.workbook.add_worksheet()
+        self.sheet.write_row(0, 0, self.columns)
+        self.sheet_row = 1
+
+    def open(self, columns: List[str]):
+        self.add_sheet()
+
+    def write_records(self, records: List[Dict]):
+        for record in records:
+            if self.sheet_row >= XLSX_MAX_ROWS:
+                self.add_sheet()
+            self.sheet.write_row(self.sheet_row, 0, [cell_value(record.get(c)) for c in self.columns])
+            self.sheet_row += 1
+
+    def close(self):
+        if self.sheet is None:
+            self.workbook.add_worksheet()
+        self.workbook.close()
+
+
+class CsvFeedWriter(FeedWriter):
+    """CSV导出"""
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None):
+        super().__init__(path, columns)
+        self.file = open(self.path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = None
+
+    def open(self, columns: List[str]):
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_records(self, records: List[Dict]):
+        columns = self.columns
+        self.writer.writerows([cell_value(record.get(c)) for c in columns] for record in records)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetFeedWriter(FeedWriter):
+    """Parquet导出：每页作为一个row group追加，schema由第一页推断"""
+
+    def __init__(self, path: str, columns: Optional[Sequence[str]] = None):
+        super().__init__(path, columns)
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.writer = None
+        self.schema = None
+
+    def open(self, columns: List[str]):
+        pass
+
+    def write_records(self, records: List[Dict]):
+        data = {c: [record.get(c) for record in records] for c in self.columns}
+        if self.writer is None:
+            table = self.pa.table(data)
+            # 第一页全为空的列推断不出类型，按字符串处理
+            schema = self.pa.schema([
+                field.with_type(self.pa.string()) if self.pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            table = table.cast(schema)
+            self.writer = self.pq.ParquetWriter(str(self.path), schema)
+            self.schema = schema
+        else:
+            table = self.pa.table(data, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {
+    '.xlsx': XlsxFeedWriter,
+    '.csv': CsvFeedWriter,
+    '.parquet': ParquetFeedWriter,
+}
+
+
+def open_writer(path: str, columns: Optional[Sequence[str]] = None) -> FeedWriter:
+    """根据扩展名选择导出格式"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in WRITERS:
+        raise ValueError(f"Unsupported export format: {suffix} (supported: {', '.join(WRITERS)})")
+    return WRITERS[suffix](path, columns)
+
+
+def export_feeds(pages: Iterable[List[Dict]], path: str, columns: Optional[Sequence[str]] = None) -> Dict:
+    """把分页流逐页写入文件，返回行数、耗时和rows/s；columns为None时由第一页确定列"""
+    start = time.perf_counter()
+    with open_writer(path, columns) as writer:
+        for page in pages:
+            writer.write_page(page)
+    elapsed = time.perf_counter() - start
+    stats = {
+        'path': path,
+        'rows': writer.rows,
+        'seconds': elapsed,
+        'rows_per_second': writer.rows / elapsed if elapsed > 0 else 0.0,
+        'dropped_fields': writer.dropped,
+    }
+    print(f"Exported {stats['rows']} rows to {path} in {elapsed:.2f}s ({stats['rows_per_second']:.0f} rows/s)")
+    return stats
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+feedname批量管理：读取期望状态清单（YAML/CSV），与 /api/feednames 比对生成变更计划，
+并发执行 创建 / 删除 / setFeeds，支持只输出计划的 dry-run
+"""
+
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from feed_index import FEED_ID_FIELDS, pick_field
+from recommend_client import DEFAULT_ENV, RecommendApiError, RecommendClient, read_column
+
+# 接口返回的feedname中名称、feed列表可能使用的字段名
+FEEDNAME_NAME_FIELDS = ('name', 'Name')
+FEEDNAME_FEEDS_FIELDS = ('feed_id', 'FeedID', 'FeedIDs', 'feed_ids', 'Feeds', 'feeds')
+# 创建feedname时可以携带的字段
+FEEDNAME_CREATE_FIELDS = ('name', 'language', 'feed_provider', 'entry_provider', 'description', 'feed_id')
+# CSV清单中多个值的分隔符
+LIST_SEPARATOR = ';'
+
+
+def split_list(value) -> List[str]:
+    """把 'a;b' 或列表统一成去空白的字符串列表"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(LIST_SEPARATOR)
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def normalize_entry(entry: Dict, base_dir: Path) -> Dict:
+    """整理清单中的一条feedname：feed_file 展开成feed id列表，language统一成列表
+
+    既没有feed_id也没有feed_file时不设置feed_id（不改动已有feedname的feed）；只有显式的空列表才会清空
+    """
+    entry = {key: value for key, value in entry.items() if value not in (None, '')}
+    if 'name' not in entry:
+        raise ValueError(f"Manifest entry without name: {entry}")
+    entry['name'] = str(entry['name']).strip()
+    entry['state'] = entry.get('state', 'present')
+    if entry['state'] not in ('present', 'absent'):
+        raise ValueError(f"Unknown state for feedname {entry['name']}: {entry['state']}")
+
+    specified = 'feed_id' in entry or 'feed_file' in entry
+    feed_ids = split_list(entry.get('feed_id'))
+    # 也可以像op_script一样引用表格中的ID列
+    if 'feed_file' in entry:
+        feed_file = Path(entry.pop('feed_file'))
+        if not feed_file.is_absolute():
+            feed_file = base_dir / feed_file
+        feed_ids += read_column(str(feed_file), entry.pop('feed_column', 'ID'))
+    if specified:
+        entry['feed_id'] = list(dict.fromkeys(feed_ids))
+    if 'language' in entry:
+        entry['language'] = split_list(entry['language'])
+    return entry
+
+
+def load_manifest(path: str) -> Dict:
+    """读取清单，返回 {'prune': bool, 'feednames': {name: entry}}
+
+    YAML: {prune: false, feednames: [{name, language, feed_provider, entry_provider, description, feed_id | feed_file}]}
+    CSV:  每行一个feedname，或每行一个 (name, feed_id)；同名的行合并feed_id
+    """
+    manifest_path = Path(path)
+    base_dir = manifest_path.parent
+    suffix = manifest_path.suffix.lower()
+
+    if suffix in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ImportError("PyYAML is required for YAML manifests: pip install pyyaml")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+        if isinstance(data, list):
+            data = {'feednames': data}
+        prune = bool(data.get('prune', False))
+        entries = data.get('feednames') or []
+    elif suffix == '.csv':
+        prune = False
+        merged: Dict[str, Dict] = {}
+        with open(manifest_path, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                name = (row.get('name') or '').strip()
+                if not name:
+                    continue
+                entry = merged.setdefault(name, {})
+                for key, value in row.items():
+                    if key == 'feed_id':
+                        # feed_id列全为空时视为未指定
+                        if split_list(value):
+                            entry.setdefault('feed_id', []).extend(split_list(value))
+                    elif value and key not in entry:
+                        entry[key] = value
+        entries = list(merged.values())
+    else:
+        raise ValueError(f"Unsupported manifest format: {suffix} (supported: .yaml, .yml, .csv)")
+
+    feednames = {}
+    for raw in entries:
+        entry = normalize_entry(dict(raw), base_dir)
+        if entry['name'] in feednames:
+            raise ValueError(f"Duplicate feedname in manifest: {entry['name']}")
+        feednames[entry['name']] = entry
+    return {'prune': prune, 'feednames': feednames}
+
+
+def feed_ids_of(items) -> List[str]:
+    """从feed id列表或feed记录列表中取出id"""
+    ids = []
+    for item in items or []:
+        if isinstance(item, dict):
+            field = pick_field(item, FEED_ID_FIELDS)
+            if field:
+                ids.append(str(item[field]))
+        else:
+            ids.append(str(item))
+    return ids
+
+
+def fetch_current(client: RecommendClient, workers: int = 8) -> Dict[str, Dict]:
+    """获取当前所有feedname，返回 {name: {'id', 'name', 'feed_id', 'record'}}
+
+    列表接口没有带feed列表时，并发请求 /api/feednames/{id}/feeds 补齐
+    """
+    current = {}
+    missing = []
+    for record in client.list_feednames():
+        name_field = pick_field(record, FEEDNAME_NAME_FIELDS)
+        id_field = pick_field(record, FEED_ID_FIELDS)
+        if name_field is None or id_field is None:
+            raise ValueError(f"Unexpected feedname record keys: {list(record)}")
+        item = {'id': str(record[id_field]), 'name': record[name_field], 'record': record}
+        feeds_field = pick_field(record, FEEDNAME_FEEDS_FIELDS)
+        if feeds_field is not None:
+            item['feed_id'] = feed_ids_of(record[feeds_field])
+        else:
+            missing.append(item)
+        current[item['name']] = item
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(workers, client.pool_size)) as pool:
+            futures = {pool.submit(client.feedname_feeds, item['id']): item for item in missing}
+            for future in as_completed(futures):
+                futures[future]['feed_id'] = feed_ids_of(future.result())
+    return current
+
+
+def build_plan(manifest: Dict, current: Dict[str, Dict], prune: Optional[bool] = None) -> Dict:
+    """比对期望状态与当前状态，生成变更计划
+
+    - 清单中有、服务端没有：create（创建时直接带上feed_id，不需要再setFeeds）
+    - 两边都有但feed集合不同：set_feeds（按清单顺序整体替换）；清单未指定feed_id时不比对feed
+    - state: absent，或开启prune时服务端有、清单中没有：delete
+    """
+    prune = manifest.get('prune', False) if prune is None else prune
+    plan = {'create': [], 'set_feeds': [], 'delete': [], 'unchanged': []}
+
+    for name, entry in manifest['feednames'].items():
+        existing = current.get(name)
+        if entry['state'] == 'absent':
+            if existing:
+                plan['delete'].append({'id': existing['id'], 'name': name})
+            continue
+        if existing is None:
+            plan['create'].append({key: entry[key] for key in FEEDNAME_CREATE_FIELDS if key in entry})
+            continue
+        if 'feed_id' not in entry:
+            plan['unchanged'].append(name)
+            continue
+        desired, actual = set(entry['feed_id']), set(existing['feed_id'])
+        if desired == actual:
+            plan['unchanged'].append(name)
+        else:
+            plan['set_feeds'].append({
+                'id': existing['id'],
+                'name': name,
+                'feed_id': entry['feed_id'],
+                'added': len(desired - actual),
+                'removed': len(actual - desired),
+            })
+
+    if prune:
+        for name, existing in current.items():
+            if name not in manifest['feednames']:
+                plan['delete'].append({'id': existing['id'], 'name': name})
+    return plan
+
+
+def print_plan(plan: Dict):
+    """打印变更计划"""
+    for item in plan['create']:
+        print(f"  + create  {item['name']} ({len(item.get('feed_id', []))} feeds)")
+    for item in plan['set_feeds']:
+        print(f"  ~ setFeeds {item['name']} [{item['id']}] +{item['added']} -{item['removed']}")
+    for item in plan['delete']:
+        print(f"  - delete  {item['name']} [{item['id']}]")
+    print(f"Plan: {len(plan['create'])} to create, {len(plan['set_feeds'])} to update, "
+          f"{len(plan['delete'])} to delete, {len(plan['unchanged'])} unchanged")
+
+
+def apply_plan(client: RecommendClient, plan: Dict, workers: int = 8) -> Dict:
+    """并发执行变更计划（不同feedname之间互不依赖），单个操作失败不影响其他操作"""
+    tasks = (
+        [('create', item['name'], client.create_feedname, (item,)) for item in plan['create']]
+        + [('set_feeds', item['name'], client.set_feeds, (item['id'], item['feed_id'])) for item in plan['set_feeds']]
+        + [('delete', item['name'], client.delete_feedname, (item['id'],)) for item in plan['delete']]
+    )
+    results = {'succeeded': [], 'failed': [], 'created': {}}
+    with ThreadPoolExecutor(max_workers=min(workers, client.pool_size)) as pool:
+        futures = {pool.submit(func, *args): (action, name) for action, name, func, args in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            action, name = futures[future]
+            try:
+                result = future.result()
+                if action == 'create':
+                    results['created'][name] = result
+                results['succeeded'].append({'action': action, 'name': name})
+                print(f"[{done}/{len(tasks)}] {action} {name} done")
+            except (RecommendApiError, requests.RequestException) as e:
+                results['failed'].append({'action': action, 'name': name, 'error': str(e)})
+                print(f"[{done}/{len(tasks)}] {action} {name} failed: {e}")
+    return results
+
+
+def sync_feednames(client: RecommendClient, manifest_file: str, dry_run: bool = True,
+                   prune: Optional[bool] = None, workers: int = 8) -> Dict:
+    """读取清单 → 比对 → 打印计划 →（非dry-run时）执行"""
+    manifest = load_manifest(manifest_file)
+    current = fetch_current(client, workers)
+    print(f"Manifest: {len(manifest['feednames'])} feednames, server ({client.env}): {len(current)} feednames")
+    plan = build_plan(manifest, current, prune)
+    print_plan(plan)
+    if dry_run:
+        return {'plan': plan}
+    return {'plan': plan, 'results': apply_plan(client, plan, workers)}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="按清单批量管理feedname")
+    parser.add_argument("manifest", help="清单文件（.yaml/.yml/.csv）")
+    parser.add_argument("--env", default=DEFAULT_ENV, help="环境名称")
+    parser.add_argument("--config", default="recommend_config.json", help="环境配置文件路径")
+    parser.add_argument("--workers", type=int, default=8, help="最大并发请求数")
+    parser.add_argument("--prune", action="store_true", default=None, help="删除清单中没有的feedname")
+    parser.add_argument("--apply", action="store_true", help="执行变更（默认只输出计划）")
+    parser.add_argument("--plan-file", help="把计划和执行结果保存为JSON")
+    args = parser.parse_args()
+
+    try:
+        with RecommendClient(args.env, config_file=args.config) as client:
+            outcome = sync_feednames(client, args.manifest, not args.apply, args.prune, args.workers)
+    except (RecommendApiError, requests.RequestException) as e:
+        print(f"请求失败: {e}")
+        sys.exit(1)
+
+    if args.plan_file:
+        Path(args.plan_file).write_text(json.dumps(outcome, ensure_ascii=False, indent=2), encoding='utf-8')
+    if not args.apply:
+        print("Dry run: no changes applied (use --apply to execute)")
+    elif outcome['results']['failed']:
+        print(f"{len(outcome['results']['failed'])} operations failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+图标批量审查：进程池中解码图标、生成缩略图，按内容哈希去重；
+缩略图和检查结果按内容寻址缓存到磁盘，重复运行时跳过已处理过的图标，并标记损坏或过大的图标
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from PIL import Image
+    from PIL.Image import DecompressionBombError
+except ImportError:
+    Image = None
+
+from feed_export import FeedProjection, ICON_FIELD, ID_FIELD
+from feed_writer import export_feeds
+from icon_store import decode_icon
+
+THUMBNAIL_SIZE = (64, 64)
+# 超过以下限制的图标标记为过大
+MAX_ICON_BYTES = 256 * 1024
+MAX_ICON_DIMENSION = 1024
+# 每页审查结果的行数（写报告时按页写入）
+REPORT_PAGE_SIZE = 1000
+
+
+def inspect_icon(data: bytes, thumbnail_size: Tuple[int, int] = THUMBNAIL_SIZE,
+                 max_bytes: int = MAX_ICON_BYTES, max_dimension: int = MAX_ICON_DIMENSION) -> Dict:
+    """在子进程中运行：检查图片并生成PNG缩略图，返回检查结果（缩略图字节放在 'thumbnail' 中）"""
+    result = {'bytes': len(data), 'format': None, 'width': None, 'height': None, 'flags': []}
+    if len(data) > max_bytes:
+        result['flags'].append('oversized_bytes')
+    try:
+        # verify() 之后图片对象不能再用，需要重新打开
+        with Image.open(BytesIO(data)) as image:
+            image.verify()
+        with Image.open(BytesIO(data)) as image:
+            result.update(format=image.format, width=image.width, height=image.height)
+            if max(image.size) > max_dimension:
+                result['flags'].append('oversized_dimensions')
+            image.thumbnail(thumbnail_size)
+            buffer = BytesIO()
+            image.convert('RGBA').save(buffer, format='PNG', optimize=True)
+            result['thumbnail'] = buffer.getvalue()
+    except DecompressionBombError as e:
+        # 像素数超过Pillow的解压炸弹上限，打开时就被拒绝，按尺寸过大处理
+        result['flags'].append('oversized_dimensions')
+        result['error'] = f"{type(e).__name__}: {e}"
+    except Exception as e:
+        # SVG等PIL不支持的格式也会归为broken，报告中保留错误信息便于区分；
+        # 损坏的图片除了UnidentifiedImageError/OSError，还可能在解码器内部抛出struct.error、IndexError、MemoryError等
+        result['flags'].append('broken')
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['status'] = 'broken' if 'broken' in result['flags'] else (
+        'oversized' if result['flags'] else 'ok')
+    return result
+
+
+class ThumbnailCache:
+    """按图标内容sha256寻址的缩略图和检查结果缓存：<root>/<hash前两位>/<hash>.png / .json"""
+
+    def __init__(self, root: str = 'output/icon_thumbnails'):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def paths(self, digest: str) -> Tuple[Path, Path]:
+        """缩略图路径和结果路径"""
+        directory = self.root / digest[:2]
+        return directory / f"{digest}.png", directory / f"{digest}.json"
+
+    def get(self, digest: str) -> Optional[Dict]:
+        """读取缓存的检查结果，未处理过时返回None"""
+        _, meta_path = self.paths(digest)
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_atomic(self, path: Path, data: bytes):
+        """先写临时文件再重命名"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+
+    def put(self, digest: str, result: Dict) -> Dict:
+        """保存缩略图和检查结果；结果文件最后写入，作为该图标已处理完成的标记"""
+        thumb_path, meta_path = self.paths(digest)
+        thumbnail = result.pop('thumbnail', None)
+        if thumbnail is not None:
+            self.write_atomic(thumb_path, thumbnail)
+            result['thumbnail'] = str(thumb_path.relative_to(self.root))
+        self.write_atomic(meta_path, json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        return result
+
+
+def icons_from_pages(pages: Iterable[List[Dict]]) -> Iterator[Tuple[str, Optional[bytes], str]]:
+    """从feed分页中取出图标，产出 (feed ID, 图片字节, 扩展名)；无法解码的base64字节为None"""
+    for page in pages:
+        for feed in page:
+            content = feed.get(ICON_FIELD)
+            if not content:
+                continue
+            try:
+                data, ext = decode_icon(content)
+            except ValueError:
+                data, ext = None, ''
+            yield str(feed.get(ID_FIELD, '')), data, ext
+
+
+def icons_from_store(root: str) -> Iterator[Tuple[str, Optional[bytes], str]]:
+    """从导出时保存的图标目录（IconStore）中读取图标，产出 (IconKey, 图片字节, 扩展名)"""
+    root_path = Path(root)
+    for path in sorted(root_path.rglob('*')):
+        if path.is_file() and not path.name.startswith('.tmp-'):
+            yield str(path.relative_to(root_path)), path.read_bytes(), path.suffix
+
+
+def audit_icons(icons: Iterable[Tuple[str, Optional[bytes], str]], cache: ThumbnailCache,
+                workers: int = 0, max_in_flight: int = 0, **limits) -> Iterator[Dict]:
+    """逐个产出审查结果
+
+    - 图标在主进程解码并计算sha256，相同内容只处理一次（本次运行内 + 磁盘缓存）
+    - 未处理过的图标提交到进程池，同时在途的任务数有上限，不会把所有图标都放进内存
+    - 结果按输入顺序产出
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    # 本次运行中已提交但还没完成的哈希 → future，同一图标的后续引用共用一个结果
+    running: Dict[str, object] = {}
+    pending = deque()
+    stats = {'icons': 0, 'unique': 0, 'cached': 0, 'processed': 0}
+
+    def finish(source, digest, ext, future_or_result):
+        if isinstance(future_or_result, dict):
+            result = future_or_result
+        else:
+            try:
+                result = future_or_result.result()
+            except Exception as e:
+                # 子进程异常退出（BrokenProcessPool）等情况：记为broken，不写缓存，下次运行重新检查
+                running.pop(digest, None)
+                return {'status': 'broken', 'flags': ['broken'], 'error': f"{type(e).__name__}: {e}",
+                        'source': source, 'sha256': digest, 'ext': ext}
+            if digest in running:
+                del running[digest]
+                result = cache.put(digest, result)
+                stats['processed'] += 1
+            else:
+                result = cache.get(digest)
+        return dict(result, source=source, sha256=digest, ext=ext)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        seen = set()
+        for source, data, ext in icons:
+            stats['icons'] += 1
+            if data is None:
+                pending.append((source, '', ext, {'status': 'broken', 'flags': ['invalid_base64']}))
+            else:
+                digest = hashlib.sha256(data).hexdigest()
+                if digest not in seen:
+                    seen.add(digest)
+                    stats['unique'] += 1
+                cached = None if digest in running else cache.get(digest)
+                if cached is not None:
+                    stats['cached'] += 1
+                    pending.append((source, digest, ext, cached))
+                elif digest in running:
+                    pending.append((source, digest, ext, running[digest]))
+                else:
+                    future = pool.submit(inspect_icon, data, **limits)
+                    running[digest] = future
+                    pending.append((source, digest, ext, future))
+            # 在途任务过多时先消费最早的结果
+            while len(running) >= max_in_flight or len(pending) > max_in_flight * 4:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+
+    print(f"Icons: {stats['icons']}, unique: {stats['unique']}, "
+          f"cached: {stats['cached']}, processed: {stats['processed']}")
+
+
+def report_pages(results: Iterable[Dict], page_size: int = REPORT_PAGE_SIZE,
+                 only_flagged: bool = False) -> Iterator[List[Dict]]:
+    """把审查结果整理成报告行并分页，供 export_feeds 流式写入"""
+    page = []
+    for result in results:
+        if only_flagged and result.get('status') == 'ok':
+            continue
+        page.append({
+            'source': result['source'],
+            'sha256': result['sha256'],
+            'status': result['status'],
+            'flags': ','.join(result.get('flags', [])),
+            'format': result.get('format'),
+            'width': result.get('width'),
+            'height': result.get('height'),
+            'bytes': result.get('bytes'),
+            'thumbnail': result.get('thumbnail'),
+            'error': result.get('error'),
+        })
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="批量审查feed图标")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--env", help="从该环境的 /api/feeds 读取图标")
+    source.add_argument("--icons", help="从导出时保存的图标目录读取")
+    parser.add_argument("--config", default="recommend_config.json", help="环境配置文件路径")
+    parser.add_argument("--cache", default="output/icon_thumbnails", help="缩略图缓存目录")
+    parser.add_argument("--output", default="output/icon_audit.csv", help="审查报告（.csv/.xlsx/.parquet）")
+    parser.add_argument("--only-flagged", action="store_true", help="报告中只保留有问题的图标")
+    parser.add_argument("--workers", type=int, default=0, help="解码进程数（默认CPU核数）")
+    parser.add_argument("--fetch-workers", type=int, default=4,
+                        help="--env时并发拉取分页的数量（最多预取 2 倍的分页）")
+    parser.add_argument("--max-bytes", type=int, default=MAX_ICON_BYTES, help="图标字节数上限")
+    parser.add_argument("--max-dimension", type=int, default=MAX_ICON_DIMENSION, help="图标边长上限")
+    parser.add_argument("--thumbnail-size", type=int, default=THUMBNAIL_SIZE[0], help="缩略图边长")
+    args = parser.parse_args()
+
+    if Image is None:
+        print("Pillow is required: pip install pillow")
+        sys.exit(1)
+
+    limits = dict(thumbnail_size=(args.thumbnail_size, args.thumbnail_size),
+                  max_bytes=args.max_bytes, max_dimension=args.max_dimension)
+    cache = ThumbnailCache(args.cache)
+
+    client = None
+    if args.env:
+        from recommend_client import RecommendClient
+        client = RecommendClient(args.env, config_file=args.config)
+        # 只保留ID和IconContent，其余字段解码时丢弃
+        projection = FeedProjection(exclude=(), fields=[ID_FIELD, ICON_FIELD])
+        # 分页按滑动窗口预取，内存中最多保留 fetch_workers*2 页图标
+        icons = icons_from_pages(client.iter_feed_pages(workers=args.fetch_workers, projection=projection))
+    else:
+        icons = icons_from_store(args.icons)
+
+    try:
+        results = audit_icons(icons, cache, args.workers, **limits)
+        export_feeds(report_pages(results, only_flagged=args.only_flagged), args.output)
+    finally:
+        if client is not None:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+按内容寻址的图标文件存储：IconContent解码后按sha256存放，相同图标只保存一份
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+# data URL中的MIME类型对应的文件扩展名
+MIME_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg',
+    'image/x-icon': '.ico',
+    'image/vnd.microsoft.icon': '.ico',
+}
+
+
+def decode_icon(icon_content: str) -> Tuple[bytes, str]:
+    """解码IconContent（data:image/png;base64,... 或纯base64），返回 (图片字节, 扩展名)"""
+    mime = ''
+    data = icon_content
+    if icon_content.startswith('data:') and ',' in icon_content:
+        header, data = icon_content.split(',', 1)
+        mime = header[5:].split(';', 1)[0].lower()
+    try:
+        return base64.b64decode(data, validate=False), MIME_EXTENSIONS.get(mime, '.bin')
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid icon content: {e}")
+
+
+class IconStore:
+    """图标文件存储，目录结构为 <root>/<hash前两位>/<hash><扩展名>"""
+
+    def __init__(self, root: str = 'output/icons'):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str) -> Path:
+        """根据put返回的key得到文件路径"""
+        return self.root / key
+
+    def put_bytes(self, data: bytes, ext: str = '.bin') -> str:
+        """保存图片字节，返回相对key；已存在的内容不会重复写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{digest[:2]}/{digest}{ext}"
+        with self._lock:
+            if key in self._known:
+                return key
+
+        path = self.path_for(key)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再重命名，多个线程写同一图标也不会得到半个文件
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+
+        with self._lock:
+            self._known.add(key)
+        return key
+
+    def put(self, icon_content: Optional[str]) -> Optional[str]:
+        """保存IconContent，返回相对key；内容为空或无法解码时返回None"""
+        if not icon_content:
+            return None
+        try:
+            data, ext = decode_icon(icon_content)
+        except ValueError:
+            return None
+        return self.put_bytes(data, ext)
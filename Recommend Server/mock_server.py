@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+本地recommend-server替身：用内存中的合成数据实现 /api/feeds 分页、/api/feednames、setFeeds、
+batchCreateFeeds 接口，支持注入延迟和错误，用于压测运维脚本
+"""
+
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def make_icon(rng: random.Random, size: int) -> str:
+    """生成data URL形式的base64图标内容"""
+    payload = bytes(rng.getrandbits(8) for _ in range(size))
+    return "data:image/png;base64," + base64.b64encode(payload).decode('ascii')
+
+
+def make_feeds(count: int, icon_size: int = 256, seed: int = 0) -> List[Dict]:
+    """生成合成feed数据；图标只生成少量几种，按下标复用"""
+    rng = random.Random(seed)
+    icons = [make_icon(rng, icon_size) for _ in range(16)]
+    return [{
+        "ID": f"{i:024x}",
+        "FeedURL": f"https://example{i % 997}.com/feed/{i}.xml",
+        "Title": f"Feed {i}",
+        "Description": "synthetic feed for load testing",
+        "Language": "en",
+        "CategoryID": "66175739a84f9620f108cf27",
+        "IconContent": icons[i % len(icons)],
+    } for i in range(count)]
+
+
+def make_feednames(count: int, feeds: List[Dict], feeds_per_name: int = 50, seed: int = 0) -> Dict[str, Dict]:
+    """生成合成feedname，每个随机包含 feeds_per_name 个feed"""
+    rng = random.Random(seed)
+    feednames = {}
+    for i in range(count):
+        feedname_id = f"{0xfeed0000 + i:024x}"
+        name = f"feedname{i}"
+        feednames[feedname_id] = {
+            "ID": feedname_id,
+            "Name": name,
+            "Language": ["en"],
+            "FeedProvider": f"https://recommend-provider-dev.bttcdn.com/api/provider/feeds?feed_name={name}",
+            "EntryProvider": f"https://recommend-provider-dev.bttcdn.com/api/provider/entries?feed_name={name}&language=en",
+            "Description": "synthetic feedname",
+            "FeedID": [feed["ID"] for feed in rng.sample(feeds, min(feeds_per_name, len(feeds)))],
+        }
+    return feednames
+
+
+class MockState:
+    """服务端内存状态和故障注入参数"""
+
+    def __init__(self, feeds: List[Dict], feednames: Optional[Dict[str, Dict]] = None,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, seed: int = 0):
+        self.lock = threading.Lock()
+        self.feeds = feeds
+        self.feed_ids = {feed["ID"] for feed in feeds}
+        self.url_index = {feed["FeedURL"].strip(): feed["ID"] for feed in feeds}
+        self.feednames = feednames or {}
+        self.next_id = len(feeds) + len(self.feednames)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def new_id(self, prefix: int = 0) -> str:
+        """分配新的24位十六进制id（调用方持有锁）"""
+        self.next_id += 1
+        return f"{prefix + self.next_id:024x}"
+
+    def fault(self) -> Optional[int]:
+        """按配置等待，并决定本次请求是否返回注入的错误"""
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self.rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return self.error_status if failed else None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """请求处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        # 压测时不输出访问日志
+        pass
+
+    def send_json(self, status: int, data, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def route(self):
+        """解析路径，并执行故障注入；返回 (路径片段, query)，已返回错误时为None"""
+        url = urlparse(self.path)
+        # 先读掉请求体，保证注入错误后连接还能复用
+        self.body = self.read_json() if self.command in ('POST', 'PUT') else None
+        status = self.state.fault()
+        if status is not None:
+            headers = {'Retry-After': '0'} if status == 429 else None
+            self.send_json(status, {"error": "injected failure"}, headers)
+            return None
+        return url.path.strip('/').split('/'), parse_qs(url.query)
+
+    def do_GET(self):
+        routed = self.route()
+        if routed is None:
+            return
+        parts, query = routed
+        if parts == ['api', 'feeds']:
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', ['100'])[0])
+            with self.state.lock:
+                total = len(self.state.feeds)
+                page = self.state.feeds[offset:offset + limit]
+            # 支持 fields=ID,FeedURL 形式的服务端字段选择
+            if 'fields' in query:
+                fields = query['fields'][0].split(',')
+                page = [{key: feed[key] for key in fields if key in feed} for feed in page]
+            self.send_json(200, {"total": total, "feeds": page})
+        elif parts == ['api', 'feednames']:
+            with self.state.lock:
+                feednames = [dict(item, FeedID=list(item["FeedID"])) for item in self.state.feednames.values()]
+            self.send_json(200, feednames)
+        elif len(parts) == 4 and parts[:2] == ['api', 'feednames'] and parts[3] == 'feeds':
+            with self.state.lock:
+                feedname = self.state.feednames.get(parts[2])
+                feed_ids = list(feedname["FeedID"]) if feedname else None
+            if feed_ids is None:
+                self.send_json(404, {"error": "feedname not found"})
+            else:
+                self.send_json(200, [{"ID": feed_id} for feed_id in feed_ids])
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        routed = self.route()
+        if routed is None:
+            return
+        parts, _ = routed
+        if parts == ['api', 'batchCreateFeeds']:
+            # 已存在的feed不重复创建，返回已存在的列表
+            existing = []
+            with self.state.lock:
+                for row in self.body or []:
+                    url = str(row.get("feed_url", "")).strip()
+                    if url in self.state.url_index:
+                        existing.append({"feed_url": url, "id": self.state.url_index[url]})
+                        continue
+                    feed_id = self.state.new_id()
+                    self.state.feeds.append({
+                        "ID": feed_id,
+                        "FeedURL": url,
+                        "Title": "",
+                        "Description": "",
+                        "Language": "en",
+                        "CategoryID": row.get("category_id", ""),
+                        "IconContent": "",
+                    })
+                    self.state.feed_ids.add(feed_id)
+                    self.state.url_index[url] = feed_id
+            self.send_json(200, existing)
+        elif parts == ['api', 'feednames']:
+            data = self.body or {}
+            if not data.get("name"):
+                self.send_json(400, {"error": "name is required"})
+                return
+            with self.state.lock:
+                if any(item["Name"] == data["name"] for item in self.state.feednames.values()):
+                    self.send_json(409, {"error": "feedname already exists"})
+                    return
+                feedname_id = self.state.new_id(0xfeed0000)
+                self.state.feednames[feedname_id] = {
+                    "ID": feedname_id,
+                    "Name": data["name"],
+                    "Language": data.get("language", []),
+                    "FeedProvider": data.get("feed_provider", ""),
+                    "EntryProvider": data.get("entry_provider", ""),
+                    "Description": data.get("description", ""),
+                    "FeedID": list(data.get("feed_id", [])),
+                }
+            self.send_json(201, feedname_id)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_PUT(self):
+        routed = self.route()
+        if routed is None:
+            return
+        parts, _ = routed
+        if len(parts) == 4 and parts[:2] == ['api', 'feednames'] and parts[3] == 'setFeeds':
+            feed_ids = list((self.body or {}).get("feed_id", []))
+            with self.state.lock:
+                feedname = self.state.feednames.get(parts[2])
+                unknown = [feed_id for feed_id in feed_ids if feed_id not in self.state.feed_ids]
+                if feedname is not None and not unknown:
+                    feedname["FeedID"] = feed_ids
+            if feedname is None:
+                self.send_json(404, {"error": "feedname not found"})
+            elif unknown:
+                self.send_json(400, {"error": f"unknown feed ids: {unknown[:5]}"})
+            else:
+                self.send_json(204, None)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        routed = self.route()
+        if routed is None:
+            return
+        parts, _ = routed
+        if len(parts) == 3 and parts[:2] == ['api', 'feednames']:
+            with self.state.lock:
+                feedname = self.state.feednames.pop(parts[2], None)
+            if feedname is None:
+                self.send_json(404, {"error": "feedname not found"})
+            else:
+                self.send_json(204, None)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+
+def create_server(feeds: List[Dict], host: str = '127.0.0.1', port: int = 0,
+                  feednames: Optional[Dict[str, Dict]] = None, **faults) -> ThreadingHTTPServer:
+    """创建服务器（port为0时由系统分配端口）；faults为 latency/jitter/error_rate/error_status"""
+    handler = type('BoundMockHandler', (MockHandler,), {'state': MockState(feeds, feednames, **faults)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地recommend-server替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--feeds", type=int, default=10000, help="合成feed数量")
+    parser.add_argument("--icon-size", type=int, default=256, help="每个图标的字节数")
+    parser.add_argument("--feednames", type=int, default=0, help="合成feedname数量")
+    parser.add_argument("--feeds-per-name", type=int, default=50, help="每个feedname包含的feed数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的固定延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="在固定延迟上叠加的随机延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回错误的比例（0-1）")
+    parser.add_argument("--error-status", type=int, default=500, help="注入错误的状态码（如500/503/429）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    feeds = make_feeds(args.feeds, args.icon_size, args.seed)
+    feednames = make_feednames(args.feednames, feeds, args.feeds_per_name, args.seed)
+    server = create_server(feeds, args.host, args.port, feednames,
+                           latency=args.latency / 1000, jitter=args.jitter / 1000,
+                           error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    # 启动完成后打印端口，供基准脚本读取
+    print(f"Listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
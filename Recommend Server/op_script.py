@@ -4,13 +4,21 @@
 # In[6]:
 
 
-import requests
 import json
 import pandas as pd
 import base64
 from PIL import Image
 from io import BytesIO
 from IPython.display import display
+from recommend_client import RecommendClient
+from feed_export import FeedProjection
+from feed_upload import load_feed_rows
+from icon_store import IconStore
+
+# 各环境共用连接池的客户端（地址、超时、重试可在 recommend_config.json 中覆盖）
+dev = RecommendClient('dev', config_file='recommend_config.json')
+test = RecommendClient('test', config_file='recommend_config.json')
+prd = RecommendClient('prd', config_file='recommend_config.json')
 
 
 # In[35]:
@@ -25,56 +33,21 @@ from IPython.display import display
 # 查看所有feeds，每100条分页
 # api = "https://recommend-server-prd.bttcdn.com/api/feeds?offset=0&limit=100"
 
-# 初始化 DataFrame
-df = pd.DataFrame()
-retrieved = 0
-
 # 设置api参数
-offset = 0
 limit = 100
-api = "https://recommend-server-test.bttcdn.com/api/feeds"
-
-while True:
-    # 发送 GET 请求,获取 Feed 数据
-    params = {
-        "offset": offset,
-        "limit": limit
-    }
-    response = requests.get(api, params=params)
-
-    # 检查请求是否成功
-    if response.status_code == 200:
-        # 获取 JSON 数据
-        json_data = response.json()
-        feed_num = json_data['total']
-        
-        # 将数据添加到 DataFrame
-        new_df = pd.DataFrame(json_data['feeds'])
-        df = pd.concat([df, new_df], ignore_index=True)
-        
-        retrieved = len(df)
-        print(f"Progess: {retrieved}/{feed_num}")
-
-        # 检查是否已取回所有数据
-        if retrieved >= feed_num or offset > feed_num:
-            break
-        else:
-            # 更新 offset,继续下一次请求
-            offset += limit
-    else:
-        print(f"请求失败,错误代码: {response.status_code}")
-        break
-
-# 解析feed表
-# df.head(10)
-
-print(df.shape)
-
-# 导出成Excel方便查看。为减小体积，去掉IconContent列
-df_export = df.drop('IconContent', axis=1)
-print(df_export.shape)
-
-df_export.to_excel('output/feedlist_test_ent.xlsx', index=False)
+workers = 8  # 并发请求数
+client = test
+
+# 解码时直接丢弃IconContent，不在内存中保留图标；图标另存到 output/icons（按内容寻址，重复图标只存一份）
+# 如果服务端支持字段选择，可以设置 fields=[...] 和 server_param="fields"，只传输需要的字段
+projection = FeedProjection(exclude=['IconContent'], icon_store=IconStore('output/icons'))
+
+# 第一页返回total后，其余分页并发获取，按offset顺序返回
+# 边获取边写入Excel（xlsxwriter constant_memory 模式），不在内存中构建整个表；
+# IconContent在获取时已去掉，IconKey列对应 output/icons 下的图标文件
+# 数据量很大时可以改为 .csv 或 .parquet，写入更快
+export_stats = client.export_feeds('output/feedlist_test_ent.xlsx', limit=limit, workers=workers,
+                                   projection=projection)
 
 
 # # # 查看feed icon
@@ -83,6 +56,13 @@ df_export.to_excel('output/feedlist_test_ent.xlsx', index=False)
 # # image = Image.open(BytesIO(image_data))
 # # display(image)
 
+# 批量审查图标：进程池解码、按内容哈希去重，缩略图缓存在 output/icon_thumbnails，重复运行只处理新图标
+# 损坏 / 过大的图标在报告中标记；导出时保存的图标目录也可以直接审查
+# from icon_audit import ThumbnailCache, audit_icons, icons_from_store, report_pages
+# from feed_writer import export_feeds
+# results = audit_icons(icons_from_store('output/icons'), ThumbnailCache('output/icon_thumbnails'))
+# export_feeds(report_pages(results, only_flagged=True), 'output/icon_audit.xlsx')
+
 
 
 # In[ ]:
@@ -97,18 +77,8 @@ df_export.to_excel('output/feedlist_test_ent.xlsx', index=False)
 # 查看所有Feed_names
 
 # 通过API获取数据
-url = "https://recommend-server-dev.bttcdn.com/api/feednames"
-
-# 发送GET请求
-response = requests.get(url)
-
-# 检查请求是否成功
-if response.status_code == 200:
-    # 获取JSON数据
-    json_data = response.json()
-    print('Feednames fetched:', len(json_data))
-else:
-    print(f"请求失败，错误代码：{response.status_code}")
+json_data = dev.list_feednames()
+print('Feednames fetched:', len(json_data))
 
 # 解析feedname表
 df = pd.DataFrame.from_dict(json_data)
@@ -120,8 +90,6 @@ df.head(10)
 
 # 创建Feed_names
 
-url = "https://recommend-server-test.bttcdn.com/api/feednames"
-
 feedname_data = {
     "name": "test0327",
     "language": ["en"],
@@ -131,13 +99,9 @@ feedname_data = {
     "feed_id": ["65af71ff27ae275014b31cb0","65af720127ae275014b31ccc"]
 }
 
-response = requests.post(url, json = feedname_data)
-
-# 检查请求是否成功
-if response.status_code == 201:
-    print('添加成功, feedname id = ',response.text)
-else:
-    print(f"请求失败，错误代码：{response.status_code}")
+# 失败时抛出 RecommendApiError（包含状态码和返回内容）
+feedname_id = test.create_feedname(feedname_data)
+print('添加成功, feedname id = ', feedname_id)
 
 
 # In[60]:
@@ -145,18 +109,10 @@ else:
 
 # 删除Feed_names
 
-api = "https://recommend-server-test.bttcdn.com/api/feednames/"
 feedname_id = "6602718ba0684c6957ce26d0"
-url = api+feedname_id
-print(url)
-
-response = requests.delete(url)
-print(response)
 
-if response.status_code == 204:
-    print('删除成功')
-else:
-    print(f"请求失败，错误代码：{response.status_code}")
+test.delete_feedname(feedname_id)
+print('删除成功')
 
 
 # In[40]:
@@ -166,39 +122,30 @@ else:
 
 # 读取feed列表
 excel_file = 'input/prd_ent.xlsx'  # feed文件
-df = pd.read_excel(excel_file)
 
 # 对应环境的category_id
 category_id = '66175739a84f9620f108cf27'
 
-# 在DataFrame中添加category_id列
-df['category_id'] = category_id
-
-# df.head(10)
+# 组装成 [{category_id, feed_url}] 列表
+feed_rows = load_feed_rows(excel_file, category_id)
 
-# 组装成json
-json_data = df[["category_id","feed_url"]].to_json(orient="records", force_ascii=False)
-json_list = json.loads(json_data)
-
-num_entries = len(json_list)
+num_entries = len(feed_rows)
 print(f"Number of entries to be added: {num_entries}")
 
-json_data = json.dumps(json_list, indent=4)
-
-# 设置接口
-url = "https://recommend-server-test.bttcdn.com/api/batchCreateFeeds"
-print(url)
+# 本地索引：已存在feed的 规范化feed_url → id，缓存1小时；也可以传 export_file 使用之前导出的feed列表
+index_file = 'output/feed_index_test.json'
+index = test.feed_index(index_file)
 
-headers = {
-    "Content-Type": "application/json"
-}
+# 先在本地去重，只上传新增的feed；分块并发上传（每块 chunk_size 条，workers 个并发），失败的块会单独列出
+report = test.batch_create_feeds(feed_rows, chunk_size=200, workers=4, index=index, index_file=index_file)
 
-response = requests.post(url, headers=headers, data=json_data)
-if response.status_code == 200:
-    print('添加成功, 以下feed已存在')
-    print(json.dumps(json.loads(response.text), indent=4))
-else:
-    print(f"请求失败，错误代码：{response.status_code}")
+print(f"本地已跳过 {len(report['skipped'])} 个已存在的feed")
+print(f"完成 {report['succeeded_chunks']}/{report['chunks']} 块, 以下feed已存在")
+print(json.dumps(report['existing'], indent=4))
+if report['failed']:
+    print(f"{len(report['failed'])} 块请求失败:")
+    for item in report['failed']:
+        print(f"  chunk {item['chunk']}: {item['error']}")
 
 
 # In[50]:
@@ -210,27 +157,36 @@ else:
 excel_file = 'input/test_ent.xlsx'  # feed文件
 df = pd.read_excel(excel_file)
 
-# 组装成json
 feed_ids = df['ID'].tolist()
-json_data = {
-    "feed_id": feed_ids
-}
-json_data = json.dumps(json_data, indent=4) # Convert the dictionary to a JSON string
-print(json_data)
+print(f"{len(feed_ids)} feeds")
 
-# 设置API
+# 发送PUT请求
 feedNamesID = '664d6256a84f9620f108cf5d'
-url= f"https://recommend-server-test.bttcdn.com/api/feednames/{feedNamesID}/setFeeds"
-headers = {
-    'Content-Type': 'application/json'
-}
+test.set_feeds(feedNamesID, feed_ids)
+print("成功更新数据")
+
+
+
+# In[ ]:
+
+
+# 按清单批量管理Feed_names
+
+from feedname_manifest import sync_feednames
+
+# 清单格式见 feednames.template.yaml；先dry-run查看计划，确认后再改为 dry_run=False 执行
+# 创建 / 删除 / setFeeds 并发执行（最多 workers 个请求同时进行）
+outcome = sync_feednames(test, 'input/feednames.yaml', dry_run=True, workers=8)
+
+
+# In[ ]:
+
 
-# 发送PUT请求,
-response = requests.put(url, data=json_data, headers=headers)
+# 跨环境同步（例如 test → prd）
 
-# 检查响应
-if response.status_code == 204:
-    print("成功更新数据")
-else:
-    print("请求失败:", response.status_code, response.text)
+from env_sync import sync_environments
 
+# 两个环境并发拉取，只提交差异：目标环境缺少的feed分块batchCreateFeeds，feedname按名称比对后并发创建/setFeeds
+# 各环境category_id不同，需要提供映射；先dry-run确认差异，再改为 dry_run=False 执行
+outcome = sync_environments(test, prd, dry_run=True,
+                            category_map={'66175739a84f9620f108cf27': '66175739a84f9620f108cf27'})
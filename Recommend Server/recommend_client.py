@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+recommend-server 运维客户端：按环境（dev/test/prd）配置，所有接口共用一个带连接池和重试的Session
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import requests
+
+from feed_export import FeedProjection, create_session, iter_feed_pages
+from feed_index import FeedIndex, load_or_build_index
+from feed_upload import upload_feeds, upload_new_feeds
+from feed_writer import export_feeds
+from icon_store import IconStore
+
+# 各环境的服务地址
+ENVIRONMENTS = {
+    "dev": {"base_url": "https://recommend-server-dev.bttcdn.com"},
+    "test": {"base_url": "https://recommend-server-test.bttcdn.com"},
+    "prd": {"base_url": "https://recommend-server-prd.bttcdn.com"},
+}
+DEFAULT_ENV = "test"
+
+
+class RecommendApiError(Exception):
+    """接口返回了非预期的状态码"""
+
+    def __init__(self, method: str, url: str, status_code: int, text: str):
+        super().__init__(f"{method} {url} failed with status {status_code}: {text[:200]}")
+        self.status_code = status_code
+        self.text = text
+
+
+def load_profiles(config_file: Optional[str] = None) -> Dict[str, Dict]:
+    """合并内置环境和配置文件中的环境（配置文件可覆盖地址、超时、重试等）"""
+    profiles = {name: dict(profile) for name, profile in ENVIRONMENTS.items()}
+    if config_file and Path(config_file).exists():
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        for name, profile in config.get("environments", {}).items():
+            profiles.setdefault(name, {}).update(profile)
+    return profiles
+
+
+class RecommendClient:
+    """recommend-server 接口客户端"""
+
+    def __init__(self, env: str = DEFAULT_ENV, base_url: Optional[str] = None,
+                 config_file: Optional[str] = None, timeout: Optional[float] = None,
+                 retries: Optional[int] = None, pool_size: Optional[int] = None):
+        profile = load_profiles(config_file).get(env)
+        if profile is None and base_url is None:
+            raise ValueError(f"Unknown environment: {env}")
+        profile = profile or {}
+
+        self.env = env
+        self.base_url = (base_url or profile["base_url"]).rstrip('/')
+        self.timeout = timeout or profile.get("timeout", 30.0)
+        self.pool_size = pool_size or profile.get("pool_size", 16)
+        # 幂等的方法交给连接层自动重试；POST由调用方自行决定是否重试
+        self.session = create_session(
+            pool_size=self.pool_size,
+            retries=retries if retries is not None else profile.get("retries", 3),
+            methods=('GET', 'PUT', 'DELETE'),
+        )
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def url(self, path: str) -> str:
+        """拼接接口地址"""
+        return f"{self.base_url}{path}"
+
+    def request(self, method: str, path: str, expected: tuple = (200,), **kwargs) -> requests.Response:
+        """发送请求并检查状态码"""
+        url = self.url(path)
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.request(method, url, **kwargs)
+        if response.status_code not in expected:
+            raise RecommendApiError(method, url, response.status_code, response.text)
+        return response
+
+    # ---- feeds ----
+
+    def iter_feed_pages(self, limit: int = 100, workers: int = 8,
+                        projection: Optional[FeedProjection] = None, start: int = 0) -> Iterator[List[Dict]]:
+        """按offset顺序并发分页获取所有feed（start不为0时只获取该位置之后的feed）"""
+        return iter_feed_pages(self.url("/api/feeds"), limit, min(workers, self.pool_size),
+                               self.session, projection, self.timeout, start)
+
+    def export_feeds(self, path: str, limit: int = 100, workers: int = 8,
+                     projection: Optional[FeedProjection] = None) -> Dict:
+        """流式导出全部feed到 xlsx/csv/parquet"""
+        columns = projection.columns() if projection is not None else None
+        return export_feeds(self.iter_feed_pages(limit, workers, projection), path, columns)
+
+    def feed_index(self, cache_file: Optional[str] = None, max_age: float = 3600.0,
+                   export_file: Optional[str] = None) -> FeedIndex:
+        """已存在feed的 feed_url → id 索引"""
+        cache_file = cache_file or f"output/feed_index_{self.env}.json"
+        return load_or_build_index(self.url("/api/feeds"), cache_file, max_age, export_file,
+                                   session=self.session, timeout=self.timeout)
+
+    def batch_create_feeds(self, rows: List[Dict], chunk_size: int = 200, workers: int = 4,
+                           index: Optional[FeedIndex] = None, index_file: Optional[str] = None) -> Dict:
+        """分块并发调用batchCreateFeeds；提供index时先在本地去重"""
+        api = self.url("/api/batchCreateFeeds")
+        kwargs = dict(chunk_size=chunk_size, workers=min(workers, self.pool_size), session=self.session,
+                      timeout=self.timeout)
+        if index is not None:
+            return upload_new_feeds(rows, index, api, index_file=index_file,
+                                    refresh_index=lambda: FeedIndex.from_api(self.url("/api/feeds"),
+                                                                             session=self.session,
+                                                                             timeout=self.timeout),
+                                    **kwargs)
+        return upload_feeds(rows, api, **kwargs)
+
+    # ---- feednames ----
+
+    def list_feednames(self) -> List[Dict]:
+        """查看所有feedname"""
+        return self.request("GET", "/api/feednames").json()
+
+    def feedname_feeds(self, feedname_id: str) -> List[Dict]:
+        """查看某feedname下的所有feed"""
+        return self.request("GET", f"/api/feednames/{feedname_id}/feeds").json()
+
+    def create_feedname(self, feedname: Dict) -> str:
+        """创建feedname，返回新feedname的id"""
+        return self.request("POST", "/api/feednames", expected=(200, 201), json=feedname).text.strip().strip('"')
+
+    def delete_feedname(self, feedname_id: str):
+        """删除feedname"""
+        self.request("DELETE", f"/api/feednames/{feedname_id}", expected=(200, 204))
+
+    def set_feeds(self, feedname_id: str, feed_ids: List[str]):
+        """设置feedname包含的feed列表"""
+        self.request("PUT", f"/api/feednames/{feedname_id}/setFeeds", expected=(200, 204),
+                     json={"feed_id": list(feed_ids)})
+
+
+def read_column(path: str, column: str) -> List[str]:
+    """读取表格中的一列（xlsx/csv）"""
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path, dtype=str)
+    else:
+        df = pd.read_excel(path, dtype=str)
+    return df[column].dropna().str.strip().tolist()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="recommend-server 运维工具")
+    parser.add_argument("--env", default=DEFAULT_ENV, help="环境名称（dev/test/prd 或配置文件中定义的环境）")
+    parser.add_argument("--config", default="recommend_config.json", help="环境配置文件路径")
+    parser.add_argument("--base-url", help="直接指定服务地址（覆盖环境配置）")
+    parser.add_argument("--timeout", type=float, help="请求超时时间（秒）")
+    parser.add_argument("--retries", type=int, help="自动重试次数")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="导出所有feed")
+    p.add_argument("--output", default="output/feedlist.xlsx", help="输出文件（.xlsx/.csv/.parquet）")
+    p.add_argument("--limit", type=int, default=100, help="每页数量")
+    p.add_argument("--workers", type=int, default=8, help="并发请求数")
+    p.add_argument("--icons", help="把图标另存到该目录（按内容寻址）")
+
+    p = sub.add_parser("feednames", help="查看所有feedname")
+    p.add_argument("--output", help="保存为文件（.xlsx/.csv/.json）")
+
+    p = sub.add_parser("create-feedname", help="创建feedname")
+    p.add_argument("file", help="feedname定义（JSON文件）")
+
+    p = sub.add_parser("delete-feedname", help="删除feedname")
+    p.add_argument("ids", nargs="+", help="feedname id")
+
+    p = sub.add_parser("set-feeds", help="设置feedname包含的feed")
+    p.add_argument("feedname_id")
+    p.add_argument("--file", required=True, help="包含feed id的表格（xlsx/csv）")
+    p.add_argument("--column", default="ID", help="feed id所在列")
+
+    p = sub.add_parser("batch-create", help="批量添加feed")
+    p.add_argument("--file", required=True, help="包含feed_url列的表格")
+    p.add_argument("--category-id", required=True, help="对应环境的category_id")
+    p.add_argument("--chunk-size", type=int, default=200, help="每块feed数量")
+    p.add_argument("--workers", type=int, default=4, help="并发请求数")
+    p.add_argument("--no-dedup", action="store_true", help="不使用本地索引去重")
+
+    args = parser.parse_args()
+
+    try:
+        with RecommendClient(args.env, args.base_url, args.config, args.timeout, args.retries) as client:
+            if args.command == "export":
+                icon_store = IconStore(args.icons) if args.icons else None
+                client.export_feeds(args.output, args.limit, args.workers, FeedProjection(icon_store=icon_store))
+
+            elif args.command == "feednames":
+                feednames = client.list_feednames()
+                print('Feednames fetched:', len(feednames))
+                if args.output and args.output.endswith('.json'):
+                    Path(args.output).write_text(json.dumps(feednames, ensure_ascii=False, indent=2), encoding='utf-8')
+                elif args.output and args.output.endswith('.csv'):
+                    pd.DataFrame.from_records(feednames).to_csv(args.output, index=False)
+                elif args.output:
+                    pd.DataFrame.from_records(feednames).to_excel(args.output, index=False)
+                else:
+                    print(pd.DataFrame.from_records(feednames).head(10))
+
+            elif args.command == "create-feedname":
+                feedname = json.loads(Path(args.file).read_text(encoding='utf-8'))
+                print('添加成功, feedname id = ', client.create_feedname(feedname))
+
+            elif args.command == "delete-feedname":
+                for feedname_id in args.ids:
+                    client.delete_feedname(feedname_id)
+                    print(f'删除成功: {feedname_id}')
+
+            elif args.command == "set-feeds":
+                feed_ids = read_column(args.file, args.column)
+                client.set_feeds(args.feedname_id, feed_ids)
+                print(f"成功更新数据: {len(feed_ids)} feeds")
+
+            elif args.command == "batch-create":
+                rows = [{"category_id": args.category_id, "feed_url": url} for url in read_column(args.file, "feed_url")]
+                index_file = f"output/feed_index_{args.env}.json"
+                index = None if args.no_dedup else client.feed_index(index_file)
+                report = client.batch_create_feeds(rows, args.chunk_size, args.workers, index, index_file)
+                print(f"完成 {report['succeeded_chunks']}/{report['chunks']} 块, 以下feed已存在")
+                print(json.dumps(report['existing'], indent=4, ensure_ascii=False))
+                if report['failed']:
+                    print(f"{len(report['failed'])} 块请求失败")
+                    sys.exit(1)
+
+    except (RecommendApiError, requests.RequestException) as e:
+        print(f"请求失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
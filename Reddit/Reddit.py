@@ -4,10 +4,10 @@
 # In[ ]:
 
 
+import csv
 import time
 import requests
-import json
-from urllib.parse import urlparse
+from reddit_parse import parse_listing
 
 # subreddits = ['worldnews','sports','news','UpliftingNews','technology','gaming','space','science']
 # subreddits = ['movies', 'gaming', 'Music', 'television', 'anime', 'entertainment', 'BritishTV', 'tvPlus', 'TvShows']
@@ -52,25 +52,33 @@ for subreddit in subreddits:
     response = requests.get(url,headers = {'User-agent': 'mybot 0.1'}, cookies = cookies)
     
     # response = requests.get(url)
-    top_data = json.loads(response.text)
-    top_posts = top_data['data']['children']
+    # 直接解析原始字节，只保留需要的字段
+    top_posts, _ = parse_listing(response.content)
 
     # 写入表头
     csv_dir = 'output/' + subreddit + '.csv'
     f = open(csv_dir, mode='w', newline='')
-    f.write('n,domain,url\n')
+    writer = csv.writer(f)
+    writer.writerow(['n', 'domain', 'url', 'score'])
 
     # 把Post中的链接记录下来
     n = 0
-    for post in top_posts:
+    for _id, _sub, domain, post_url, score, _comments, _created in top_posts:
         n += 1
-        resrow = str(n) + ','
-        resrow += urlparse(post['data']['url']).netloc + ','
-        resrow += post['data']['url']+ '\n'
+        resrow = [n, domain, post_url, score]
         print(resrow)
-        f.write(resrow)
+        writer.writerow(resrow)
         f.flush()
-    f.close
+    f.close()
     time.sleep(2)  # Sleep for 2 seconds
-    
 
+
+# In[ ]:
+
+
+# 域名统计：按板块 / 跨板块聚合外链域名
+from domain_stats import load_posts, aggregate, save_report
+
+report = aggregate(load_posts('output', subreddits), top_n=20)
+save_report(report, 'output/stats')
+print(report['top_overall'])
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+解析吞吐量基准：比较 response.text + json.loads、直接解析bytes、orjson 以及进程池
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+from typing import Callable, List
+
+from reddit_parse import available_backends, extract_post, parse_listing, parse_many
+
+
+def make_payload(posts: int, seed: int) -> bytes:
+    """生成一页与Reddit列表结构相同的合成数据"""
+    rng = random.Random(seed)
+    children = []
+    for i in range(posts):
+        post_id = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=7))
+        children.append({
+            'kind': 't3',
+            'data': {
+                'id': post_id,
+                'subreddit': 'bench',
+                'title': ' '.join(rng.choices(string.ascii_letters, k=40)),
+                'selftext': ''.join(rng.choices(string.ascii_letters + ' ', k=rng.randint(0, 2000))),
+                'url': f"https://www.example{rng.randint(0, 50)}.com/{post_id}",
+                'score': rng.randint(0, 50000),
+                'num_comments': rng.randint(0, 5000),
+                'created_utc': 1716285009.0 + i,
+                'preview': {'images': [{'source': {'url': 'https://i.redd.it/x.jpg', 'width': 640}}]},
+            },
+        })
+    return json.dumps({'kind': 'Listing', 'data': {'after': f"t3_{seed}", 'children': children}}).encode('utf-8')
+
+
+def parse_via_text(raw: bytes) -> list:
+    """原始写法：先解码为str（response.text），再json.loads"""
+    data = json.loads(raw.decode('utf-8'))
+    return [extract_post(child['data']) for child in data['data']['children']]
+
+
+def measure(name: str, func: Callable[[List[bytes]], object], payloads: List[bytes]):
+    """执行一次并打印页/秒和MB/秒"""
+    total_bytes = sum(len(p) for p in payloads)
+    start = time.perf_counter()
+    func(payloads)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {len(payloads) / elapsed:>10.1f} pages/s {total_bytes / elapsed / 1e6:>8.1f} MB/s")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Reddit列表页解析吞吐量基准")
+    parser.add_argument("--pages", type=int, default=200, help="合成页数")
+    parser.add_argument("--posts", type=int, default=100, help="每页帖子数")
+    parser.add_argument("--workers", type=int, default=None, help="进程池大小")
+    args = parser.parse_args()
+
+    payloads = [make_payload(args.posts, seed) for seed in range(args.pages)]
+    print(f"{args.pages} pages x {args.posts} posts, {sum(map(len, payloads)) / 1e6:.1f} MB")
+
+    measure('text+json.loads', lambda ps: [parse_via_text(p) for p in ps], payloads)
+    for backend in available_backends():
+        measure(f"bytes/{backend}", lambda ps, b=backend: [parse_listing(p, b) for p in ps], payloads)
+        measure(f"pool/{backend}", lambda ps, b=backend: parse_many(ps, b, args.workers), payloads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Reddit 抓取指标：请求延迟直方图、接收字节数、429/5xx次数、限流等待时间、解析/写入耗时和写入速率
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class CrawlMetrics:
+    """抓取过程中的计数器与直方图（线程安全，fetch在线程中执行）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.latencies: List[float] = []
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.status_counts: Counter = Counter()
+        self.errors = 0
+        self.bytes_received = 0
+        self.rate_limit_sleep = 0.0
+        self.pacing_sleep = 0.0
+        self.parse_seconds = 0.0
+        self.write_seconds = 0.0
+        self.rows_written = 0
+
+    def observe_request(self, latency: float, status: int, size: int):
+        """记录一次HTTP请求"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            self.status_counts[status] += 1
+            self.bytes_received += size
+
+    def observe_error(self):
+        """记录一次网络错误（没有拿到响应）"""
+        with self._lock:
+            self.errors += 1
+
+    def add_rate_limit_sleep(self, seconds: float):
+        """记录因429或限流头而等待的时间"""
+        with self._lock:
+            self.rate_limit_sleep += seconds
+
+    def add_pacing_sleep(self, seconds: float):
+        """记录翻页之间固定间隔的等待时间"""
+        with self._lock:
+            self.pacing_sleep += seconds
+
+    def add_parse_time(self, seconds: float):
+        """记录进程池解析耗时"""
+        with self._lock:
+            self.parse_seconds += seconds
+
+    def add_rows(self, rows: int, seconds: float):
+        """记录写入的行数与写入耗时"""
+        with self._lock:
+            self.rows_written += rows
+            self.write_seconds += seconds
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.time() - self.started_at, 1e-9)
+
+    @property
+    def requests(self) -> int:
+        return sum(self.status_counts.values())
+
+    def count_status(self, predicate) -> int:
+        return sum(count for status, count in self.status_counts.items() if predicate(status))
+
+    def percentile(self, q: float) -> float:
+        """延迟分位数（秒）"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(int(q * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+    def summary(self) -> str:
+        """生成可读的汇总文本"""
+        elapsed = self.elapsed
+        lines = [
+            "=== Crawl metrics ===",
+            f"elapsed:            {elapsed:.1f}s",
+            f"requests:           {self.requests} ({self.requests / elapsed:.2f}/s), errors: {self.errors}",
+            f"status 429 / 5xx:   {self.count_status(lambda s: s == 429)} / {self.count_status(lambda s: s >= 500)}",
+            f"bytes received:     {self.bytes_received / 1e6:.2f} MB ({self.bytes_received / elapsed / 1e3:.1f} KB/s)",
+            f"latency p50/p90/p99: {self.percentile(0.5):.3f}s / {self.percentile(0.9):.3f}s / {self.percentile(0.99):.3f}s",
+            f"rate limit sleep:   {self.rate_limit_sleep:.1f}s, pacing sleep: {self.pacing_sleep:.1f}s",
+            f"parse / write time: {self.parse_seconds:.2f}s / {self.write_seconds:.2f}s",
+            f"rows written:       {self.rows_written} ({self.rows_written / elapsed:.1f} rows/s)",
+            "latency histogram:",
+        ]
+        for bound, count in zip(list(LATENCY_BUCKETS) + ['+Inf'], self.bucket_counts):
+            label = f"<= {bound}s" if bound != '+Inf' else f"> {LATENCY_BUCKETS[-1]}s"
+            lines.append(f"  {label:<10} {count}")
+        return '\n'.join(lines)
+
+    def to_prometheus(self, prefix: str = 'reddit_crawl') -> str:
+        """生成Prometheus文本格式"""
+        out = [
+            f"# HELP {prefix}_request_duration_seconds Reddit listing request latency.",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts):
+            cumulative += count
+            out.append(f'{prefix}_request_duration_seconds_bucket{{le="{bound}"}} {cumulative}')
+        out.append(f'{prefix}_request_duration_seconds_bucket{{le="+Inf"}} {len(self.latencies)}')
+        out.append(f"{prefix}_request_duration_seconds_sum {sum(self.latencies):.6f}")
+        out.append(f"{prefix}_request_duration_seconds_count {len(self.latencies)}")
+
+        out.append(f"# TYPE {prefix}_responses_total counter")
+        for status, count in sorted(self.status_counts.items()):
+            out.append(f'{prefix}_responses_total{{code="{status}"}} {count}')
+
+        counters: Dict[str, float] = {
+            'request_errors_total': self.errors,
+            'bytes_received_total': self.bytes_received,
+            'rate_limit_sleep_seconds_total': self.rate_limit_sleep,
+            'pacing_sleep_seconds_total': self.pacing_sleep,
+            'parse_seconds_total': self.parse_seconds,
+            'write_seconds_total': self.write_seconds,
+            'rows_written_total': self.rows_written,
+        }
+        for name, value in counters.items():
+            out.append(f"# TYPE {prefix}_{name} counter")
+            out.append(f"{prefix}_{name} {value}")
+
+        out.append(f"# TYPE {prefix}_rows_per_second gauge")
+        out.append(f"{prefix}_rows_per_second {self.rows_written / self.elapsed:.3f}")
+        out.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        out.append(f"{prefix}_last_run_timestamp_seconds {time.time():.0f}")
+        return '\n'.join(out) + '\n'
+
+    def write_prometheus(self, path: str):
+        """原子写入Prometheus textfile（供node_exporter textfile collector读取）"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + '.tmp')
+        tmp_path.write_text(self.to_prometheus(), encoding='utf-8')
+        os.replace(tmp_path, target)
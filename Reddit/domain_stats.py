@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Reddit外链域名统计：对爬取到的帖子记录做按板块 / 跨板块的域名聚合
+"""
+
+import argparse
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import tldextract
+    _extract = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:
+    _extract = None
+
+# 短链 / 别名域名，统一归并到主域名
+DOMAIN_ALIASES = {
+    'youtu.be': 'youtube.com',
+    'redd.it': 'reddit.com',
+    'amzn.to': 'amazon.com',
+}
+
+# 没有安装tldextract时使用的常见二级公共后缀
+MULTI_PART_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk',
+    'com.au', 'net.au', 'org.au', 'gov.au',
+    'co.jp', 'ne.jp', 'or.jp',
+    'co.nz', 'co.in', 'co.kr', 'co.za',
+    'com.br', 'com.cn', 'com.hk', 'com.tw', 'com.sg', 'com.mx', 'com.tr',
+}
+
+# 从URL中取出netloc部分（scheme://netloc/...）
+NETLOC_PATTERN = r'^[A-Za-z][A-Za-z0-9+.-]*://([^/?#]*)'
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_domain(netloc: str) -> str:
+    """把netloc归一化为可注册域名：去掉端口/用户信息/www.，并处理别名"""
+    host = netloc.rsplit('@', 1)[-1].split(':', 1)[0].strip().lower().rstrip('.')
+    if not host:
+        return ''
+    if host.startswith('www.'):
+        host = host[4:]
+    if host in DOMAIN_ALIASES:
+        return DOMAIN_ALIASES[host]
+
+    if _extract is not None:
+        parts = _extract(host)
+        registered = f"{parts.domain}.{parts.suffix}" if parts.domain and parts.suffix else host
+    else:
+        labels = host.split('.')
+        if len(labels) <= 2 or host.replace('.', '').isdigit():
+            registered = host
+        elif '.'.join(labels[-2:]) in MULTI_PART_SUFFIXES:
+            registered = '.'.join(labels[-3:])
+        else:
+            registered = '.'.join(labels[-2:])
+
+    return DOMAIN_ALIASES.get(registered, registered)
+
+
+def normalize_domains(values: pd.Series) -> pd.Categorical:
+    """向量化归一化：只对去重后的netloc调用normalize_domain，再按编码映射回去"""
+    codes, uniques = pd.factorize(values.fillna(''), sort=False)
+    normalized = np.array([normalize_domain(v) for v in uniques], dtype=object)
+    categories, remap = np.unique(normalized, return_inverse=True)
+    remap = remap.astype(codes.dtype)
+    new_codes = np.where(codes >= 0, remap[codes], -1)
+    return pd.Categorical.from_codes(new_codes, categories=categories)
+
+
+def load_posts(input_dir: str = 'output', subreddits: Optional[List[str]] = None) -> pd.DataFrame:
+    """读取Reddit.py导出的 output/<subreddit>.csv，合并为一张帖子表"""
+    frames = []
+    for csv_path in sorted(Path(input_dir).glob('*.csv')):
+        subreddit = csv_path.stem
+        if subreddits and subreddit not in subreddits:
+            continue
+        df = pd.read_csv(csv_path, usecols=lambda c: c in ('url', 'score'), dtype={'url': str})
+        df['subreddit'] = subreddit
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=['subreddit', 'url', 'score'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def prepare(posts: pd.DataFrame) -> pd.DataFrame:
+    """补齐domain / score列，domain和subreddit转换为category以节省内存"""
+    df = pd.DataFrame({'subreddit': posts['subreddit'].astype('category')})
+    netloc = posts['url'].astype(str).str.extract(NETLOC_PATTERN, expand=False)
+    df['domain'] = normalize_domains(netloc)
+    if 'score' in posts:
+        df['score'] = pd.to_numeric(posts['score'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    else:
+        # 没有score时每个帖子按1计，加权排名退化为频次排名
+        df['score'] = np.ones(len(df), dtype=np.int64)
+    return df[df['domain'] != '']
+
+
+def domain_stats_by_subreddit(df: pd.DataFrame) -> pd.DataFrame:
+    """按板块统计各域名的帖子数、总分以及在板块内的占比"""
+    stats = (df.groupby(['subreddit', 'domain'], observed=True)['score']
+               .agg(posts='size', score='sum')
+               .reset_index())
+    totals = stats.groupby('subreddit', observed=True)['posts'].transform('sum')
+    stats['share'] = stats['posts'] / totals
+    return stats.sort_values(['subreddit', 'posts', 'score'], ascending=[True, False, False], ignore_index=True)
+
+
+def domain_stats_overall(df: pd.DataFrame) -> pd.DataFrame:
+    """跨板块统计：帖子数、出现的板块数、总分、平均分以及按分数加权的排名"""
+    stats = (df.groupby('domain', observed=True)
+               .agg(posts=('score', 'size'),
+                    subreddits=('subreddit', 'nunique'),
+                    score=('score', 'sum'),
+                    mean_score=('score', 'mean'))
+               .reset_index())
+    stats['share'] = stats['posts'] / stats['posts'].sum()
+    stats['score_share'] = stats['score'] / max(stats['score'].sum(), 1)
+    stats['score_rank'] = stats['score'].rank(method='min', ascending=False).astype(np.int64)
+    return stats.sort_values(['posts', 'score'], ascending=False, ignore_index=True)
+
+
+def top_domains(stats: pd.DataFrame, n: int = 20, by: str = 'posts') -> pd.DataFrame:
+    """取Top-N域名；如果是按板块的统计表，则每个板块各取Top-N"""
+    ordered = stats.sort_values(by, ascending=False, kind='stable')
+    if 'subreddit' in ordered:
+        return (ordered.groupby('subreddit', observed=True, sort=False).head(n)
+                       .sort_values(['subreddit', by], ascending=[True, False], ignore_index=True))
+    return ordered.head(n).reset_index(drop=True)
+
+
+def aggregate(posts: pd.DataFrame, top_n: int = 20) -> Dict[str, pd.DataFrame]:
+    """一次遍历帖子表，生成所有统计结果"""
+    df = prepare(posts)
+    by_subreddit = domain_stats_by_subreddit(df)
+    overall = domain_stats_overall(df)
+    return {
+        'by_subreddit': by_subreddit,
+        'overall': overall,
+        'top_by_subreddit': top_domains(by_subreddit, top_n),
+        'top_overall': top_domains(overall, top_n),
+        'top_by_score': top_domains(overall, top_n, by='score'),
+    }
+
+
+def save_report(report: Dict[str, pd.DataFrame], output_dir: str):
+    """把统计结果写成CSV"""
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    for name, table in report.items():
+        table.to_csv(out / f"{name}.csv", index=False)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="统计Reddit帖子外链的域名分布")
+    parser.add_argument("--input-dir", default="output", help="Reddit.py导出的CSV目录")
+    parser.add_argument("--output-dir", default="output/stats", help="统计结果输出目录")
+    parser.add_argument("--subreddit", action="append", help="只统计指定板块，可重复指定")
+    parser.add_argument("--top", type=int, default=20, help="Top-N数量")
+    args = parser.parse_args()
+
+    posts = load_posts(args.input_dir, args.subreddit)
+    print(f"Loaded {len(posts)} posts")
+
+    report = aggregate(posts, args.top)
+    save_report(report, args.output_dir)
+
+    print(report['top_overall'].to_string(index=False))
+    print(f"Report written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Reddit 抓取管道：异步循环负责网络I/O，响应原始字节交给进程池解析
+"""
+
+import asyncio
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import requests
+
+from crawl_metrics import CrawlMetrics
+from reddit_parse import parse_listing
+
+# https://www.reddit.com/r/{subreddit}/{listing}.json?limit={count}&t={timeframe}
+LISTING_URL = 'https://www.reddit.com/r/{subreddit}/{listing}.json'
+USER_AGENT = 'mybot 0.1'
+
+# 输出CSV的列，与Reddit.py保持一致，domain_stats.py可以直接读取
+CSV_FIELDS = ('n', 'domain', 'url', 'score')
+
+# 遇到429时的最大重试次数与默认等待时间（秒）
+MAX_RATE_LIMIT_RETRIES = 5
+DEFAULT_RETRY_AFTER = 10.0
+
+
+class RedditCrawler:
+    """Reddit列表页抓取器"""
+
+    def __init__(self, cookies: Optional[Dict[str, str]] = None, backend: str = 'auto',
+                 workers: Optional[int] = None, concurrency: int = 2, delay: float = 2.0,
+                 timeout: float = 30.0, metrics: Optional[CrawlMetrics] = None):
+        self.backend = backend
+        self.delay = delay
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.metrics = metrics or CrawlMetrics()
+
+        self.session = requests.Session()
+        self.session.headers['User-agent'] = USER_AGENT
+        if cookies:
+            self.session.cookies.update(cookies)
+
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+
+    def close(self):
+        """关闭进程池和HTTP会话"""
+        self.pool.shutdown()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def build_params(self, limit: int, timeframe: Optional[str], after: Optional[str]) -> Dict[str, str]:
+        """组装列表页请求参数"""
+        params = {'limit': str(limit)}
+        if timeframe:
+            params['t'] = timeframe
+        if after:
+            params['after'] = after
+        return params
+
+    def _get(self, url: str, params: Dict[str, str]) -> requests.Response:
+        """发起一次请求并记录延迟、状态码和字节数"""
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException:
+            self.metrics.observe_error()
+            raise
+        self.metrics.observe_request(time.perf_counter() - start, response.status_code, len(response.content))
+        return response
+
+    def rate_limit_delay(self, response: requests.Response, attempt: int) -> float:
+        """根据Retry-After或x-ratelimit-*响应头计算需要等待的时间"""
+        headers = response.headers
+        if response.status_code == 429:
+            retry_after = headers.get('Retry-After')
+            if retry_after and retry_after.replace('.', '', 1).isdigit():
+                return float(retry_after)
+            return DEFAULT_RETRY_AFTER * (2 ** attempt)
+        # 配额用完时等到重置窗口
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is not None and reset is not None:
+            try:
+                if float(remaining) < 1:
+                    return float(reset)
+            except ValueError:
+                pass
+        return 0.0
+
+    async def fetch(self, url: str, params: Dict[str, str]) -> bytes:
+        """在线程中发起请求，返回未解码的响应字节；遇到429按限流头等待后重试"""
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            response = await asyncio.to_thread(self._get, url, params)
+            delay = self.rate_limit_delay(response, attempt)
+            if response.status_code == 429 and attempt < MAX_RATE_LIMIT_RETRIES:
+                print(f"Rate limited on {url}, sleeping {delay:.1f}s")
+                await self.sleep(delay, rate_limited=True)
+                continue
+            response.raise_for_status()
+            if delay:
+                await self.sleep(delay, rate_limited=True)
+            return response.content
+
+    async def sleep(self, seconds: float, rate_limited: bool = False):
+        """等待并计入限流等待时间或翻页间隔时间"""
+        if seconds <= 0:
+            return
+        await asyncio.sleep(seconds)
+        if rate_limited:
+            self.metrics.add_rate_limit_sleep(seconds)
+        else:
+            self.metrics.add_pacing_sleep(seconds)
+
+    async def parse(self, raw: bytes) -> Tuple[List[tuple], Optional[str]]:
+        """把解析交给进程池，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result = await loop.run_in_executor(self.pool, parse_listing, raw, self.backend)
+        self.metrics.add_parse_time(time.perf_counter() - start)
+        return result
+
+    async def iter_pages(self, subreddit: str, listing: str = 'top', timeframe: Optional[str] = 'month',
+                         limit: int = 100, max_pages: int = 1,
+                         after: Optional[str] = None) -> AsyncIterator[Tuple[List[tuple], Optional[str]]]:
+        """按after游标逐页抓取某个板块，产出 (帖子记录, 下一页游标)"""
+        url = LISTING_URL.format(subreddit=subreddit, listing=listing)
+        pages = 0
+        while pages < max_pages:
+            print(f"{url} after={after}")
+            raw = await self.fetch(url, self.build_params(limit, timeframe, after))
+            records, after = await self.parse(raw)
+            pages += 1
+            yield records, after
+            if not after:
+                break
+            await self.sleep(self.delay)
+
+    async def crawl_to_csv(self, subreddit: str, output_dir: str = 'output', **kwargs) -> int:
+        """抓取一个板块并写入 output/<subreddit>.csv，返回写入行数"""
+        csv_path = Path(output_dir) / f"{subreddit}.csv"
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+
+        n = 0
+        with open(csv_path, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            async for records, _ in self.iter_pages(subreddit, **kwargs):
+                start = time.perf_counter()
+                for _id, _sub, domain, url, score, _comments, _created in records:
+                    n += 1
+                    writer.writerow((n, domain, url, score))
+                f.flush()
+                self.metrics.add_rows(len(records), time.perf_counter() - start)
+        return n
+
+    async def crawl(self, subreddits: List[str], output_dir: str = 'output', **kwargs) -> Dict[str, int]:
+        """并发抓取多个板块，并发数由concurrency限制"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(subreddit: str) -> int:
+            async with semaphore:
+                rows = await self.crawl_to_csv(subreddit, output_dir, **kwargs)
+                print(f"r/{subreddit}: {rows} rows")
+                return rows
+
+        results = await asyncio.gather(*(run(s) for s in subreddits))
+        return dict(zip(subreddits, results))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Reddit 列表页解析：直接解析响应的原始字节，只抽取需要的字段
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 每条帖子保留的字段，记录以tuple形式按此顺序存放
+POST_FIELDS = ('id', 'subreddit', 'domain', 'url', 'score', 'num_comments', 'created_utc')
+
+BACKENDS = ('json', 'orjson')
+
+
+def available_backends() -> List[str]:
+    """返回当前环境可用的JSON解析后端"""
+    return [name for name in BACKENDS if name != 'orjson' or orjson is not None]
+
+
+def get_loads(backend: str = 'auto') -> Callable[[bytes], object]:
+    """选择JSON解析函数；auto优先使用orjson"""
+    if backend == 'auto':
+        backend = 'orjson' if orjson is not None else 'json'
+    if backend == 'orjson':
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        return orjson.loads
+    if backend == 'json':
+        # json.loads可以直接接收bytes，避免先经过response.text再解码一次
+        return json.loads
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+
+def extract_post(data: dict) -> tuple:
+    """从单条帖子中抽取POST_FIELDS对应的字段"""
+    url = data.get('url') or ''
+    return (
+        data.get('id'),
+        data.get('subreddit'),
+        urlparse(url).netloc,
+        url,
+        data.get('score', 0),
+        data.get('num_comments', 0),
+        data.get('created_utc'),
+    )
+
+
+def parse_listing(raw: bytes, backend: str = 'auto') -> Tuple[List[tuple], Optional[str]]:
+    """解析一页列表数据，返回 (帖子记录列表, 下一页的after游标)"""
+    listing = get_loads(backend)(raw)['data']
+    records = [extract_post(child['data']) for child in listing['children'] if child.get('kind') == 't3']
+    return records, listing.get('after')
+
+
+def _parse_with_backend(args: Tuple[bytes, str]) -> Tuple[List[tuple], Optional[str]]:
+    """进程池map用的单参数包装"""
+    raw, backend = args
+    return parse_listing(raw, backend)
+
+
+def parse_many(payloads: Iterable[bytes], backend: str = 'auto',
+               workers: Optional[int] = None, chunksize: int = 4) -> List[Tuple[List[tuple], Optional[str]]]:
+    """用进程池批量解析多页数据（离线批处理使用）"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_with_backend, ((raw, backend) for raw in payloads), chunksize=chunksize))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Reddit 抓取任务运行器：从任务配置文件生成 板块 × 列表 × 时间范围 的任务，
+并把每个任务的进度（after游标、已抓页数、已写行数）记录到检查点文件，中断后可以续跑
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from crawl_metrics import CrawlMetrics
+from reddit_crawler import CSV_FIELDS, RedditCrawler
+
+# 只有这些列表支持 t= 时间范围参数
+TIMEFRAME_LISTINGS = {'top', 'controversial'}
+
+
+def load_job_spec(spec_file: str) -> Dict:
+    """加载任务配置文件"""
+    spec_path = Path(spec_file)
+    if not spec_path.exists():
+        raise FileNotFoundError(f"Job spec not found: {spec_file}")
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_cookies(cookies_file: Optional[str]) -> Dict[str, str]:
+    """加载Cookie文件（登录后从浏览器导出的键值对）"""
+    if not cookies_file:
+        return {}
+    with open(cookies_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_jobs(spec: Dict) -> List[Dict]:
+    """展开 subreddits × listings × timeframes 得到任务列表"""
+    jobs = []
+    seen = set()
+    listings = spec.get('listings', ['top'])
+    timeframes = spec.get('timeframes', ['month'])
+    for subreddit, listing, timeframe in itertools.product(spec['subreddits'], listings, timeframes):
+        if listing not in TIMEFRAME_LISTINGS:
+            timeframe = None
+        job_id = f"{subreddit}/{listing}/{timeframe or '-'}"
+        if job_id in seen:
+            continue
+        seen.add(job_id)
+        jobs.append({
+            'id': job_id,
+            'subreddit': subreddit,
+            'listing': listing,
+            'timeframe': timeframe,
+        })
+    return jobs
+
+
+class JobRunner:
+    """按检查点续跑的抓取任务运行器"""
+
+    def __init__(self, spec: Dict, checkpoint_file: str, metrics: Optional[CrawlMetrics] = None):
+        self.spec = spec
+        self.metrics = metrics or CrawlMetrics()
+        self.checkpoint_file = Path(checkpoint_file)
+        self.output_dir = Path(spec.get('output_dir', 'output'))
+        self.limit = spec.get('limit', 100)
+        self.max_pages = spec.get('max_pages', 1)
+        self.checkpoint = self.load_checkpoint()
+
+    def load_checkpoint(self) -> Dict:
+        """加载检查点文件"""
+        if self.checkpoint_file.exists():
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_checkpoint(self):
+        """原子地写入检查点文件（先写临时文件再重命名）"""
+        tmp_path = self.checkpoint_file.with_name(self.checkpoint_file.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_file)
+
+    def job_output_path(self, job: Dict) -> Path:
+        """任务的CSV输出路径：output/<listing>_<timeframe>/<subreddit>.csv"""
+        folder = job['listing'] if not job['timeframe'] else f"{job['listing']}_{job['timeframe']}"
+        return self.output_dir / folder / f"{job['subreddit']}.csv"
+
+    def job_state(self, job: Dict) -> Dict:
+        """获取任务进度，不存在则初始化"""
+        return self.checkpoint.setdefault(job['id'], self.initial_state())
+
+    @staticmethod
+    def initial_state() -> Dict:
+        """未开始的任务进度"""
+        return {
+            'after': None,
+            'pages': 0,
+            'rows': 0,
+            'bytes': 0,
+            'done': False,
+            'updated_at': None,
+        }
+
+    def check_output(self, job: Dict, state: Dict) -> Dict:
+        """输出文件缺失或比检查点记录的短时，检查点已不可信，重置后从头运行该任务"""
+        csv_path = self.job_output_path(job)
+        if not state['bytes'] or (csv_path.exists() and csv_path.stat().st_size >= state['bytes']):
+            return state
+        print(f"Output of job {job['id']} is missing or truncated, restarting it")
+        state.clear()
+        state.update(self.initial_state())
+        self.save_checkpoint()
+        return state
+
+    async def run_job(self, crawler: RedditCrawler, job: Dict):
+        """运行单个任务，每写完一页更新一次检查点"""
+        state = self.check_output(job, self.job_state(job))
+        if state['done']:
+            print(f"Skip completed job: {job['id']}")
+            return
+        if state['pages'] >= self.max_pages:
+            state['done'] = True
+            self.save_checkpoint()
+            return
+
+        csv_path = self.job_output_path(job)
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        if state['pages']:
+            print(f"Resume job {job['id']} from page {state['pages'] + 1} (after={state['after']})")
+
+        mode = 'r+' if state['bytes'] else 'w'
+        with open(csv_path, mode=mode, newline='') as f:
+            # 截断到上次检查点记录的位置，丢掉崩溃前写了一半的数据
+            f.seek(state['bytes'])
+            f.truncate()
+            writer = csv.writer(f)
+            if not state['bytes']:
+                writer.writerow(CSV_FIELDS)
+
+            n = state['rows']
+            pages = crawler.iter_pages(job['subreddit'], listing=job['listing'], timeframe=job['timeframe'],
+                                       limit=self.limit, max_pages=self.max_pages - state['pages'],
+                                       after=state['after'])
+            async for records, after in pages:
+                start = time.perf_counter()
+                for _id, _sub, domain, url, score, _comments, _created in records:
+                    n += 1
+                    writer.writerow((n, domain, url, score))
+                f.flush()
+                os.fsync(f.fileno())
+                crawler.metrics.add_rows(len(records), time.perf_counter() - start)
+
+                state.update({
+                    'after': after,
+                    'pages': state['pages'] + 1,
+                    'rows': n,
+                    'bytes': f.tell(),
+                    'done': not after or state['pages'] + 1 >= self.max_pages,
+                    'updated_at': datetime.now().isoformat(timespec='seconds'),
+                })
+                self.save_checkpoint()
+
+        state['done'] = True
+        self.save_checkpoint()
+        print(f"Job {job['id']} finished: {state['pages']} pages, {state['rows']} rows")
+
+    async def run(self, jobs: List[Dict]):
+        """并发运行所有未完成的任务"""
+        crawler = RedditCrawler(
+            cookies=load_cookies(self.spec.get('cookies_file')),
+            backend=self.spec.get('json_backend', 'auto'),
+            workers=self.spec.get('parse_workers'),
+            concurrency=self.spec.get('concurrency', 2),
+            delay=self.spec.get('delay', 2.0),
+            metrics=self.metrics,
+        )
+        semaphore = asyncio.Semaphore(crawler.concurrency)
+
+        async def guarded(job: Dict):
+            async with semaphore:
+                try:
+                    await self.run_job(crawler, job)
+                except Exception as e:
+                    # 单个任务失败不影响其他任务，进度已保存在检查点中
+                    print(f"Job {job['id']} failed: {e}")
+
+        with crawler:
+            await asyncio.gather(*(guarded(job) for job in jobs))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="按任务配置抓取Reddit板块帖子，支持断点续跑")
+    parser.add_argument("--jobs", default="reddit_jobs.json", help="任务配置文件路径")
+    parser.add_argument("--checkpoint", default="reddit_checkpoint.json", help="检查点文件路径")
+    parser.add_argument("--reset", action="store_true", help="忽略已有检查点，全部重新抓取")
+    parser.add_argument("--status", action="store_true", help="只显示各任务进度")
+    parser.add_argument("--metrics-file", help="退出时写入Prometheus textfile格式的指标文件")
+    args = parser.parse_args()
+
+    spec = load_job_spec(args.jobs)
+    jobs = build_jobs(spec)
+    runner = JobRunner(spec, args.checkpoint)
+    if args.reset:
+        runner.checkpoint = {}
+
+    if args.status:
+        for job in jobs:
+            state = runner.checkpoint.get(job['id'])
+            if state is None:
+                print(f"{job['id']:<40} pending")
+            else:
+                status = 'done' if state['done'] else 'partial'
+                print(f"{job['id']:<40} {status:<8} pages={state['pages']} rows={state['rows']}")
+        return
+
+    pending = [job for job in jobs if not runner.checkpoint.get(job['id'], {}).get('done')]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(pending)} already completed")
+    try:
+        asyncio.run(runner.run(pending))
+    finally:
+        # 无论正常结束还是中断，都输出本次运行的指标
+        print(runner.metrics.summary())
+        if args.metrics_file:
+            runner.metrics.write_prometheus(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
+
+
+if __name__ == "__main__":
+    main()